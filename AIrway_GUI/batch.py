@@ -0,0 +1,212 @@
+"""
+Command line tool for processing many annotated recordings (.airway-files) without the GUI, e.g. in nightly jobs:
+verifying the MD5 hashes of the audio files, converting old files to the current format and exporting the
+annotations as .csv-files and/or clip datasets.
+
+Usage: airway-batch [--verify] [--migrate] [--csv DIR] [--clips DIR] [options] PATH [PATH ...]
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+import traceback
+from datetime import datetime
+from pathlib import Path
+
+from .core import EXTRA_COLUMNS, FORMAT_VERSION, AnnotationStore, AudioSource, export_annotations, export_clips, \
+    get_md5_hash, load_setup, migrate_project_file, read_project_file, run_tasks
+
+
+def find_projects(paths, files_from=None):
+    """
+    Returns all .airway-files given directly, inside of the given directories (recursively) or listed in the file
+    files_from (one path per line, '-' for stdin). Every file is returned once.
+    """
+    paths = [Path(path) for path in paths]
+    if files_from is not None:
+        lines = sys.stdin.read().splitlines() if files_from == '-' else Path(files_from).read_text().splitlines()
+        paths += [Path(line.strip()) for line in lines if line.strip()]
+
+    projects = []
+    for path in paths:
+        if path.is_dir():
+            projects += sorted(path.rglob('*.airway'))
+        else:
+            projects.append(path)
+    return list(dict.fromkeys(project.resolve() for project in projects))
+
+
+def output_names(projects):
+    """ Returns a unique name (used for exported files and logs) for every project. """
+    names = []
+    used = set()
+    for project in projects:
+        name = project.stem
+        number = 1
+        while name in used:
+            number += 1
+            name = f'{project.stem}_{number}'
+        used.add(name)
+        names.append(name)
+    return names
+
+
+def process_project(path, name, options):
+    """
+    Processes one .airway-file according to the options and returns its entry of the summary report.
+    This function runs inside of a worker process, all errors are logged and reported in the entry.
+    """
+    started = time.monotonic()
+    entry = {'project': str(path), 'name': name, 'status': 'ok'}
+
+    logger = logging.getLogger(f'airway-batch.{name}')
+    logger.setLevel(logging.INFO)
+    logger.propagate = False
+    if options['log_dir'] is not None:
+        handler = logging.FileHandler(Path(options['log_dir']) / f'{name}.log', mode='w')
+        handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    else:
+        # errors are reported in the summary, tracebacks are only written to log files
+        handler = logging.NullHandler()
+    logger.addHandler(handler)
+
+    try:
+        logger.info(f'Loading {path}')
+        project_file = read_project_file(path)
+        wav_path = Path(path).parent / project_file.filename
+        entry['audio'] = str(wav_path)
+        if not wav_path.exists():
+            raise FileNotFoundError(f'Corresponding file "{project_file.filename}" not found next to '
+                                    f'"{Path(path).name}".')
+
+        if options['migrate'] and project_file.version < FORMAT_VERSION:
+            audio_source = AudioSource(wav_path)
+            sample_rate = audio_source.rate
+            audio_source.close()
+            migrate_project_file(path, sample_rate=sample_rate)
+            entry['migrated'] = True
+            logger.info(f'Converted from format version {project_file.version} to {FORMAT_VERSION} '
+                        f'(old file kept as {Path(path).name}.v1)')
+
+        annotations = AnnotationStore(options['classes'])
+        annotations.load_columns(project_file.initial, project_file.start, project_file.stop,
+                                 project_file.label, project_file.classes)
+        entry['annotations'] = len(annotations)
+        logger.info(f'{len(annotations)} annotations')
+
+        if options['verify']:
+            file_hash = get_md5_hash(wav_path)
+            entry['hash_ok'] = file_hash == project_file.file_hash
+            if not entry['hash_ok']:
+                raise ValueError(f'"{wav_path.name}" is not the file used in "{Path(path).name}" '
+                                 f'(detected different MD5 hashes).')
+            logger.info('MD5 hash verified')
+
+        if options['csv_dir'] is not None or options['clips_dir'] is not None:
+            audio_source = AudioSource(wav_path)
+            try:
+                if options['csv_dir'] is not None:
+                    csv_path = Path(options['csv_dir']) / f'{name}.csv'
+                    export_annotations(annotations, audio_source.rate, csv_path,
+                                       extra_columns=options['extra_columns'])
+                    entry['csv'] = str(csv_path)
+                    logger.info(f'Exported annotations to {csv_path}')
+                if options['clips_dir'] is not None:
+                    clips_path = Path(options['clips_dir']) / name
+                    clips_path.mkdir(parents=True, exist_ok=True)
+                    result = export_clips(audio_source, annotations, str(clips_path),
+                                          source_hash=project_file.file_hash, max_workers=options['clip_threads'])
+                    entry['clips'] = {'path': str(clips_path), 'written': result.written,
+                                      'skipped': result.skipped, 'removed': result.removed}
+                    logger.info(f'Exported clips to {clips_path} ({result.written} written, '
+                                f'{result.skipped} unchanged, {result.removed} removed)')
+            finally:
+                audio_source.close()
+    except Exception as e:
+        entry['status'] = 'failed'
+        entry['error'] = f'{type(e).__name__}: {e}'
+        logger.error(traceback.format_exc())
+    finally:
+        entry['seconds'] = round(time.monotonic() - started, 3)
+        logger.info(f'Finished with status {entry["status"]} after {entry["seconds"]} s')
+        logger.removeHandler(handler)
+        handler.close()
+    return entry
+
+
+def _print_entry(entry):
+    if entry['status'] == 'ok':
+        print(f'[ok] {entry["name"]} ({entry.get("annotations", 0)} annotations, {entry["seconds"]} s)')
+    else:
+        print(f'[failed] {entry["name"]}: {entry["error"]}')
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='airway-batch', description='Verifies and exports many .airway-files '
+                                                                      'without the GUI.')
+    parser.add_argument('paths', nargs='*', help='.airway-files or directories (searched recursively)')
+    parser.add_argument('--files-from', metavar='FILE', help="file with one path per line ('-' for stdin)")
+    parser.add_argument('--verify', action='store_true',
+                        help='verify the MD5 hashes of the audio files (default if nothing is exported)')
+    parser.add_argument('--csv', metavar='DIR', help='export the annotations to DIR/<name>.csv')
+    parser.add_argument('--clips', metavar='DIR', help='export every annotated event to DIR/<name>/<class>/')
+    parser.add_argument('--migrate', action='store_true',
+                        help='convert files of older format versions to the current one (keeping <file>.v1)')
+    parser.add_argument('--extra-columns', default='',
+                        help=f"comma separated additional .csv columns ({', '.join(EXTRA_COLUMNS)})")
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1, help='number of worker processes')
+    parser.add_argument('--clip-threads', type=int, default=4, help='threads writing clips per process')
+    parser.add_argument('--log-dir', metavar='DIR', help='write a log for every file to DIR/<name>.log')
+    parser.add_argument('--report', metavar='FILE', help='write a summary report (.json)')
+    args = parser.parse_args(argv)
+    if not args.paths and args.files_from is None:
+        parser.error('no paths given')
+    args.extra_columns = [column.strip() for column in args.extra_columns.split(',') if column.strip()]
+    for column in args.extra_columns:
+        if column not in EXTRA_COLUMNS:
+            parser.error(f"unknown column '{column}' in --extra-columns")
+    if args.csv is None and args.clips is None and not args.migrate:
+        args.verify = True
+    return args
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    projects = find_projects(args.paths, args.files_from)
+    if not projects:
+        print('No .airway-files found.')
+        return 1
+
+    for directory in (args.csv, args.clips, args.log_dir):
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+    options = {'classes': load_setup()['classes'], 'verify': args.verify, 'migrate': args.migrate,
+               'csv_dir': args.csv, 'clips_dir': args.clips, 'extra_columns': args.extra_columns,
+               'clip_threads': args.clip_threads, 'log_dir': args.log_dir}
+
+    started = time.monotonic()
+    started_at = datetime.now().isoformat(timespec='seconds')
+    names = output_names(projects)
+    # the report lists the projects in the given order (run_tasks returns the results in the order of the tasks)
+    entries = run_tasks(process_project, [(project, name, options) for project, name in zip(projects, names)],
+                        max_workers=max(args.jobs, 1), result_callback=lambda idx, entry: _print_entry(entry))
+
+    n_failed = sum(entry['status'] != 'ok' for entry in entries)
+    summary = {'projects': len(entries), 'ok': len(entries) - n_failed, 'failed': n_failed,
+               'annotations': sum(entry.get('annotations', 0) for entry in entries),
+               'seconds': round(time.monotonic() - started, 3)}
+    print(f'{summary["ok"]} of {summary["projects"]} files processed successfully, {n_failed} failed '
+          f'({summary["annotations"]} annotations, {summary["seconds"]} s).')
+
+    if args.report is not None:
+        report = {'started': started_at, 'options': {key: value for key, value in options.items() if key != 'classes'},
+                  'summary': summary, 'projects': entries}
+        with open(args.report, 'w') as f:
+            json.dump(report, f, indent=2)
+    return 0 if n_failed == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
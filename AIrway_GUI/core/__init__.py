@@ -0,0 +1,35 @@
+"""
+Core of AIrway without any GUI dependencies (only numpy, pandas and flammkuchen): audio files, annotations,
+.airway-files and exports. It can be used in scripts, notebooks and worker processes without PyQt5/pyqtgraph.
+
+    from AIrway_GUI.core import Project, read_project_file
+
+    project_file = read_project_file('recording.airway')
+    project = Project('recording.wav')
+    project.load_annotations(project_file)
+    project.export_annotations('recording.csv')
+"""
+from .annotation_export import EXTRA_COLUMNS, export_annotations, format_timestamps
+from .annotation_store import UNLABELLED, AnnotationSnapshot, AnnotationStore
+from .audio_cache import AudioCache
+from .audio_scan import ScanResult, scan_audio
+from .audio_source import AudioSource
+from .calculate_md5_hash import get_md5_hash
+from .class_statistics import ClassStatistics
+from .clip_export import MANIFEST_NAME, ExportResult, export_clips
+from .event_detection import DETECTION_DEFAULTS, DetectionFeatures, compute_features, detect_events, \
+    detection_settings, find_events
+from .history import AnnotationHistory
+from .interval_index import IntervalIndex
+from .journal import AnnotationJournal, journal_path
+from .predictions import Predictions
+from .process_pool import run_tasks
+from .project import Project, SaveJob, load_setup
+from .project_file import FORMAT_VERSION, PROJECT_FILE_ENDING, ProjectFile, migrate_project_file, read_project_file, \
+    write_project_file
+from .scoring import DEFAULT_SCORER, BaselineScorer, PredictionCache, PredictionJob, PredictionResult, Scorer, \
+    event_windows, load_scorer
+from .similarity import SIMILARITY_DEFAULTS, SimilarityCache, SimilarityIndex, build_similarity_index, \
+    mel_filterbank, similarity_settings, top_matches
+from .spectrogram import Spectrogram, SpectrogramTile, TileCache
+from .waveform_pyramid import PyramidBuilder, WaveformPyramid
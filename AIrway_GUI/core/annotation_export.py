@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+
+
+# additional columns that can be exported for the boundaries of the annotations (besides the formatted timestamps)
+EXTRA_COLUMNS = ('seconds', 'milliseconds', 'samples')
+EXTRA_COLUMN_SUFFIXES = {'seconds': ' (s)', 'milliseconds': ' (ms)', 'samples': ' (samples)'}
+# file formats that need the optional dependency pyarrow
+ARROW_FORMATS = ('.parquet', '.feather')
+
+
+def format_timestamps(samples, rate):
+    """
+    Formats sample positions as 'H:MM:SS.ff (samples)' (the time is truncated to centiseconds). Hours, minutes,
+    seconds and centiseconds are computed vectorized, only the final strings are built one by one.
+    """
+    samples = np.asarray(samples, dtype=np.int64)
+    microseconds = np.round(samples * (1e6 / rate)).astype(np.int64)
+    seconds, microseconds = np.divmod(microseconds, 1000000)
+    minutes, seconds = np.divmod(seconds, 60)
+    hours, minutes = np.divmod(minutes, 60)
+    return [f'{h}:{m:02d}:{s:02d}.{cs:02d} ({x})' for h, m, s, cs, x in
+            zip(hours.tolist(), minutes.tolist(), seconds.tolist(), (microseconds // 10000).tolist(), samples.tolist())]
+
+
+def _check_extra_columns(extra_columns):
+    for column in extra_columns:
+        if column not in EXTRA_COLUMNS:
+            raise ValueError(f"Unknown export column '{column}' (possible columns: {', '.join(EXTRA_COLUMNS)}).")
+
+
+def _extra_values(column, samples, rate):
+    if column == 'seconds':
+        return samples / rate
+    if column == 'milliseconds':
+        return samples * (1000 / rate)
+    return samples.copy()
+
+
+def _csv_field(text):
+    if any(character in text for character in ';"\n\r'):
+        return '"' + text.replace('"', '""') + '"'
+    return text
+
+
+def annotations_frame(annotations, rate, extra_columns=()):
+    """
+    Returns the annotations as DataFrame with typed columns (From and To in samples, Event as category) and the
+    requested extra columns. The frame is built from the columns of the AnnotationStore only.
+    """
+    _check_extra_columns(extra_columns)
+    columns = {'From': annotations.start.copy(), 'To': annotations.stop.copy(),
+               'Event': pd.Categorical(annotations.label_names())}
+    for column in extra_columns:
+        if column == 'samples':
+            continue
+        for name, samples in (('From', annotations.start), ('To', annotations.stop)):
+            columns[name + EXTRA_COLUMN_SUFFIXES[column]] = _extra_values(column, samples, rate)
+    return pd.DataFrame(columns)
+
+
+def export_annotations(annotations, rate, path, extra_columns=(), chunk_size=65536):
+    """
+    Exports the annotations to a .csv-file (separated by ';') or, if the path ends with .parquet or .feather,
+    to a file of that format (needs pyarrow). In .csv-files, From and To are formatted timestamps; the rows are
+    formatted and written in chunks. Parquet/Feather files contain the sample positions in From and To.
+    """
+    _check_extra_columns(extra_columns)
+    suffix = str(path).lower()[str(path).rfind('.'):]
+    if suffix in ARROW_FORMATS:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ImportError(f"Exporting {suffix}-files needs the optional dependency pyarrow "
+                              f"(pip install airway_gui[arrow]).")
+        df = annotations_frame(annotations, rate, extra_columns)
+        if suffix == '.parquet':
+            df.to_parquet(path)
+        else:
+            df.to_feather(path)
+        return
+
+    # class names (quoted if necessary) of all class codes, index 0 is UNLABELLED
+    names = np.array([''] + [_csv_field(name) for name in annotations.classes], dtype=object)
+    header = ['', 'From', 'To', 'Event']
+    for column in extra_columns:
+        header += ['From' + EXTRA_COLUMN_SUFFIXES[column], 'To' + EXTRA_COLUMN_SUFFIXES[column]]
+
+    with open(path, 'w', newline='') as f:
+        f.write(';'.join(header) + '\n')
+        for first in range(0, len(annotations), chunk_size):
+            last = min(first + chunk_size, len(annotations))
+            start, stop = annotations.start[first:last], annotations.stop[first:last]
+            columns = [map(str, range(first, last)), format_timestamps(start, rate), format_timestamps(stop, rate),
+                       names[annotations.label[first:last] + 1].tolist()]
+            for column in extra_columns:
+                columns += [map(repr, _extra_values(column, start, rate).tolist()),
+                            map(repr, _extra_values(column, stop, rate).tolist())]
+            f.writelines([';'.join(row) + '\n' for row in zip(*columns)])
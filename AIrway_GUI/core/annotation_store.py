@@ -0,0 +1,251 @@
+import numpy as np
+
+
+# class code of events that are not labelled yet ('yellow' events)
+UNLABELLED = -1
+
+
+def _positions(column):
+    """ Returns a column of sample positions as int64 (columns of old files may contain floats). """
+    column = np.asarray(column)
+    if column.dtype.kind in 'iu':
+        return column.astype(np.int64, copy=False)
+    return column.astype(np.float64).astype(np.int64)
+
+
+class AnnotationSnapshot:
+    """
+    Immutable copy of the columns and classes of an AnnotationStore (e.g. for saving them in another thread while
+    the annotations are modified). It has the same columns as the store.
+    """
+    def __init__(self, initial, start, stop, label, classes):
+        self.initial = initial
+        self.start = start
+        self.stop = stop
+        self.label = label
+        self.classes = tuple(classes)
+        for column in (self.initial, self.start, self.stop, self.label):
+            column.flags.writeable = False
+
+    def __len__(self):
+        return len(self.start)
+
+
+class AnnotationStore:
+    """
+    Class that stores all annotations of one recording in compact numpy columns.
+
+    Every annotation consists of the initial position (where the event was marked while listening), the region
+    [start, stop) in samples and a class code (index into classes or UNLABELLED). The columns grow by doubling their
+    capacity, so appending is amortized O(1). The index of the selected annotation is kept as a field.
+
+    Observers (e.g. the table model) are informed about every modification through the following optional methods:
+    annotations_about_to_be_inserted(first, last), annotations_inserted(first, last),
+    annotations_about_to_be_changed(first, last), annotations_changed(first, last),
+    annotations_about_to_be_removed(first, last), annotations_removed(first, last), annotations_about_to_be_reset(),
+    annotations_reset() and selection_changed(old, new) (ranges include last).
+    """
+    def __init__(self, classes, capacity=1024):
+        self.classes = list(classes)
+        self._class_codes = {name: code for code, name in enumerate(self.classes)}
+        self.selected = None
+        self._observers = []
+
+        self._size = 0
+        self._initial = np.zeros(capacity, dtype=np.int64)
+        self._start = np.zeros(capacity, dtype=np.int64)
+        self._stop = np.zeros(capacity, dtype=np.int64)
+        self._label = np.zeros(capacity, dtype=np.int16)
+
+    def __len__(self):
+        return self._size
+
+    ##################################################################################
+    # Columns (views of the used part of the arrays, do not modify them directly)
+    ##################################################################################
+    @property
+    def initial(self):
+        return self._initial[:self._size]
+
+    @property
+    def start(self):
+        return self._start[:self._size]
+
+    @property
+    def stop(self):
+        return self._stop[:self._size]
+
+    @property
+    def label(self):
+        return self._label[:self._size]
+
+    def snapshot(self):
+        """ Returns an AnnotationSnapshot of the current annotations (copies only the columns). """
+        return AnnotationSnapshot(self.initial.copy(), self.start.copy(), self.stop.copy(), self.label.copy(),
+                                  self.classes)
+
+    ##################################################################################
+    # Observers
+    ##################################################################################
+    def add_observer(self, observer):
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        self._observers.remove(observer)
+
+    def _notify(self, name, *args):
+        for observer in self._observers:
+            method = getattr(observer, name, None)
+            if method is not None:
+                method(*args)
+
+    ##################################################################################
+    # Classes
+    ##################################################################################
+    def class_code(self, name):
+        """
+        Returns the class code of a class name ('' is UNLABELLED). Unknown names (e.g. from files annotated with
+        another setup.json) are added to the classes.
+        """
+        if not name:
+            return UNLABELLED
+        if name not in self._class_codes:
+            self._class_codes[name] = len(self.classes)
+            self.classes.append(name)
+        return self._class_codes[name]
+
+    def label_name(self, index):
+        code = self._label[index]
+        return '' if code == UNLABELLED else self.classes[code]
+
+    def label_names(self):
+        """ Returns the class names of all annotations ('' for unlabelled events). """
+        names = np.array([''] + self.classes, dtype=object)
+        return names[self.label + 1]
+
+    ##################################################################################
+    # Modifications
+    ##################################################################################
+    def _reserve(self, size):
+        if size <= len(self._start):
+            return
+        capacity = max(size, 2 * len(self._start))
+        for name in ('_initial', '_start', '_stop', '_label'):
+            column = getattr(self, name)
+            new_column = np.zeros(capacity, dtype=column.dtype)
+            new_column[:self._size] = column[:self._size]
+            setattr(self, name, new_column)
+
+    def append(self, initial, start, stop, label=UNLABELLED):
+        """
+        Adds one annotation and returns its index.
+        """
+        self._reserve(self._size + 1)
+        index = self._size
+        self._notify('annotations_about_to_be_inserted', index, index)
+        self._initial[index] = initial
+        self._start[index] = start
+        self._stop[index] = stop
+        self._label[index] = label
+        self._size += 1
+        self._notify('annotations_inserted', index, index)
+        return index
+
+    def insert(self, index, initial, start, stop, label=UNLABELLED):
+        """
+        Inserts one annotation at index (e.g. when undoing a delete). All following annotations move down by one index.
+        """
+        if index == self._size:
+            return self.append(initial, start, stop, label)
+        self._reserve(self._size + 1)
+        self._notify('annotations_about_to_be_inserted', index, index)
+        for column, value in ((self._initial, initial), (self._start, start), (self._stop, stop),
+                              (self._label, label)):
+            column[index + 1:self._size + 1] = column[index:self._size]
+            column[index] = value
+        self._size += 1
+        if self.selected is not None and self.selected >= index:
+            self.selected += 1
+        self._notify('annotations_inserted', index, index)
+        return index
+
+    def extend(self, initial, start, stop, label):
+        """
+        Adds many annotations at once (columns as array-likes of equal length) and returns the range of new indices.
+        """
+        n = len(start)
+        if n == 0:
+            return range(self._size, self._size)
+        self._reserve(self._size + n)
+        first = self._size
+        self._notify('annotations_about_to_be_inserted', first, first + n - 1)
+        self._initial[first:first + n] = initial
+        self._start[first:first + n] = start
+        self._stop[first:first + n] = stop
+        self._label[first:first + n] = label
+        self._size += n
+        self._notify('annotations_inserted', first, first + n - 1)
+        return range(first, first + n)
+
+    def load_columns(self, initial, start, stop, label, classes):
+        """
+        Replaces all annotations by the given columns (e.g. of an .airway-file). label contains the code of every
+        annotation in the list classes (or UNLABELLED); the codes are translated to the classes of the store with one
+        lookup per class, not per annotation.
+        """
+        # the last entry translates UNLABELLED (-1)
+        codes = np.array([self.class_code(name) for name in classes] + [UNLABELLED], dtype=np.int32)
+        label = codes[np.asarray(label, dtype=np.int64)]
+        self.clear()
+        self.extend(_positions(initial), _positions(start), _positions(stop), label)
+
+    def set_bounds(self, index, start, stop):
+        self._notify('annotations_about_to_be_changed', index, index)
+        self._start[index] = start
+        self._stop[index] = stop
+        self._notify('annotations_changed', index, index)
+
+    def set_label(self, index, label):
+        self._notify('annotations_about_to_be_changed', index, index)
+        self._label[index] = label
+        self._notify('annotations_changed', index, index)
+
+    def delete(self, index):
+        """
+        Removes one annotation. All following annotations move up by one index (like rows inside the table).
+        """
+        self.delete_range(index, index)
+
+    def delete_range(self, first, last):
+        """
+        Removes the annotations first ... last (inclusive) at once, with one notification for the whole range. All
+        following annotations move up by the number of removed annotations.
+        """
+        n = last - first + 1
+        if self.selected is not None and first <= self.selected <= last:
+            self.unselect()
+        self._notify('annotations_about_to_be_removed', first, last)
+        for column in (self._initial, self._start, self._stop, self._label):
+            column[first:self._size - n] = column[last + 1:self._size]
+        self._size -= n
+        if self.selected is not None and self.selected > last:
+            self.selected -= n
+        self._notify('annotations_removed', first, last)
+
+    def clear(self):
+        self._notify('annotations_about_to_be_reset')
+        self._size = 0
+        self.selected = None
+        self._notify('annotations_reset')
+
+    ##################################################################################
+    # Selection
+    ##################################################################################
+    def select(self, index):
+        old = self.selected
+        self.selected = index
+        if old != index:
+            self._notify('selection_changed', old, index)
+
+    def unselect(self):
+        self.select(None)
@@ -0,0 +1,171 @@
+import numpy as np
+import hashlib
+import json
+import os
+import sys
+from pathlib import Path
+
+from .audio_statistics import ChannelStatistics
+from .waveform_pyramid import WaveformPyramid
+
+
+CACHE_FILE_ENDING = '.airway-cache'
+CACHE_VERSION = 1
+
+
+def cache_directory():
+    """
+    Returns the user cache directory of AIrway (can be overwritten with the environment variable AIRWAY_CACHE_DIR).
+    """
+    if os.environ.get('AIRWAY_CACHE_DIR'):
+        return Path(os.environ['AIRWAY_CACHE_DIR'])
+    if sys.platform.startswith('win'):
+        return Path(os.environ.get('LOCALAPPDATA', Path.home() / 'AppData' / 'Local')) / 'AIrway' / 'cache'
+    if sys.platform == 'darwin':
+        return Path.home() / 'Library' / 'Caches' / 'AIrway'
+    return Path(os.environ.get('XDG_CACHE_HOME', Path.home() / '.cache')) / 'airway'
+
+
+def read_cache_file(path, read, mmap_mode=None):
+    """
+    Returns read(data) of a cache file written with np.save/np.savez (data is the array or the NpzFile) or None if
+    there is no entry. Outdated or broken entries (read raises an exception, or np.load reports e.g. a truncated file
+    with one of various exceptions) are removed, so that they are rebuilt.
+    """
+    try:
+        data = np.load(path, mmap_mode=mmap_mode, allow_pickle=False)
+        if isinstance(data, np.lib.npyio.NpzFile):
+            with data:
+                return read(data)
+        return read(data)
+    except FileNotFoundError:
+        return None
+    except Exception:
+        remove_cache_file(path)
+        return None
+
+
+def write_cache_file(path, write):
+    """
+    Writes a cache file atomically with write(file) and returns whether it was written. Caches are only an
+    optimization, so a read-only or full disk is ignored.
+    """
+    tmp_path = path.with_name(path.name + '.tmp')
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(tmp_path, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except OSError:
+        remove_cache_file(tmp_path)
+        return False
+    return True
+
+
+def remove_cache_file(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+class CacheEntry:
+    """
+    Everything stored in the cache for one audio file.
+    """
+    def __init__(self, file_hash, pyramid, statistics):
+        self.file_hash = file_hash
+        self.pyramid = pyramid
+        self.statistics = statistics
+
+
+class AudioCache:
+    """
+    Class that persists the file hash, the waveform pyramid and the channel statistics of audio files.
+
+    Entries are stored in the user cache directory (one '<name>.airway-cache' file per audio file) and are only used
+    if path, size, modification time and a fingerprint of the header and the first/last bytes of the audio data are
+    unchanged. If the cache grows larger than max_bytes, the least recently used entries are removed.
+    """
+    FINGERPRINT_BYTES = 65536
+
+    def __init__(self, directory=None, max_bytes=1024 ** 3):
+        self.directory = Path(directory) if directory is not None else cache_directory()
+        self.max_bytes = max_bytes
+
+    def _entry_path(self, audio_source):
+        name = hashlib.sha1(str(audio_source.path.absolute()).encode('utf-8')).hexdigest()
+        return self.directory / (audio_source.path.stem[:32] + '_' + name[:16] + CACHE_FILE_ENDING)
+
+    def key(self, audio_source):
+        """
+        Returns everything that identifies the current version of the audio file.
+        """
+        stat = audio_source.path.stat()
+        fingerprint = hashlib.md5()
+        with open(audio_source.path, 'rb') as f:
+            fingerprint.update(f.read(audio_source.data_offset + self.FINGERPRINT_BYTES))
+            f.seek(max(stat.st_size - self.FINGERPRINT_BYTES, 0))
+            fingerprint.update(f.read())
+        return {'version': CACHE_VERSION, 'path': str(audio_source.path.absolute()), 'size': stat.st_size,
+                'mtime_ns': stat.st_mtime_ns, 'fingerprint': fingerprint.hexdigest()}
+
+    def load(self, audio_source):
+        """
+        Returns the CacheEntry of the audio file or None if there is no valid entry.
+        """
+        def read(arrays):
+            meta = json.loads(arrays['meta'].tobytes().decode('utf-8'))
+            if meta['key'] != self.key(audio_source):
+                raise ValueError('Cache entry is outdated.')
+            levels = [(arrays[f'min_{idx}'], arrays[f'max_{idx}']) for idx in range(meta['n_levels'])]
+            statistics = ChannelStatistics.from_arrays({name: arrays['statistics_' + name]
+                                                        for name in ('min', 'max', 'sum_of_squares', 'n_frames')})
+            return CacheEntry(meta['file_hash'], WaveformPyramid(levels, meta['base_bin_size'], meta['n_frames']),
+                              statistics)
+
+        path = self._entry_path(audio_source)
+        entry = read_cache_file(path, read)
+        if entry is None:
+            return None
+        # the modification time is used for the least recently used eviction
+        os.utime(path)
+        return entry
+
+    def store(self, audio_source, file_hash, pyramid, statistics):
+        """
+        Writes a new entry for the audio file (atomically) and evicts old entries if needed.
+        """
+        meta = {'key': self.key(audio_source), 'file_hash': file_hash, 'base_bin_size': pyramid.base_bin_size,
+                'n_frames': pyramid.n_frames, 'n_levels': len(pyramid.levels)}
+        arrays = {'meta': np.frombuffer(json.dumps(meta).encode('utf-8'), dtype=np.uint8)}
+        for idx, (mins, maxs) in enumerate(pyramid.levels):
+            arrays[f'min_{idx}'] = mins
+            arrays[f'max_{idx}'] = maxs
+        for name, array in statistics.to_arrays().items():
+            arrays['statistics_' + name] = array
+
+        path = self._entry_path(audio_source)
+        if write_cache_file(path, lambda f: np.savez(f, **arrays)):
+            self._evict(keep=path)
+
+    def _evict(self, keep=None):
+        """
+        Removes the least recently used entries until the cache is not larger than max_bytes.
+        """
+        entries = []
+        for path in self.directory.glob('*' + CACHE_FILE_ENDING):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+
+        total_size = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries, key=lambda entry: entry[0]):
+            if total_size <= self.max_bytes:
+                break
+            if path == keep:
+                continue
+            remove_cache_file(path)
+            total_size -= size
@@ -0,0 +1,56 @@
+import hashlib
+
+from .audio_statistics import ChannelStatistics
+from .waveform_pyramid import PyramidBuilder
+
+
+class ScanResult:
+    """
+    Everything that is derived from one sequential pass over an audio file.
+    """
+    def __init__(self, file_hash, pyramid, statistics):
+        self.file_hash = file_hash
+        self.pyramid = pyramid
+        self.statistics = statistics
+
+
+def scan_audio(audio_source, channel=0, base_bin_size=256, chunk_size=2**22, callback=None):
+    """
+    Reads the whole file once in chunks. Every chunk is added to the md5 hash of the file and the samples within the
+    chunk are decoded to build the waveform pyramid (of the given channel) and the per-channel statistics, so the file
+    is neither read twice nor completely in memory.
+
+    If given, callback(fraction, builder) is called after every chunk with the fraction of the samples read so far and
+    the PyramidBuilder (e.g. to report progress or show the part of the waveform that is already known). Exceptions
+    raised by the callback stop the scan.
+    """
+    md5_hash = hashlib.md5()
+    builder = PyramidBuilder(base_bin_size)
+    statistics = ChannelStatistics(audio_source.n_channels)
+
+    # chunks of the data chunk always contain complete frames
+    frames_per_chunk = max(chunk_size // audio_source.block_align, 1)
+    buffer = bytearray(frames_per_chunk * audio_source.block_align)
+    with open(audio_source.path, 'rb') as f:
+        md5_hash.update(f.read(audio_source.data_offset))
+
+        remaining = len(audio_source) * audio_source.block_align
+        while remaining > 0:
+            view = memoryview(buffer)[:min(len(buffer), remaining)]
+            n_bytes = f.readinto(view)
+            if not n_bytes:
+                break
+            remaining -= n_bytes
+            md5_hash.update(view[:n_bytes])
+
+            frames = audio_source.decode(view[:n_bytes])
+            statistics.feed(frames)
+            builder.feed(frames[:, channel])
+            if callback is not None:
+                callback(builder.n_frames / len(audio_source), builder)
+
+        # everything after the samples (incomplete frames, trailing chunks) is only relevant for the hash
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5_hash.update(chunk)
+
+    return ScanResult(md5_hash.hexdigest(), builder.finish(), statistics)
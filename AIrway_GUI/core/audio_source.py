@@ -0,0 +1,181 @@
+import numpy as np
+import struct
+from pathlib import Path
+
+
+# sub format codes (also used as the first two bytes of the WAVE_FORMAT_EXTENSIBLE sub format GUID)
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class AudioSource:
+    """
+    Class that gives access to the samples of a .wav-file without loading the whole file into memory.
+
+    The RIFF header is parsed once and the PCM payload is memory-mapped, so sample ranges are only read (and decoded)
+    from disk when they are requested. 8, 16 and 32 bit integer PCM as well as 32/64 bit float data are returned as
+    views of the memory map, 24 bit data is decoded on demand to int32 (values in 24 bit range).
+    """
+    def __init__(self, path):
+        self.path = Path(path)
+        self.rate = None
+        self.n_channels = None
+        self.sample_width = None
+        self.format_tag = None
+        self.block_align = None
+        self.data_offset = None
+        self.data_size = None
+
+        self._parse_header()
+        self._data = self._map_data()
+
+    ##################################################################################
+    # Header parsing
+    ##################################################################################
+    def _parse_header(self):
+        """
+        Reads the RIFF chunks of the file until the 'data' chunk is found.
+        """
+        file_size = self.path.stat().st_size
+        with open(self.path, 'rb') as f:
+            riff, _, wave = struct.unpack('<4sI4s', f.read(12))
+            if riff != b'RIFF' or wave != b'WAVE':
+                raise ValueError(f"'{self.path}' is not a RIFF/WAVE file.")
+
+            while True:
+                chunk_header = f.read(8)
+                if len(chunk_header) < 8:
+                    raise ValueError(f"'{self.path}' does not contain a 'data' chunk.")
+                chunk_id, chunk_size = struct.unpack('<4sI', chunk_header)
+
+                if chunk_id == b'fmt ':
+                    self._parse_fmt_chunk(f.read(chunk_size))
+                    f.seek(chunk_size % 2, 1)
+                elif chunk_id == b'data':
+                    if self.format_tag is None:
+                        raise ValueError(f"'{self.path}' has no 'fmt ' chunk before the 'data' chunk.")
+                    self.data_offset = f.tell()
+                    # files > 4 GB (or files that were not finalized) contain an invalid data size
+                    self.data_size = min(chunk_size, file_size - self.data_offset)
+                    return
+                else:
+                    f.seek(chunk_size + chunk_size % 2, 1)
+
+    def _parse_fmt_chunk(self, chunk):
+        format_tag, n_channels, rate, _, block_align, bits_per_sample = struct.unpack('<HHIIHH', chunk[:16])
+        if format_tag == WAVE_FORMAT_EXTENSIBLE:
+            if len(chunk) < 40:
+                raise ValueError(f"'{self.path}' has an invalid WAVE_FORMAT_EXTENSIBLE header.")
+            # the first two bytes of the sub format GUID contain the actual format code
+            format_tag = struct.unpack('<H', chunk[24:26])[0]
+
+        if format_tag not in (WAVE_FORMAT_PCM, WAVE_FORMAT_IEEE_FLOAT):
+            raise ValueError(f"Unsupported wave format {hex(format_tag)} in '{self.path}'.")
+
+        sample_width = block_align // n_channels
+        if format_tag == WAVE_FORMAT_PCM and sample_width not in (1, 2, 3, 4):
+            raise ValueError(f"Unsupported sample width of {bits_per_sample} bits in '{self.path}'.")
+        if format_tag == WAVE_FORMAT_IEEE_FLOAT and sample_width not in (4, 8):
+            raise ValueError(f"Unsupported float sample width of {bits_per_sample} bits in '{self.path}'.")
+
+        self.format_tag = format_tag
+        self.n_channels = n_channels
+        self.rate = rate
+        self.block_align = block_align
+        self.sample_width = sample_width
+
+    def _map_data(self):
+        n_frames = self.data_size // self.block_align
+        if self.sample_width == 3:
+            shape = (n_frames, self.n_channels, 3)
+            dtype = np.uint8
+        else:
+            shape = (n_frames, self.n_channels)
+            dtype = self.dtype
+        if n_frames == 0:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path, dtype=dtype, mode='r', offset=self.data_offset, shape=shape)
+
+    ##################################################################################
+    # Properties
+    ##################################################################################
+    @property
+    def dtype(self):
+        """ The dtype of the decoded samples. """
+        if self.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+            return np.dtype('<f4') if self.sample_width == 4 else np.dtype('<f8')
+        return np.dtype({1: 'u1', 2: '<i2', 3: '<i4', 4: '<i4'}[self.sample_width])
+
+    @property
+    def full_scale(self):
+        """ The minimum and maximum value a sample can have. """
+        if self.format_tag == WAVE_FORMAT_IEEE_FLOAT:
+            return -1.0, 1.0
+        if self.sample_width == 1:
+            return 0, 255
+        bits = 8 * self.sample_width
+        return -2 ** (bits - 1), 2 ** (bits - 1) - 1
+
+    @property
+    def n_frames(self):
+        return self._data.shape[0]
+
+    @property
+    def duration(self):
+        """ Duration of the file in seconds. """
+        return self.n_frames / self.rate
+
+    def __len__(self):
+        return self.n_frames
+
+    ##################################################################################
+    # Reading samples
+    ##################################################################################
+    def read(self, start=0, stop=None, channel=None):
+        """
+        Returns the samples of the frames [start, stop).
+        If channel is None, an array of shape (frames, channels) is returned, else an array of shape (frames,).
+        Except for 24 bit files, the result is a view of the memory map and no data is copied.
+        """
+        start = int(min(max(start, 0), self.n_frames))
+        stop = self.n_frames if stop is None else int(min(max(stop, start), self.n_frames))
+
+        data = self._data[start:stop]
+        if channel is not None:
+            data = data[:, channel]
+        if self.sample_width == 3:
+            return self._decode_24_bit(data)
+        return data
+
+    def read_raw(self, start=0, stop=None):
+        """
+        Returns the frames [start, stop) as they are stored in the file (a view of the memory map, also for 24 bit
+        files), e.g. for writing them to another file in the same format without decoding and copying them.
+        """
+        start = int(min(max(start, 0), self.n_frames))
+        stop = self.n_frames if stop is None else int(min(max(stop, start), self.n_frames))
+        return self._data[start:stop]
+
+    def decode(self, raw):
+        """
+        Decodes raw bytes of the data chunk (starting at a frame boundary) to an array of shape (frames, channels).
+        Incomplete frames at the end are ignored.
+        """
+        n_frames = len(raw) // self.block_align
+        if self.sample_width == 3:
+            data = np.frombuffer(raw, dtype=np.uint8, count=n_frames * self.block_align)
+            return self._decode_24_bit(data.reshape(n_frames, self.n_channels, 3))
+        return np.frombuffer(raw, dtype=self.dtype, count=n_frames * self.n_channels).reshape(n_frames, self.n_channels)
+
+    @staticmethod
+    def _decode_24_bit(data):
+        """ Decodes little endian 24 bit samples (last axis contains the three bytes) to sign extended int32. """
+        samples = (data[..., 0].astype(np.int32)
+                   | (data[..., 1].astype(np.int32) << 8)
+                   | (data[..., 2].astype(np.int32) << 16))
+        return (samples << 8) >> 8
+
+    def close(self):
+        """ Releases the memory map. """
+        self._data = np.zeros((0, self.n_channels), dtype=self.dtype)
@@ -0,0 +1,44 @@
+import numpy as np
+
+
+class ChannelStatistics:
+    """
+    Class that accumulates minimum, maximum and RMS of every channel over consecutive blocks of frames.
+    """
+    def __init__(self, n_channels):
+        self.n_channels = n_channels
+        self.n_frames = 0
+        self.min = np.full(n_channels, np.inf)
+        self.max = np.full(n_channels, -np.inf)
+        self._sum_of_squares = np.zeros(n_channels)
+
+    def feed(self, frames):
+        """
+        Adds a block of frames with shape (frames, channels).
+        """
+        if not len(frames):
+            return
+        self.n_frames += len(frames)
+        self.min = np.minimum(self.min, frames.min(axis=0))
+        self.max = np.maximum(self.max, frames.max(axis=0))
+        frames = frames.astype(np.float64)
+        self._sum_of_squares += np.einsum('ij,ij->j', frames, frames)
+
+    @property
+    def rms(self):
+        if self.n_frames == 0:
+            return np.zeros(self.n_channels)
+        return np.sqrt(self._sum_of_squares / self.n_frames)
+
+    def to_arrays(self):
+        return {'min': self.min, 'max': self.max, 'sum_of_squares': self._sum_of_squares,
+                'n_frames': np.array(self.n_frames)}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        statistics = cls(len(arrays['min']))
+        statistics.min = np.array(arrays['min'])
+        statistics.max = np.array(arrays['max'])
+        statistics._sum_of_squares = np.array(arrays['sum_of_squares'])
+        statistics.n_frames = int(arrays['n_frames'])
+        return statistics
@@ -0,0 +1,13 @@
+import hashlib
+
+
+def get_md5_hash(path, chunk_size=2**22):
+    """
+    Calculates the md5 hash for a specific file.
+    The file is read in chunks, so it is never completely in memory.
+    """
+    md5_hash = hashlib.md5()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            md5_hash.update(chunk)
+    return md5_hash.hexdigest()
@@ -0,0 +1,170 @@
+import concurrent.futures
+import json
+import os
+import struct
+
+import numpy as np
+
+from .audio_source import WAVE_FORMAT_IEEE_FLOAT, WAVE_FORMAT_PCM
+
+
+# file inside of an export folder that records which clips were exported from which file
+MANIFEST_NAME = 'airway_export.json'
+MANIFEST_VERSION = 1
+
+
+class ExportResult:
+    """
+    Number of clips that were written, skipped (already exported with identical content) and removed (exported
+    before, but the annotation does not exist anymore).
+    """
+    def __init__(self, written, skipped, removed):
+        self.written = written
+        self.skipped = skipped
+        self.removed = removed
+
+
+def wav_header(audio_source, n_frames):
+    """ Returns the header of a .wav-file with n_frames frames in the format of the audio source. """
+    format_tag = WAVE_FORMAT_IEEE_FLOAT if audio_source.format_tag == WAVE_FORMAT_IEEE_FLOAT else WAVE_FORMAT_PCM
+    data_size = n_frames * audio_source.block_align
+    return struct.pack('<4sI4s4sIHHIIHH4sI', b'RIFF', 36 + data_size + data_size % 2, b'WAVE', b'fmt ', 16,
+                       format_tag, audio_source.n_channels, audio_source.rate,
+                       audio_source.rate * audio_source.block_align, audio_source.block_align,
+                       8 * audio_source.sample_width, b'data', data_size)
+
+
+def clip_size(audio_source, start, stop):
+    data_size = (stop - start) * audio_source.block_align
+    return 44 + data_size + data_size % 2
+
+
+def write_clip(path, audio_source, start, stop):
+    """
+    Writes the frames [start, stop) to a .wav-file. The frames are written as they are stored in the source file
+    (a slice of the memory map), so they are neither decoded nor copied.
+    """
+    data = audio_source.read_raw(start, stop)
+    with open(path, 'wb') as f:
+        f.write(wav_header(audio_source, len(data)))
+        f.write(data)
+        if data.nbytes % 2:
+            f.write(b'\0')
+
+
+def _load_manifest(path, key):
+    """ Returns the clips of the manifest inside the folder or {} if there is none (or one of another file). """
+    try:
+        with open(os.path.join(path, MANIFEST_NAME)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get('key') != key:
+        return {}
+    return manifest.get('clips', {})
+
+
+def _store_manifest(path, key, clips):
+    tmp_path = os.path.join(path, MANIFEST_NAME + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump({'key': key, 'clips': clips}, f)
+    os.replace(tmp_path, os.path.join(path, MANIFEST_NAME))
+
+
+def export_clips(audio_source, annotations, path, source_hash=None, max_workers=4, callback=None):
+    """
+    Writes every labelled annotation as own .wav-file to path/<class>/<class>_<number>.wav.
+
+    The annotations are grouped by class in one pass and the clips are written by a pool of max_workers threads.
+    Every export folder contains a manifest of the exported clips; when exporting into the same folder again, clips
+    whose file and content (source file and region) did not change are skipped and clips of deleted annotations are
+    removed. If given, callback(fraction) is called whenever clips were finished, exceptions raised by the callback
+    (e.g. Cancelled) stop the export after the clips that are currently written. The manifest is written in any case,
+    so a cancelled export can be continued.
+    """
+    classes = list(annotations.classes)
+    start, stop, label = annotations.start.copy(), annotations.stop.copy(), annotations.label.copy()
+
+    # labelled annotations sorted by class (stable, so the clips of every class keep the order of the table)
+    labelled = np.flatnonzero(label >= 0)
+    order = labelled[np.argsort(label[labelled], kind='stable')]
+    codes = label[order]
+    numbers = np.arange(len(order)) - np.searchsorted(codes, codes, side='left')
+
+    clips = {}
+    for index, number in zip(order, numbers):
+        class_ = classes[label[index]]
+        clips[f'{class_}/{class_}_{number}.wav'] = [int(start[index]), int(stop[index])]
+
+    for class_ in classes:
+        os.makedirs(os.path.join(path, class_), exist_ok=True)
+
+    # clips can only be reused if they were exported from the same file (and the file is known)
+    key = {'version': MANIFEST_VERSION, 'source_hash': source_hash, 'rate': audio_source.rate,
+           'format_tag': audio_source.format_tag, 'n_channels': audio_source.n_channels,
+           'sample_width': audio_source.sample_width}
+    previous_clips = _load_manifest(path, key) if source_hash is not None else {}
+
+    def full_path(name):
+        return os.path.join(path, *name.split('/'))
+
+    exported = {}
+    to_write = []
+    for name, region in clips.items():
+        try:
+            unchanged = (previous_clips.get(name) == region
+                         and os.path.getsize(full_path(name)) == clip_size(audio_source, *region))
+        except OSError:
+            unchanged = False
+        if unchanged:
+            exported[name] = region
+        else:
+            to_write.append(name)
+    n_skipped = len(exported)
+
+    n_removed = 0
+    for name in previous_clips:
+        if name not in clips and os.path.exists(full_path(name)):
+            os.remove(full_path(name))
+            n_removed += 1
+
+    n_written = 0
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+
+        def collect(futures):
+            nonlocal n_written
+            for future in futures:
+                name = pending.pop(future)
+                if not future.cancelled() and future.exception() is None:
+                    exported[name] = clips[name]
+                    n_written += 1
+            # errors while writing are raised after all other finished clips were collected
+            for future in futures:
+                if not future.cancelled() and future.exception() is not None:
+                    raise future.exception()
+
+        try:
+            for name in to_write:
+                # only a few clips are queued at once, so cancelling does not have to wait for all of them
+                if len(pending) >= 4 * max_workers:
+                    finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    collect(finished)
+                    if callback is not None:
+                        callback(len(exported) / len(clips))
+                pending[executor.submit(write_clip, full_path(name), audio_source, *clips[name])] = name
+            while pending:
+                finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                collect(finished)
+                if callback is not None:
+                    callback(len(exported) / len(clips))
+        finally:
+            for future in pending:
+                future.cancel()
+            concurrent.futures.wait(pending)
+            try:
+                collect(list(pending))
+            finally:
+                _store_manifest(path, key, exported)
+
+    return ExportResult(n_written, n_skipped, n_removed)
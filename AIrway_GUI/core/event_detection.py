@@ -0,0 +1,151 @@
+import numpy as np
+
+from .audio_source import AudioSource
+from .process_pool import run_tasks
+
+
+# default settings of the detector (can be overwritten with 'detection' in setup.json), durations in seconds
+DETECTION_DEFAULTS = {
+    # length of the (non-overlapping) analysis frames
+    'frame_length': 0.01,
+    # percentile of the frame energies that is used as noise floor
+    'noise_percentile': 20,
+    # an event starts with a frame that is high_threshold dB above the noise floor and lasts as long as the frames are
+    # at least low_threshold dB above it
+    'high_threshold': 15.0,
+    'low_threshold': 6.0,
+    # events closer than min_gap are merged
+    'min_gap': 0.1,
+    'min_duration': 0.1,
+    # an event needs an onset, i.e. one frame with a spectral flux of at least min_flux (0 ... 1)
+    'min_flux': 0.3,
+    # events with a higher mean zero-crossing rate (0 ... 1) are rejected as noise (white noise has about 0.5)
+    'max_zcr': 0.4,
+}
+
+# number of frames analysed by one task of the process pool
+FRAMES_PER_TASK = 8192
+
+
+class DetectionFeatures:
+    """
+    Short-time features of a whole recording, one value per frame of frame_size samples: energy in dB relative to full
+    scale, normalized spectral flux (0 ... 1) and zero-crossing rate (0 ... 1).
+    """
+    def __init__(self, frame_size, energy, flux, zcr):
+        self.frame_size = frame_size
+        self.energy = energy
+        self.flux = flux
+        self.zcr = zcr
+
+    def __len__(self):
+        return len(self.energy)
+
+
+def detection_settings(setup=None):
+    """ Returns the detection settings of a setup.json completed with the defaults. """
+    settings = dict(DETECTION_DEFAULTS)
+    if setup is not None:
+        settings.update(setup.get('detection', {}))
+    return settings
+
+
+def frame_features(path, channel, first_frame, n_frames, frame_size):
+    """
+    Computes the features of the frames first_frame, ..., first_frame + n_frames - 1 of the audio file (vectorized over
+    all frames). This function runs inside of a worker process.
+    """
+    source = AudioSource(path)
+    low, high = source.full_scale
+    # the frame before the first one is needed for the spectral flux
+    start = max(first_frame - 1, 0) * frame_size
+    stop = (first_frame + n_frames) * frame_size
+    samples = source.read(start, stop, channel=channel).astype(np.float32)
+    samples -= (high + low) / 2
+    samples *= 2 / (high - low)
+    if len(samples) < stop - start:
+        samples = np.concatenate([samples, np.zeros(stop - start - len(samples), dtype=np.float32)])
+    frames = samples.reshape(-1, frame_size)
+    source.close()
+
+    energy = 10 * np.log10(np.einsum('ij,ij->i', frames, frames) / frame_size + 1e-12)
+    signs = np.signbit(frames)
+    crossings = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1)
+    zcr = crossings / (frame_size - 1)
+    magnitudes = np.abs(np.fft.rfft(frames * np.hanning(frame_size).astype(np.float32), axis=1))
+    # positive change of the spectrum relative to the whole spectrum, i.e. about 1 for onsets after silence
+    increase = np.maximum(np.diff(magnitudes, axis=0, prepend=magnitudes[:1]), 0).sum(axis=1)
+    flux = increase / (magnitudes.sum(axis=1) + 1e-9)
+
+    if first_frame > 0:
+        energy, zcr, flux = energy[1:], zcr[1:], flux[1:]
+    return energy.astype(np.float32), flux.astype(np.float32), zcr.astype(np.float32)
+
+
+def compute_features(audio_source, frame_length=DETECTION_DEFAULTS['frame_length'], channel=0, max_workers=None,
+                     callback=None):
+    """
+    Computes the DetectionFeatures of a recording in tasks of FRAMES_PER_TASK frames in a process pool (every process
+    maps the file itself), see run_tasks.
+    """
+    frame_size = max(int(round(frame_length * audio_source.rate)), 2)
+    n_frames = len(audio_source) // frame_size
+    path = str(audio_source.path)
+    tasks = [(path, channel, first, min(FRAMES_PER_TASK, n_frames - first), frame_size)
+             for first in range(0, n_frames, FRAMES_PER_TASK)]
+    results = run_tasks(frame_features, tasks, max_workers=max_workers, callback=callback)
+
+    if not results:
+        return DetectionFeatures(frame_size, *(np.zeros(0, dtype=np.float32) for _ in range(3)))
+    return DetectionFeatures(frame_size, *(np.concatenate(columns) for columns in zip(*results)))
+
+
+def _runs(mask):
+    """ Returns the first and the last + 1 index of every run of True values. """
+    changes = np.diff(np.concatenate([[False], mask, [False]]).astype(np.int8))
+    return np.flatnonzero(changes == 1), np.flatnonzero(changes == -1)
+
+
+def _any_in_runs(mask, starts, stops):
+    """ True for every run [start, stop) that contains a True value of mask. """
+    counts = np.concatenate([[0], np.cumsum(mask)])
+    return counts[stops] > counts[starts]
+
+
+def find_events(features, rate, settings=None):
+    """
+    Returns the start and stop (in samples) of all candidate events in the DetectionFeatures (see DETECTION_DEFAULTS):
+    hysteresis thresholds on the energy above the noise floor, merging of close events, an onset with a high spectral
+    flux, a maximal mean zero-crossing rate and a minimal duration.
+    """
+    settings = settings if settings is not None else DETECTION_DEFAULTS
+    frame_size = features.frame_size
+    if len(features) == 0:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+
+    level = features.energy - np.percentile(features.energy, settings['noise_percentile'])
+    starts, stops = _runs(level >= settings['low_threshold'])
+    keep = _any_in_runs(level >= settings['high_threshold'], starts, stops)
+    starts, stops = starts[keep], stops[keep]
+
+    # events separated by less than min_gap are merged
+    if len(starts):
+        new_event = np.concatenate([[True], starts[1:] - stops[:-1] >= settings['min_gap'] * rate / frame_size])
+        starts, stops = starts[new_event], stops[np.concatenate([new_event[1:], [True]])]
+
+    keep = _any_in_runs(features.flux >= settings['min_flux'], starts, stops)
+    zcr_sums = np.concatenate([[0], np.cumsum(features.zcr, dtype=np.float64)])
+    keep &= (zcr_sums[stops] - zcr_sums[starts]) / np.maximum(stops - starts, 1) <= settings['max_zcr']
+    keep &= (stops - starts) * frame_size >= settings['min_duration'] * rate
+    return starts[keep].astype(np.int64) * frame_size, stops[keep].astype(np.int64) * frame_size
+
+
+def detect_events(audio_source, settings=None, channel=0, max_workers=None, callback=None):
+    """
+    Detects candidate events (e.g. coughs) in a whole recording and returns their start and stop in samples.
+    See compute_features and find_events.
+    """
+    settings = settings if settings is not None else DETECTION_DEFAULTS
+    features = compute_features(audio_source, settings['frame_length'], channel=channel, max_workers=max_workers,
+                                callback=callback)
+    return find_events(features, audio_source.rate, settings)
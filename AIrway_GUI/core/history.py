@@ -0,0 +1,180 @@
+import collections
+import contextlib
+
+import numpy as np
+
+
+INSERTED, CHANGED, REMOVED = 1, 2, 3
+
+
+class _Command:
+    """
+    One entry of the history: the rows first, ..., last were inserted, changed or removed. old and new contain the
+    columns (initial, start, stop, label) of these rows before and after the modification (None if they did not exist).
+    """
+    __slots__ = ('kind', 'first', 'last', 'old', 'new', 'merge_key', 'sealed')
+
+    def __init__(self, kind, first, last, old, new, merge_key):
+        self.kind = kind
+        self.first = first
+        self.last = last
+        self.old = old
+        self.new = new
+        self.merge_key = merge_key
+        self.sealed = merge_key is None
+
+    @property
+    def nbytes(self):
+        return 64 + sum(column.nbytes for columns in (self.old, self.new) if columns is not None for column in columns)
+
+
+class AnnotationHistory:
+    """
+    Class containing the undo/redo history of an AnnotationStore.
+
+    The history observes the store and records every modification as command that only contains the changed rows
+    (indices and old/new values), so undo() and redo() apply the inverse modification through the normal methods of
+    the store (and every observer updates itself incrementally). Modifications made inside of merging(key) are merged
+    with the previous command of the same key and rows until seal() is called, e.g. all updates of one drag of a
+    region become one command. The oldest commands are dropped when the history needs more than max_bytes.
+    Resetting the store (e.g. loading a file) clears the history.
+    """
+    def __init__(self, annotations, max_bytes=16 * 1024 ** 2):
+        self.annotations = annotations
+        self.max_bytes = max_bytes
+        self._undo = collections.deque()
+        self._redo = []
+        self._nbytes = 0
+        self._applying = False
+        self._merge_key = None
+        self._old_rows = None
+        self.annotations.add_observer(self)
+
+    def clear(self):
+        self._undo.clear()
+        self._redo = []
+        self._nbytes = 0
+
+    @property
+    def can_undo(self):
+        return len(self._undo) > 0
+
+    @property
+    def can_redo(self):
+        return len(self._redo) > 0
+
+    @contextlib.contextmanager
+    def merging(self, key):
+        """ Modifications inside of this context are merged with the previous command of the same key. """
+        self._merge_key = key
+        try:
+            yield
+        finally:
+            self._merge_key = None
+
+    def seal(self):
+        """ Ends merging into the last command (e.g. when a drag was finished). """
+        if self._undo:
+            self._undo[-1].sealed = True
+
+    ##################################################################################
+    # Recording
+    ##################################################################################
+    def _rows(self, first, last):
+        return tuple(column[first:last + 1].copy() for column in (self.annotations.initial, self.annotations.start,
+                                                                  self.annotations.stop, self.annotations.label))
+
+    def _push(self, command):
+        top = self._undo[-1] if self._undo else None
+        if command.kind == CHANGED and top is not None and not top.sealed and top.kind == CHANGED and \
+                top.merge_key == command.merge_key and (top.first, top.last) == (command.first, command.last):
+            self._nbytes -= top.nbytes
+            top.new = command.new
+            self._nbytes += top.nbytes
+        else:
+            self._undo.append(command)
+            self._nbytes += command.nbytes
+        self._redo = []
+        # the newest command is always kept
+        while self._nbytes > self.max_bytes and len(self._undo) > 1:
+            self._nbytes -= self._undo.popleft().nbytes
+
+    def annotations_inserted(self, first, last):
+        if not self._applying:
+            self._push(_Command(INSERTED, first, last, None, self._rows(first, last), self._merge_key))
+
+    def annotations_about_to_be_changed(self, first, last):
+        if not self._applying:
+            self._old_rows = self._rows(first, last)
+
+    def annotations_changed(self, first, last):
+        if self._applying or self._old_rows is None:
+            return
+        old, self._old_rows = self._old_rows, None
+        new = self._rows(first, last)
+        # e.g. a region that is set to its current bounds
+        if all(np.array_equal(a, b) for a, b in zip(old, new)):
+            return
+        self._push(_Command(CHANGED, first, last, old, new, self._merge_key))
+
+    def annotations_about_to_be_removed(self, first, last):
+        if not self._applying:
+            self._push(_Command(REMOVED, first, last, self._rows(first, last), None, self._merge_key))
+
+    def annotations_reset(self):
+        if not self._applying:
+            self.clear()
+
+    ##################################################################################
+    # Undo/Redo
+    ##################################################################################
+    def _set_rows(self, first, rows):
+        for offset, (start, stop, label) in enumerate(zip(*(column.tolist() for column in rows[1:]))):
+            index = first + offset
+            if (self.annotations.start[index], self.annotations.stop[index]) != (start, stop):
+                self.annotations.set_bounds(index, start, stop)
+            if self.annotations.label[index] != label:
+                self.annotations.set_label(index, label)
+
+    def _insert_rows(self, first, rows):
+        if first == len(self.annotations):
+            self.annotations.extend(*rows)
+            return
+        for offset, row in enumerate(zip(*(column.tolist() for column in rows))):
+            self.annotations.insert(first + offset, *row)
+
+    def _remove_rows(self, first, last):
+        self.annotations.delete_range(first, last)
+
+    def _apply(self, command, undo):
+        self._applying = True
+        try:
+            if command.kind == CHANGED:
+                self._set_rows(command.first, command.old if undo else command.new)
+            elif (command.kind == INSERTED) == undo:
+                self._remove_rows(command.first, command.last)
+            else:
+                self._insert_rows(command.first, command.new if command.kind == INSERTED else command.old)
+        finally:
+            self._applying = False
+
+    def undo(self):
+        """ Reverts the last command and returns False if there is none. """
+        if not self._undo:
+            return False
+        command = self._undo.pop()
+        self._nbytes -= command.nbytes
+        command.sealed = True
+        self._apply(command, undo=True)
+        self._redo.append(command)
+        return True
+
+    def redo(self):
+        """ Applies the last reverted command again and returns False if there is none. """
+        if not self._redo:
+            return False
+        command = self._redo.pop()
+        self._apply(command, undo=False)
+        self._undo.append(command)
+        self._nbytes += command.nbytes
+        return True
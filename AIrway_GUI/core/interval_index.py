@@ -0,0 +1,177 @@
+import numpy as np
+
+
+class IntervalIndex:
+    """
+    Index over the annotation regions [start, stop] of an AnnotationStore for point, range and nearest queries.
+
+    The regions are kept sorted by start together with the running maximum of their stops. Since the running maximum
+    is monotonic, both ends of the candidate range of a query can be found by binary search, so a query costs
+    O(log n + k) for k candidates (for non-nested regions the candidates are exactly the hits). The index observes
+    the store and is updated incrementally on every modification.
+    """
+    def __init__(self, annotations):
+        self.annotations = annotations
+        self.annotations.add_observer(self)
+        self.rebuild()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def rebuild(self):
+        order = np.argsort(self.annotations.start, kind='stable')
+        self._starts = self.annotations.start[order]
+        self._stops = self.annotations.stop[order]
+        self._ids = order.astype(np.int64)
+        # start of every annotation by its index (needed to find an entry again after the store has changed)
+        self._start_by_id = self.annotations.start.copy()
+        self._update_max_stops(0)
+
+    ##################################################################################
+    # Maintenance
+    ##################################################################################
+    def _update_max_stops(self, position):
+        """ Recomputes the running maximum of the stops from the given position on. """
+        if position == 0:
+            self._max_stops = np.maximum.accumulate(self._stops)
+            return
+        tail = np.maximum.accumulate(self._stops[position:])
+        self._max_stops = np.concatenate([self._max_stops[:position],
+                                          np.maximum(tail, self._max_stops[position - 1])])
+
+    def _position(self, index):
+        """ Returns the position of an annotation inside the sorted arrays. """
+        start = self._start_by_id[index]
+        position = np.searchsorted(self._starts, start, side='left')
+        while self._ids[position] != index:
+            position += 1
+        return position
+
+    def _insert(self, index):
+        start, stop = self.annotations.start[index], self.annotations.stop[index]
+        position = np.searchsorted(self._starts, start, side='right')
+        self._starts = np.insert(self._starts, position, start)
+        self._stops = np.insert(self._stops, position, stop)
+        self._ids = np.insert(self._ids, position, index)
+        self._start_by_id[index] = start
+        return position
+
+    def _remove(self, index):
+        position = self._position(index)
+        self._starts = np.delete(self._starts, position)
+        self._stops = np.delete(self._stops, position)
+        self._ids = np.delete(self._ids, position)
+        return position
+
+    ##################################################################################
+    # Observer methods of the AnnotationStore
+    ##################################################################################
+    def annotations_inserted(self, first, last):
+        if last - first > 64:
+            self.rebuild()
+            return
+        # annotations behind the inserted ones (if they were not appended) move down
+        n = last - first + 1
+        self._ids[self._ids >= first] += n
+        self._start_by_id = np.insert(self._start_by_id, first, np.zeros(n, dtype=np.int64))
+        position = min(self._insert(index) for index in range(first, last + 1))
+        self._update_max_stops(position)
+
+    def annotations_changed(self, first, last):
+        position = len(self._ids)
+        for index in range(first, last + 1):
+            position = min(position, self._remove(index))
+            position = min(position, self._insert(index))
+        self._update_max_stops(position)
+
+    def annotations_about_to_be_removed(self, first, last):
+        if last - first > 64:
+            # many annotations are removed in one pass over the sorted arrays
+            removed = (self._ids >= first) & (self._ids <= last)
+            position = int(np.argmax(removed))
+            self._starts, self._stops, self._ids = self._starts[~removed], self._stops[~removed], self._ids[~removed]
+        else:
+            position = min(self._remove(index) for index in range(first, last + 1))
+        self._update_max_stops(position)
+
+    def annotations_removed(self, first, last):
+        n = last - first + 1
+        self._ids[self._ids > last] -= n
+        self._start_by_id = np.delete(self._start_by_id, np.s_[first:last + 1])
+
+    def annotations_reset(self):
+        self.rebuild()
+
+    ##################################################################################
+    # Queries (all return indices of the AnnotationStore)
+    ##################################################################################
+    def overlapping(self, x_min, x_max):
+        """
+        Returns the annotations that intersect [x_min, x_max], sorted by start.
+        """
+        # all regions in front of first end before x_min, all regions from last on start after x_max
+        first = np.searchsorted(self._max_stops, x_min, side='left')
+        last = np.searchsorted(self._starts, x_max, side='right')
+        if first >= last:
+            return np.zeros(0, dtype=np.int64)
+        hits = self._stops[first:last] >= x_min
+        return self._ids[first:last][hits]
+
+    def at(self, x):
+        """ Returns the annotations that contain the position x. """
+        return self.overlapping(x, x)
+
+    def overlaps_any(self, x_min, x_max):
+        """
+        Returns for each of many ranges [x_min[i], x_max[i]] (array-likes) whether it intersects any annotation.
+        """
+        last = np.searchsorted(self._starts, x_max, side='right')
+        # the latest stop of all regions that start in front of x_max
+        max_stops = self._max_stops[np.maximum(last - 1, 0)] if len(self._ids) else np.zeros(len(last))
+        return (last > 0) & (max_stops >= np.asarray(x_min))
+
+    def nearest(self, x, k=1):
+        """
+        Returns the (up to) k annotations closest to the position x (distance 0 if x is inside the region).
+        """
+        if len(self._ids) == 0 or k <= 0:
+            return np.zeros(0, dtype=np.int64)
+        position = np.searchsorted(self._starts, x, side='right')
+        # the k regions starting next to x give an upper bound for the distance of the k nearest regions
+        candidates = np.arange(max(position - k, 0), min(position + k, len(self._ids)))
+        distances = self._distances(candidates, x)
+        bound = np.partition(distances, min(k, len(distances)) - 1)[min(k, len(distances)) - 1]
+
+        # every other region within this distance has to start in front of x (and reach to x - bound)
+        first = np.searchsorted(self._max_stops, x - bound, side='left')
+        candidates = np.union1d(candidates, np.arange(first, position))
+        candidates = candidates[self._stops[candidates] >= x - bound]
+        distances = self._distances(candidates, x)
+        order = np.argsort(distances, kind='stable')[:k]
+        return self._ids[candidates[order]]
+
+    def _distances(self, positions, x):
+        return np.maximum(np.maximum(self._starts[positions] - x, x - self._stops[positions]), 0)
+
+    def neighbour(self, index, step):
+        """
+        Returns the annotation that starts step positions after (or before, if step is negative) the given
+        annotation or None if there is none.
+        """
+        position = self._position(index) + step
+        if position < 0 or position >= len(self._ids):
+            return None
+        return int(self._ids[position])
+
+    def next_from(self, x, step):
+        """
+        Returns the first annotation starting at or after x (step = +1) or the last one starting before x
+        (step = -1) or None if there is none.
+        """
+        if step > 0:
+            position = np.searchsorted(self._starts, x, side='left')
+        else:
+            position = np.searchsorted(self._starts, x, side='left') - 1
+        if position < 0 or position >= len(self._ids):
+            return None
+        return int(self._ids[position])
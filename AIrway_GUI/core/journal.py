@@ -0,0 +1,291 @@
+import json
+import os
+import struct
+import zlib
+
+import numpy as np
+
+
+JOURNAL_FILE_ENDING = '.journal'
+
+# a journal starts with JOURNAL_MAGIC, the format version and the length of the JSON header (uint32, little endian)
+# and the header. It is followed by frames: payload length and CRC32 of the payload (uint32) and the payload, a
+# sequence of records. A frame that was not written completely (e.g. because of a crash) ends the journal.
+JOURNAL_MAGIC = b'\x89AIRWAYJ'
+JOURNAL_VERSION = 1
+FRAME = struct.Struct('<II')
+
+# every record has the same size; CLASS records are followed by the UTF-8 encoded name (a = number of bytes)
+RECORD = np.dtype([('op', 'u1'), ('pad', 'u1', 3), ('index', '<i4'), ('a', '<i8'), ('b', '<i8'), ('c', '<i8'),
+                   ('d', '<i8')])
+# a = initial, b = start, c = stop, d = label for INSERT and SET
+INSERT, SET, DELETE, RESET, CLASS = 1, 2, 3, 4, 5
+
+
+def journal_path(path):
+    """ Returns the path of the journal belonging to an .airway-file (or an audio file that was not saved yet). """
+    return str(path) + JOURNAL_FILE_ENDING
+
+
+def _read_header(data):
+    if not data.startswith(JOURNAL_MAGIC) or len(data) < len(JOURNAL_MAGIC) + 8:
+        return None, 0
+    version, header_size = struct.unpack_from('<II', data, len(JOURNAL_MAGIC))
+    offset = len(JOURNAL_MAGIC) + 8 + header_size
+    if version != JOURNAL_VERSION or len(data) < offset:
+        return None, 0
+    try:
+        return json.loads(data[len(JOURNAL_MAGIC) + 8:offset].decode('utf-8')), offset
+    except ValueError:
+        return None, 0
+
+
+def _frames(data, offset):
+    """ Yields the payload of every complete frame and the offset behind it. """
+    while offset + FRAME.size <= len(data):
+        size, crc = FRAME.unpack_from(data, offset)
+        payload = data[offset + FRAME.size:offset + FRAME.size + size]
+        if len(payload) < size or zlib.crc32(payload) != crc:
+            return
+        offset += FRAME.size + size
+        yield payload, offset
+
+
+def _read_records(payload):
+    """
+    Returns the operations of one frame as (op, index, data) tuples; consecutive inserts of consecutive rows are
+    combined into one operation whose data are the records (CLASS: data is the name).
+    """
+    operations = []
+    offset = 0
+    while offset < len(payload):
+        first = offset
+        record = np.frombuffer(payload, dtype=RECORD, count=1, offset=offset)[0]
+        offset += RECORD.itemsize
+        op, index = int(record['op']), int(record['index'])
+        if op == INSERT:
+            # only inserts of consecutive rows are one operation (undo can also insert rows in front of others)
+            n_records = 1
+            while offset + RECORD.itemsize <= len(payload) and payload[offset] == INSERT and \
+                    int(np.frombuffer(payload, dtype=RECORD, count=1, offset=offset)[0]['index']) == index + n_records:
+                offset += RECORD.itemsize
+                n_records += 1
+            operations.append((op, index, np.frombuffer(payload, dtype=RECORD, count=n_records, offset=first)))
+        elif op == CLASS:
+            operations.append((op, index, payload[offset:offset + int(record['a'])].decode('utf-8')))
+            offset += int(record['a'])
+        elif op in (SET, DELETE, RESET):
+            operations.append((op, index, record))
+        else:
+            raise ValueError(f'Unknown journal record {op}.')
+    return operations
+
+
+def _check(operations, size):
+    """ Raises a ValueError if the operations do not fit to a store with size annotations. """
+    for op, index, data in operations:
+        if op == INSERT:
+            if not 0 <= index <= size:
+                raise ValueError('Journal does not match the annotations.')
+            size += len(data)
+        elif op in (SET, DELETE):
+            if not 0 <= index < size:
+                raise ValueError('Journal does not match the annotations.')
+            size -= op == DELETE
+        elif op == RESET:
+            size = 0
+
+
+def _apply(annotations, operations):
+    for op, index, data in operations:
+        if op == INSERT and index == len(annotations):
+            annotations.extend(data['a'], data['b'], data['c'], data['d'])
+        elif op == INSERT:
+            for offset, record in enumerate(data):
+                annotations.insert(index + offset, int(record['a']), int(record['b']), int(record['c']),
+                                   int(record['d']))
+        elif op == SET:
+            annotations.set_bounds(index, int(data['b']), int(data['c']))
+            annotations.set_label(index, int(data['d']))
+        elif op == DELETE:
+            annotations.delete(index)
+        elif op == RESET:
+            annotations.clear()
+        elif op == CLASS:
+            annotations.class_code(data)
+
+
+class AnnotationJournal:
+    """
+    Class containing the append-only journal of an AnnotationStore, which makes it possible to recover annotations
+    after a crash without saving the whole project after every change.
+
+    Every modification of the store (insert, change of bounds/label, delete, new class) is appended as small record of
+    fixed size to an in-memory buffer, which is written to the journal file by flush() (e.g. once per second), so the
+    cost of autosaving only depends on the number of changes. The journal belongs to one generation of the .airway-file
+    (written into both headers); after the project was saved, rotate() continues it for the new generation.
+
+    If the file already contains a journal of the same generation and audio file (left behind by a crash), its records
+    are replayed into the store when the journal is created (recovered is the number of replayed modifications).
+    A ValueError is raised if that journal does not fit to the annotations.
+    """
+    def __init__(self, path, annotations, filename, generation=None):
+        self.path = str(path)
+        self.annotations = annotations
+        self.filename = filename
+        self.generation = generation
+        self.recovered = 0
+        self._buffer = []
+        self._n_classes = len(annotations.classes)
+
+        self._file = None
+        valid_size = self._replay()
+        if valid_size:
+            # the journal is continued (after removing a frame that was not written completely)
+            self._file = open(self.path, 'r+b')
+            self._file.truncate(valid_size)
+            self._file.seek(valid_size)
+        else:
+            self._create()
+        self._n_classes = len(annotations.classes)
+        self.annotations.add_observer(self)
+
+    def _header(self):
+        header = json.dumps({'filename': self.filename, 'generation': self.generation}).encode('utf-8')
+        return JOURNAL_MAGIC + struct.pack('<II', JOURNAL_VERSION, len(header)) + header
+
+    def _create(self):
+        self._file = open(self.path, 'w+b')
+        self._file.write(self._header())
+        self._file.flush()
+
+    def _replay(self):
+        """
+        Replays the records of an existing journal of the same generation and returns the size of its valid part
+        (0 if there is no matching journal).
+        """
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except OSError:
+            return 0
+        header, offset = _read_header(data)
+        if header is None or header.get('filename') != self.filename or header.get('generation') != self.generation:
+            return 0
+        operations = []
+        for payload, offset in _frames(data, offset):
+            operations += _read_records(payload)
+        # the journal is only replayed if all of it fits, so the annotations are never changed partially
+        _check(operations, len(self.annotations))
+        _apply(self.annotations, operations)
+        self.recovered = sum(len(data) if op == INSERT else 1 for op, _index, data in operations if op != CLASS)
+        return offset
+
+    ##################################################################################
+    # Records
+    ##################################################################################
+    def _records(self, op, first, last):
+        records = np.zeros(last - first + 1, dtype=RECORD)
+        records['op'] = op
+        records['index'] = np.arange(first, last + 1)
+        if op in (INSERT, SET):
+            records['a'] = self.annotations.initial[first:last + 1]
+            records['b'] = self.annotations.start[first:last + 1]
+            records['c'] = self.annotations.stop[first:last + 1]
+            records['d'] = self.annotations.label[first:last + 1]
+        return records.tobytes()
+
+    def _write_new_classes(self):
+        """ Records the classes that were added to the store (e.g. by loading a file) since the last record. """
+        for name in self.annotations.classes[self._n_classes:]:
+            encoded = name.encode('utf-8')
+            record = np.zeros(1, dtype=RECORD)
+            record['op'] = CLASS
+            record['a'] = len(encoded)
+            self._buffer += [record.tobytes(), encoded]
+        self._n_classes = len(self.annotations.classes)
+
+    def annotations_inserted(self, first, last):
+        self._write_new_classes()
+        self._buffer.append(self._records(INSERT, first, last))
+
+    def annotations_changed(self, first, last):
+        self._write_new_classes()
+        self._buffer.append(self._records(SET, first, last))
+
+    def annotations_removed(self, first, last):
+        # after removing first, the next annotation of the range has the index first
+        self._buffer.append(self._records(DELETE, first, first) * (last - first + 1))
+
+    def annotations_reset(self):
+        self._buffer.append(self._records(RESET, 0, 0))
+
+    ##################################################################################
+    # File
+    ##################################################################################
+    @property
+    def size(self):
+        """ Size of the journal file (without records that were not flushed yet). """
+        return self._file.tell() if self._file is not None else 0
+
+    def flush(self, sync=True):
+        """ Writes the buffered records as one frame to the file (and to the disk if sync is True). """
+        if self._file is None or not self._buffer:
+            return
+        payload = b''.join(self._buffer)
+        self._buffer = []
+        self._file.write(FRAME.pack(len(payload), zlib.crc32(payload)) + payload)
+        self._file.flush()
+        if sync:
+            os.fsync(self._file.fileno())
+
+    def mark(self):
+        """ Writes all buffered records and returns the current end of the journal (see rotate()). """
+        self.flush(sync=False)
+        return self.size
+
+    def rotate(self, path, generation, mark=None):
+        """
+        Continues the journal for a new generation of the project at path (after the annotations were saved to the
+        .airway-file). The records written after mark (the position returned by mark() when the saved annotations
+        were copied) are not contained in the saved file, so they are carried over into the new journal.
+        """
+        self.flush(sync=False)
+        tail = b''
+        if mark is not None:
+            self._file.seek(mark)
+            tail = self._file.read()
+        self._file.close()
+        self._file = None
+        if os.path.abspath(self.path) != os.path.abspath(str(path)):
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+        self.path = str(path)
+        self.generation = generation
+        # the new journal replaces the old one atomically
+        tmp_path = self.path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(self._header() + tail)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.path)
+        self._file = open(self.path, 'r+b')
+        self._file.seek(0, os.SEEK_END)
+
+    def close(self, remove=False):
+        """ Stops journaling (flushing buffered records) and removes the journal file if remove is True. """
+        self.annotations.remove_observer(self)
+        if self._file is None:
+            return
+        if not remove:
+            self.flush()
+        self._file.close()
+        self._file = None
+        if remove:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,293 @@
+import logging
+import os
+import threading
+import time
+import wave
+
+import numpy as np
+
+
+logger = logging.getLogger(__name__)
+
+
+class SoundDeviceSink:
+    """
+    Sink that plays the rendered blocks on an audio device through a callback driven sounddevice.OutputStream.
+    """
+    def __init__(self, device=None, latency='low'):
+        self.device = device
+        self.requested_latency = latency
+        self._stream = None
+
+    @property
+    def latency(self):
+        """ Output latency of the stream in seconds. """
+        return self._stream.latency if self._stream is not None else 0.0
+
+    def start(self, render, rate, channels, blocksize):
+        # imported here, so the engine can be used on machines without PortAudio (with the other sinks)
+        import sounddevice as sd
+
+        def callback(outdata, frames, time_info, status):
+            render(outdata)
+
+        self._stream = sd.OutputStream(samplerate=rate, channels=channels, dtype='float32', blocksize=blocksize,
+                                       device=self.device, latency=self.requested_latency, callback=callback)
+        self._stream.start()
+
+    def stop(self):
+        if self._stream is not None:
+            self._stream.stop()
+            self._stream.close()
+            self._stream = None
+
+
+class NullSink:
+    """
+    Sink without audio device. The blocks are requested by a thread like an audio device would do it (in real time
+    or, if realtime is False, as fast as possible) and discarded. The real time is measured with clock and waited for
+    with sleep.
+    """
+    latency = 0.0
+
+    def __init__(self, realtime=True, clock=time.monotonic, sleep=time.sleep):
+        self.realtime = realtime
+        self.clock = clock
+        self.sleep = sleep
+        self._thread = None
+        self._running = False
+
+    def start(self, render, rate, channels, blocksize):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, args=(render, rate, channels, blocksize), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, render, rate, channels, blocksize):
+        block = np.zeros((blocksize, channels), dtype=np.float32)
+        next_time = self.clock()
+        while self._running:
+            render(block)
+            self.write(block)
+            if self.realtime:
+                next_time += blocksize / rate
+                self.sleep(max(next_time - self.clock(), 0))
+
+    def write(self, block):
+        pass
+
+
+class FileSink(NullSink):
+    """
+    Sink that writes all rendered blocks (including silence while nothing is played) to a 16 bit wav file.
+    """
+    def __init__(self, path, realtime=True, clock=time.monotonic, sleep=time.sleep):
+        super(FileSink, self).__init__(realtime, clock, sleep)
+        self.path = path
+        self._file = None
+
+    def start(self, render, rate, channels, blocksize):
+        self._file = wave.open(str(self.path), 'wb')
+        self._file.setnchannels(channels)
+        self._file.setsampwidth(2)
+        self._file.setframerate(rate)
+        super(FileSink, self).start(render, rate, channels, blocksize)
+
+    def stop(self):
+        super(FileSink, self).stop()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def write(self, block):
+        self._file.writeframes((np.clip(block, -1, 1) * 32767).astype('<i2').tobytes())
+
+
+def default_sink():
+    """
+    Returns the sink used for playback. It can be chosen with the environment variable AIRWAY_AUDIO_SINK
+    ('sounddevice', 'null' or 'file:<path>'), by default the audio device is used if PortAudio is available.
+    """
+    sink = os.environ.get('AIRWAY_AUDIO_SINK', '')
+    if sink == 'null':
+        return NullSink()
+    if sink.startswith('file:'):
+        return FileSink(sink[len('file:'):])
+    if sink == 'sounddevice':
+        return SoundDeviceSink()
+    try:
+        import sounddevice  # noqa: F401
+    except (ImportError, OSError):
+        logger.warning('No audio output available (sounddevice/PortAudio missing), playback is muted.')
+        return NullSink()
+    return SoundDeviceSink()
+
+
+class PlaybackEngine:
+    """
+    Class that plays an AudioSource through a sink.
+
+    The sink calls render() whenever it needs the next block, and the block is converted directly from the (memory
+    mapped) samples into the output buffer, so neither playing the file nor playing a region copies the samples
+    beforehand. There are two independent cursors: the transport (playing the whole file, paused/resumed and moved
+    by seek()) and the region cursor (playing a region once or in a loop, on top of a paused transport).
+    All positions are in frames.
+    """
+    def __init__(self, audio_source, sink=None, blocksize=256):
+        self.audio_source = audio_source
+        self.sink = sink if sink is not None else default_sink()
+        self.blocksize = blocksize
+        self.rate = audio_source.rate
+        self.channels = min(audio_source.n_channels, 2)
+
+        # conversion of the samples to float32 in [-1, 1)
+        if audio_source.dtype.kind == 'f':
+            self._offset, self._scale = 0, 1.0
+        else:
+            min_value, max_value = audio_source.full_scale
+            self._offset = (min_value + max_value + 1) // 2
+            self._scale = float(max_value - self._offset + 1)
+
+        self._lock = threading.Lock()
+        self._started = False
+        self._playing = False
+        self._cursor = 0
+        # position where playing was started/seeked to (the reported position never goes back behind it)
+        self._anchor = 0
+        self._region = None
+        self._region_cursor = 0
+
+    def __len__(self):
+        return len(self.audio_source)
+
+    @property
+    def duration(self):
+        return self.audio_source.duration
+
+    @property
+    def latency(self):
+        """ Output latency of the sink in seconds. """
+        return self.sink.latency
+
+    @property
+    def is_playing(self):
+        return self._playing
+
+    @property
+    def is_region_playing(self):
+        return self._region is not None
+
+    @property
+    def position(self):
+        """
+        Position of the transport that is currently audible (the rendered position minus the output latency).
+        """
+        with self._lock:
+            cursor, anchor, playing = self._cursor, self._anchor, self._playing
+        if not playing:
+            return cursor
+        return max(cursor - int(self.latency * self.rate), anchor)
+
+    @property
+    def region_position(self):
+        """ Audible position inside the region that is played (or None). """
+        with self._lock:
+            region, cursor = self._region, self._region_cursor
+        if region is None:
+            return None
+        start, stop, loop = region
+        position = cursor - int(self.latency * self.rate)
+        if position < start:
+            position = stop - (start - position) % max(stop - start, 1) if loop else start
+        return position
+
+    ##################################################################################
+    # Transport
+    ##################################################################################
+    def _ensure_started(self):
+        if not self._started:
+            self.sink.start(self.render, self.rate, self.channels, self.blocksize)
+            self._started = True
+
+    def play(self):
+        self._ensure_started()
+        with self._lock:
+            if self._cursor >= len(self):
+                self._cursor = 0
+            self._anchor = self._cursor
+            self._region = None
+            self._playing = True
+
+    def pause(self):
+        position = self.position
+        with self._lock:
+            self._playing = False
+            self._cursor = self._anchor = position
+
+    def seek(self, position):
+        with self._lock:
+            self._cursor = self._anchor = int(min(max(position, 0), len(self)))
+
+    def play_region(self, start, stop, loop=False):
+        """
+        Plays the frames [start, stop) (repeatedly if loop is True). Does nothing while the transport is playing.
+        """
+        start, stop = int(max(start, 0)), int(min(stop, len(self)))
+        if self._playing or stop <= start:
+            return
+        self._ensure_started()
+        with self._lock:
+            self._region = (start, stop, loop)
+            self._region_cursor = start
+
+    def stop_region(self):
+        with self._lock:
+            self._region = None
+
+    def close(self):
+        with self._lock:
+            self._playing = False
+            self._region = None
+        if self._started:
+            self.sink.stop()
+            self._started = False
+
+    ##################################################################################
+    # Rendering (called by the sink, usually from its own thread)
+    ##################################################################################
+    def render(self, outdata):
+        """ Fills the output buffer of shape (frames, channels) with the next block. """
+        outdata.fill(0)
+        with self._lock:
+            if self._region is not None:
+                start, stop, loop = self._region
+                self._region_cursor, finished = self._fill(outdata, self._region_cursor, start, stop, loop)
+                if finished:
+                    self._region = None
+            elif self._playing:
+                self._cursor, finished = self._fill(outdata, self._cursor, 0, len(self), False)
+                if finished:
+                    self._playing = False
+
+    def _fill(self, outdata, cursor, start, stop, loop):
+        """ Writes the frames from cursor on into outdata and returns the new cursor and whether stop was reached. """
+        written = 0
+        while written < len(outdata):
+            n = min(len(outdata) - written, stop - cursor)
+            if n <= 0:
+                if not loop:
+                    return cursor, True
+                cursor = start
+                continue
+            samples = self.audio_source.read(cursor, cursor + n)[:, :self.channels]
+            out = outdata[written:written + n]
+            np.subtract(samples, self._offset, out=out, dtype=np.float32, casting='unsafe')
+            out *= 1 / self._scale
+            cursor += n
+            written += n
+        return cursor, cursor >= stop and not loop
@@ -0,0 +1,84 @@
+import numpy as np
+
+from .annotation_store import UNLABELLED
+
+
+class Predictions:
+    """
+    Class containing the labels proposed by a scorer for the annotations of an AnnotationStore: the predicted class
+    code (UNLABELLED if there is no prediction) and its confidence (NaN if there is no prediction) of every annotation.
+
+    Predictions are only proposals and are not saved. They observe the store and stay aligned with its rows; the
+    prediction of an annotation is dropped when the annotation is modified. Observers are informed through
+    predictions_changed(first, last) and predictions_reset().
+    """
+    def __init__(self, annotations):
+        self.annotations = annotations
+        self.annotations.add_observer(self)
+        self._observers = []
+        self.clear()
+
+    def add_observer(self, observer):
+        self._observers.append(observer)
+
+    def remove_observer(self, observer):
+        self._observers.remove(observer)
+
+    def _notify(self, method, *args):
+        for observer in list(self._observers):
+            function = getattr(observer, method, None)
+            if function is not None:
+                function(*args)
+
+    def clear(self):
+        self.predicted = np.full(len(self.annotations), UNLABELLED, dtype=np.int16)
+        self.confidence = np.full(len(self.annotations), np.nan, dtype=np.float32)
+        self._notify('predictions_reset')
+
+    def __len__(self):
+        return int(np.count_nonzero(self.predicted != UNLABELLED))
+
+    def set(self, result):
+        """
+        Sets the predictions of a PredictionResult. Events are found again by their region, so annotations that were
+        modified or removed in the meantime are skipped. Returns the number of annotations that got a prediction.
+        """
+        return self.propose(result.start, result.stop, result.predicted, result.confidence)
+
+    def propose(self, start, stop, predicted, confidence):
+        """
+        Sets the predicted class codes and confidences of the annotations with the regions [start, stop) (arrays,
+        predicted and confidence can also be single values). Returns the number of annotations that were found.
+        """
+        start, stop = np.asarray(start), np.asarray(stop)
+        predicted = np.broadcast_to(predicted, start.shape)
+        confidence = np.broadcast_to(confidence, start.shape)
+        rows = {region: row for row, region in enumerate(zip(self.annotations.start.tolist(),
+                                                              self.annotations.stop.tolist()))}
+        indices = np.array([rows.get(region, -1) for region in zip(start.tolist(), stop.tolist())], dtype=np.int64)
+        found = indices >= 0
+        indices = indices[found]
+        self.predicted[indices] = predicted[found]
+        self.confidence[indices] = confidence[found]
+        if len(indices):
+            self._notify('predictions_changed', int(indices.min()), int(indices.max()))
+        return len(indices)
+
+    ##################################################################################
+    # Observer methods of the AnnotationStore
+    ##################################################################################
+    def annotations_inserted(self, first, last):
+        n = last - first + 1
+        self.predicted = np.insert(self.predicted, first, np.full(n, UNLABELLED, dtype=np.int16))
+        self.confidence = np.insert(self.confidence, first, np.full(n, np.nan, dtype=np.float32))
+
+    def annotations_changed(self, first, last):
+        self.predicted[first:last + 1] = UNLABELLED
+        self.confidence[first:last + 1] = np.nan
+
+    def annotations_removed(self, first, last):
+        self.predicted = np.delete(self.predicted, np.s_[first:last + 1])
+        self.confidence = np.delete(self.confidence, np.s_[first:last + 1])
+
+    def annotations_reset(self):
+        self.clear()
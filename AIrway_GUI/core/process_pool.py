@@ -0,0 +1,39 @@
+import concurrent.futures
+import multiprocessing
+import os
+
+
+def run_tasks(function, tasks, max_workers=None, callback=None, result_callback=None):
+    """
+    Calls function(*arguments) for all argument tuples in tasks in a process pool and returns the results in the order
+    of the tasks. With one worker or one task, everything runs in this process. callback(fraction) is called after
+    every finished task; if it raises an exception (e.g. because the user cancelled), the remaining tasks are cancelled.
+    result_callback(index, result) is called with the result of every finished task (in the order they finish).
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    results = [None] * len(tasks)
+    if max_workers == 1 or len(tasks) <= 1:
+        for idx, arguments in enumerate(tasks):
+            results[idx] = function(*arguments)
+            if result_callback is not None:
+                result_callback(idx, results[idx])
+            if callback is not None:
+                callback((idx + 1) / len(tasks))
+        return results
+
+    # worker processes are spawned, forking a process with running threads (e.g. the GUI) is not safe
+    with concurrent.futures.ProcessPoolExecutor(max_workers=min(max_workers, len(tasks)),
+                                                mp_context=multiprocessing.get_context('spawn')) as executor:
+        futures = {executor.submit(function, *arguments): idx for idx, arguments in enumerate(tasks)}
+        try:
+            for n_finished, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                results[futures[future]] = future.result()
+                if result_callback is not None:
+                    result_callback(futures[future], results[futures[future]])
+                if callback is not None:
+                    callback(n_finished / len(tasks))
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+    return results
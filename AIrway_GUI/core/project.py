@@ -0,0 +1,279 @@
+import json
+import os
+import struct
+import uuid
+from pathlib import Path
+
+import numpy as np
+
+from .annotation_export import export_annotations
+from .annotation_store import UNLABELLED, AnnotationStore
+from .audio_cache import AudioCache
+from .audio_scan import scan_audio
+from .audio_source import AudioSource
+from .class_statistics import ClassStatistics
+from .clip_export import export_clips
+from .event_detection import detect_events, detection_settings
+from .history import AnnotationHistory
+from .interval_index import IntervalIndex
+from .journal import AnnotationJournal, journal_path
+from .predictions import Predictions
+from .project_file import write_project_file
+from .scoring import PredictionJob
+from .similarity import SimilarityCache, build_similarity_index, similarity_settings
+from .spectrogram import Spectrogram
+from .waveform_pyramid import PyramidBuilder
+
+
+def load_setup(path=None):
+    """ Loads a setup.json (classes, shortcuts and export settings); by default the one of the package. """
+    if path is None:
+        path = Path(__file__).parent.parent / 'setup.json'
+    with open(path) as f:
+        return json.load(f)
+
+
+class Project:
+    """
+    Class containing one annotated audio file without any GUI: the memory-mapped audio source, the annotations with
+    their interval index and class statistics, the results of scanning the file (MD5 hash, waveform pyramid and
+    channel statistics) and the tiled spectrogram of channel 0.
+
+    The GUI (DataHandler and the widgets) observes the AnnotationStore of a project; scripts and worker processes can
+    use a project directly, e.g. to load an .airway-file and export it.
+    """
+    def __init__(self, path, setup=None, use_cache=True):
+        self.path = Path(path)
+        self.setup = setup if setup is not None else load_setup()
+        self.file_hash = None
+        self.pyramid = None
+        self.statistics = None
+        # generation of the .airway-file the annotations were loaded from/saved to and the journal of all changes since
+        self.generation = None
+        self.journal = None
+
+        try:
+            self.audio_source = AudioSource(self.path)
+        except (OSError, ValueError, struct.error):
+            raise Exception(f"Can't load the file. ({self.path})")
+        self.audio_rate = self.audio_source.rate
+
+        # store that saves all annotations and an index of their regions (for hit-testing and range queries)
+        self.annotations = AnnotationStore(self.setup['classes'])
+        self.interval_index = IntervalIndex(self.annotations)
+        # per-class counts/durations, updated with every modification
+        self.class_statistics = ClassStatistics(self.annotations)
+        # undo/redo of all modifications
+        self.history = AnnotationHistory(self.annotations)
+        # labels proposed by a scorer (not saved)
+        self.predictions = Predictions(self.annotations)
+        # log-mel spectrogram of the whole file for finding similar events, built by build_similarity_index()
+        self.similarity_index = None
+
+        # file hash, min/max envelope of channel 0 and channel statistics are taken from the cache or computed by
+        # scan() and reused for the whole session
+        self._cache = AudioCache() if use_cache else None
+        entry = self._cache.load(self.audio_source) if self._cache is not None else None
+        if entry is not None:
+            self.set_scan_result(entry)
+        else:
+            self.pyramid = PyramidBuilder().finish()
+
+        # spectrogram tiles are computed on request (only for the parts of the file that are shown); the spectrogram
+        # and its threads are only created when it is used (scripts and worker processes usually don't)
+        self._spectrogram = None
+
+    @property
+    def spectrogram(self):
+        if self._spectrogram is None:
+            self._spectrogram = Spectrogram(self.audio_source)
+        return self._spectrogram
+
+    def close_spectrogram(self):
+        """ Stops the threads computing spectrogram tiles (if the spectrogram was used). """
+        if self._spectrogram is not None:
+            self._spectrogram.close()
+
+    def close(self):
+        self.close_journal()
+        self.close_spectrogram()
+        self.audio_source.close()
+
+    ##################################################################################
+    # Scanning
+    ##################################################################################
+    @property
+    def is_scanned(self):
+        """ True if the file hash, the waveform pyramid and the statistics are available. """
+        return self.file_hash is not None
+
+    def scan(self, callback=None):
+        """
+        Computes file hash, waveform pyramid and channel statistics in one pass (see scan_audio), stores them in the
+        cache and returns the ScanResult. The result is not set, call set_scan_result() afterwards (e.g. in the
+        thread that owns the project).
+        """
+        result = scan_audio(self.audio_source, callback=callback)
+        if self._cache is not None:
+            self._cache.store(self.audio_source, result.file_hash, result.pyramid, result.statistics)
+        return result
+
+    def set_scan_result(self, result):
+        """ Sets the result of scan() (or of a cache entry). """
+        self.file_hash = result.file_hash
+        self.pyramid = result.pyramid
+        self.statistics = result.statistics
+
+    ##################################################################################
+    # Load/Save/Export
+    ##################################################################################
+    def load_annotations(self, project_file):
+        """ Replaces the annotations by the ones of a ProjectFile. """
+        self.annotations.load_columns(project_file.initial, project_file.start, project_file.stop,
+                                      project_file.label, project_file.classes)
+        self.generation = project_file.generation
+
+    def begin_save(self, path):
+        """
+        Returns a SaveJob with a snapshot of the annotations, which can be written in another thread while the
+        annotations are modified further. Call finish_save() with the job after it was run.
+        """
+        return SaveJob(self, path)
+
+    def finish_save(self, job):
+        """
+        Makes the saved file the current generation; the journal is continued next to it (containing only the changes
+        made after the snapshot was taken).
+        """
+        self.generation = job.generation
+        if self.journal is not None:
+            self.journal.rotate(journal_path(job.path), job.generation, job.journal_mark)
+
+    def save(self, path):
+        """ Saves the annotations to an .airway-file (the audio file has to be scanned before). """
+        self.finish_save(self.begin_save(path).run())
+
+    def export_annotations(self, path, extra_columns=None):
+        """
+        Exports the annotations to a .csv-file (or .parquet/.feather-file, see export_annotations). By default,
+        the additional columns configured with 'export_columns' in setup.json are exported.
+        """
+        if extra_columns is None:
+            extra_columns = self.setup.get('export_columns', [])
+        export_annotations(self.annotations, self.audio_rate, path, extra_columns=extra_columns)
+
+    def export_clips(self, path, callback=None, max_workers=4):
+        """ Saves each labelled annotation in an own .wav-file (see export_clips). """
+        return export_clips(self.audio_source, self.annotations, path, source_hash=self.file_hash,
+                            max_workers=max_workers, callback=callback)
+
+    ##################################################################################
+    # Detection
+    ##################################################################################
+    def detect_events(self, callback=None, max_workers=None):
+        """
+        Detects candidate events in the whole audio file with the 'detection' settings of setup.json (see
+        detect_events) and returns their start and stop in samples. The annotations are not modified, so this can run
+        in another thread; call add_candidates() with the result afterwards.
+        """
+        return detect_events(self.audio_source, detection_settings(self.setup), max_workers=max_workers,
+                             callback=callback)
+
+    def add_candidates(self, start, stop):
+        """
+        Adds all candidate events that do not overlap an existing annotation as unlabelled annotations (in one batch)
+        and returns their number.
+        """
+        new = ~self.interval_index.overlaps_any(start, stop)
+        start, stop = np.asarray(start)[new], np.asarray(stop)[new]
+        if len(start):
+            self.annotations.extend(start, start, stop, np.full(len(start), UNLABELLED))
+        return len(start)
+
+    def begin_prediction(self):
+        """
+        Returns a PredictionJob for all unlabelled annotations (with the scorer configured in setup.json), which can be
+        run in another thread. Set its result with predictions.set() afterwards.
+        """
+        return PredictionJob(self)
+
+    def build_similarity_index(self, callback=None, max_workers=None):
+        """
+        Builds the SimilarityIndex of the audio file with the 'similarity' settings of setup.json (or loads it from
+        the cache if the file was scanned) and returns it. The annotations are not used, so this can run in another
+        thread.
+        """
+        self.similarity_index = build_similarity_index(self.audio_source, similarity_settings(self.setup),
+                                                       file_hash=self.file_hash,
+                                                       cache=SimilarityCache() if self._cache is not None else None,
+                                                       max_workers=max_workers, callback=callback)
+        return self.similarity_index
+
+    def find_similar(self, start, stop, k=None):
+        """
+        Returns the start, stop and similarity of the (up to) k regions that are most similar to the region
+        [start, stop) and do not overlap any annotation (k and the minimal similarity are taken from setup.json).
+        build_similarity_index() has to be called first.
+        """
+        settings = similarity_settings(self.setup)
+        return self.similarity_index.search(start, stop, k if k is not None else settings['top_k'],
+                                            settings['min_similarity'], exclude=self.interval_index.overlaps_any)
+
+    def add_similar(self, start, stop, similarity, label=UNLABELLED):
+        """
+        Adds the regions found by find_similar as unlabelled annotations (see add_candidates). If a label is given, it
+        is proposed for them with their similarity as confidence. Returns the number of added annotations.
+        """
+        n_added = self.add_candidates(start, stop)
+        if label != UNLABELLED:
+            self.predictions.propose(start, stop, label, similarity)
+        return n_added
+
+    ##################################################################################
+    # Journal
+    ##################################################################################
+    def start_journal(self, project_path=None):
+        """
+        Starts recording all changes of the annotations in the journal next to the .airway-file (or next to the
+        audio file if the project was not saved yet). Changes left in that journal by a crash are replayed first;
+        returns the number of recovered changes.
+        """
+        path = journal_path(project_path if project_path is not None else self.path)
+        try:
+            self.journal = AnnotationJournal(path, self.annotations, self.path.name, self.generation)
+        except ValueError:
+            # a journal that does not fit to the annotations is kept for manual inspection
+            os.replace(path, path + '.invalid')
+            self.journal = AnnotationJournal(path, self.annotations, self.path.name, self.generation)
+        # recovered changes can not be undone
+        self.history.clear()
+        return self.journal.recovered
+
+    def close_journal(self, remove=False):
+        """ Stops journaling; remove=True discards the journal (the changes were saved or should be dropped). """
+        if self.journal is not None:
+            self.journal.close(remove=remove)
+            self.journal = None
+
+
+class SaveJob:
+    """
+    Class containing everything that is saved to an .airway-file: a snapshot of the annotations, the file hash and the
+    new generation of the file. run() only uses the job itself, so it can be executed by a worker thread.
+    """
+    def __init__(self, project, path):
+        self.path = path
+        self.filename = project.path.name
+        self.file_hash = project.file_hash
+        self.sample_rate = project.audio_rate
+        # every save is a new generation of the file
+        self.generation = uuid.uuid4().hex
+        self.snapshot = project.annotations.snapshot()
+        # changes after this position of the journal are not contained in the snapshot
+        self.journal_mark = project.journal.mark() if project.journal is not None else None
+
+    def run(self):
+        """ Writes the snapshot to the file (atomically) and returns the job. """
+        write_project_file(self.path, self.filename, self.file_hash, self.sample_rate, self.snapshot,
+                           generation=self.generation)
+        return self
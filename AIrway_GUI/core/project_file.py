@@ -0,0 +1,163 @@
+import json
+import os
+import struct
+
+import numpy as np
+
+from .annotation_store import AnnotationStore
+
+
+PROJECT_FILE_ENDING = '.airway'
+
+# .airway-files (version 2) start with MAGIC, followed by the format version and the length of the JSON header
+# (both uint32, little endian), the header and the columns of the annotations (typed little endian arrays, every
+# column starts at a multiple of COLUMN_ALIGNMENT bytes after the start of the file)
+MAGIC = b'\x89AIRWAY\n'
+FORMAT_VERSION = 2
+COLUMN_ALIGNMENT = 8
+COLUMNS = (('initial', '<i8'), ('start', '<i8'), ('stop', '<i8'), ('label', '<i2'))
+# version 1 files are HDF5 files written by flammkuchen (a pickled pandas DataFrame)
+HDF5_MAGIC = b'\x89HDF\r\n\x1a\n'
+
+
+class ProjectFile:
+    """
+    Content of an .airway-file: the name of the annotated audio file (in the same directory), its MD5 hash and sample
+    rate and the columns of the annotations (initial position and region [start, stop) in samples, label as code
+    into classes or UNLABELLED). version is the format version the file was read from, generation identifies the
+    save the file was written by (used for matching the annotation journal, None for version 1 files).
+    """
+    def __init__(self, filename, file_hash, sample_rate, initial, start, stop, label, classes, version=FORMAT_VERSION,
+                 generation=None):
+        self.filename = filename
+        self.file_hash = file_hash
+        self.sample_rate = sample_rate
+        self.initial = initial
+        self.start = start
+        self.stop = stop
+        self.label = label
+        self.classes = classes
+        self.version = version
+        self.generation = generation
+
+    def __len__(self):
+        return len(self.start)
+
+
+def _aligned(offset):
+    return -(-offset // COLUMN_ALIGNMENT) * COLUMN_ALIGNMENT
+
+
+def read_project_file(path):
+    """
+    Reads an .airway-file and returns it as ProjectFile. Version 2 files are read with one read and their columns
+    are used without any per-annotation work; version 1 files are migrated while reading (see _read_version_1).
+    """
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data.startswith(HDF5_MAGIC):
+        return _read_version_1(path)
+    if not data.startswith(MAGIC) or len(data) < len(MAGIC) + 8:
+        raise ValueError(f'"{os.path.basename(path)}" is not an .airway-file.')
+
+    version, header_size = struct.unpack_from('<II', data, len(MAGIC))
+    if version > FORMAT_VERSION:
+        raise ValueError(f'"{os.path.basename(path)}" was saved by a newer version of AIrway (format version '
+                         f'{version}), please update AIrway.')
+    header_offset = len(MAGIC) + 8
+    try:
+        header = json.loads(data[header_offset:header_offset + header_size].decode('utf-8'))
+        columns = {}
+        for column in header['columns']:
+            columns[column['name']] = np.frombuffer(data, dtype=column['dtype'], count=header['n_annotations'],
+                                                    offset=column['offset'])
+        label = columns['label']
+        if len(label) and (label.min() < -1 or label.max() >= len(header['classes'])):
+            raise ValueError('invalid class codes')
+        return ProjectFile(header['filename'], header['file_hash'], header['sample_rate'], columns['initial'],
+                           columns['start'], columns['stop'], label, header['classes'], version,
+                           header.get('generation'))
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError(f'"{os.path.basename(path)}" is damaged ({e}).')
+
+
+def _read_version_1(path):
+    """
+    Reads a version 1 file (DataFrame with the columns Initial, From, To and Event saved with flammkuchen). These
+    files do not contain the sample rate. Only use this for files from trusted sources, since they are unpickled.
+    """
+    # flammkuchen (and PyTables) is only imported when needed, since loading it takes longer than reading a file
+    import flammkuchen as fl
+
+    dict_ = fl.load(str(path))
+    df = dict_['DataFrame']
+    names = df['Event'].fillna('').astype(str).to_numpy()
+    classes, label = np.unique(names, return_inverse=True)
+    classes = classes.tolist()
+    if classes and classes[0] == '':
+        # '' (unlabelled) is the smallest name
+        classes = classes[1:]
+        label = label - 1
+    return ProjectFile(dict_['Filename'], dict_['FileHash'], None, df['Initial'].to_numpy(), df['From'].to_numpy(),
+                       df['To'].to_numpy(), label, classes, version=1)
+
+
+def write_project_file(path, filename, file_hash, sample_rate, annotations, generation=None):
+    """
+    Writes the annotations of an AnnotationStore (or an AnnotationSnapshot) to an .airway-file (version 2). The file
+    is replaced atomically.
+    """
+    n = len(annotations)
+    header = {'filename': filename, 'file_hash': file_hash, 'sample_rate': sample_rate, 'generation': generation,
+              'n_annotations': n, 'classes': list(annotations.classes), 'columns': []}
+
+    # the offsets of the columns depend on the size of the header, the header is padded with spaces to the size
+    # that was used for computing them
+    header_size = 0
+    while True:
+        offset = _aligned(len(MAGIC) + 8 + header_size)
+        header['columns'] = []
+        for name, dtype in COLUMNS:
+            header['columns'].append({'name': name, 'dtype': dtype, 'offset': offset})
+            offset = _aligned(offset + n * np.dtype(dtype).itemsize)
+        header_bytes = json.dumps(header).encode('utf-8')
+        if len(header_bytes) <= header_size:
+            break
+        header_size = len(header_bytes)
+    header_bytes = header_bytes.ljust(header_size)
+
+    # the file is written next to the old one and replaces it atomically, so it is complete even after a crash
+    tmp_path = str(path) + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(MAGIC + struct.pack('<II', FORMAT_VERSION, len(header_bytes)) + header_bytes)
+            for column in header['columns']:
+                f.write(b'\0' * (column['offset'] - f.tell()))
+                f.write(np.ascontiguousarray(getattr(annotations, column['name']), dtype=column['dtype']).tobytes())
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def migrate_project_file(path, sample_rate, backup=True):
+    """
+    Converts a version 1 file to version 2 (keeping the old file as <name>.airway.v1 if backup is True). Version 1
+    files do not contain the sample rate, so it has to be given (the rate of the audio file). Returns False if the
+    file already has the current version.
+    """
+    if sample_rate is None or sample_rate <= 0:
+        raise ValueError(f'Invalid sample rate {sample_rate} for converting "{os.path.basename(path)}".')
+    project_file = read_project_file(path)
+    if project_file.version == FORMAT_VERSION:
+        return False
+    annotations = AnnotationStore(project_file.classes)
+    annotations.load_columns(project_file.initial, project_file.start, project_file.stop, project_file.label,
+                             project_file.classes)
+    if backup:
+        os.replace(path, str(path) + '.v1')
+    write_project_file(path, project_file.filename, project_file.file_hash, sample_rate, annotations)
+    return True
@@ -0,0 +1,305 @@
+import concurrent.futures
+import hashlib
+import importlib
+import json
+import multiprocessing
+from pathlib import Path
+
+import numpy as np
+
+from .annotation_store import UNLABELLED
+from .audio_cache import cache_directory, read_cache_file, write_cache_file
+from .audio_source import AudioSource
+
+
+# scorer that is used if setup.json does not configure one
+DEFAULT_SCORER = 'AIrway_GUI.core.scoring:BaselineScorer'
+
+
+class Scorer:
+    """
+    Base class of scorer plugins that propose class labels for events.
+
+    A scorer is created with the classes of the setup.json, the sample rate and the full scale (minimum and maximum
+    sample value) of the recording and the options configured in setup.json. score() receives batches of up to
+    batch_size clips and returns their class probabilities. If window_length (in seconds) is set, every clip is a
+    window of exactly this length: events are covered by windows sliding with hop_length and the probabilities of an
+    event are the mean of its windows. Otherwise every clip is one whole event. The clips are read-only views of the
+    memory-mapped audio file (one channel, samples in the format of the file), so they must not be modified.
+
+    Scorers that learn from the labelled events of the recording set trainable; fit() is then called with their clips
+    before scoring. Subclasses have to be importable by name, since the scorer runs in a worker process.
+    """
+    window_length = None
+    hop_length = None
+    batch_size = 64
+    trainable = False
+
+    def __init__(self, classes, rate, full_scale, **options):
+        self.classes = list(classes)
+        self.rate = rate
+        self.full_scale = full_scale
+        self.options = options
+
+    def fit(self, clips, labels):
+        """ Learns from the clips of labelled events (labels are class codes). """
+
+    def score(self, clips):
+        """ Returns an array of shape (len(clips), len(classes)) with the class probabilities of each clip. """
+        raise NotImplementedError
+
+
+class BaselineScorer(Scorer):
+    """
+    Scorer without any dependencies besides numpy (e.g. for tests): a nearest class centroid classifier on the log
+    energies of n_bands logarithmically spaced frequency bands of each window, learnt from the labelled events of the
+    recording. Classes without labelled events get a probability of 0.
+    """
+    window_length = 0.5
+    hop_length = 0.25
+    batch_size = 256
+    trainable = True
+
+    def __init__(self, classes, rate, full_scale, n_bands=24, **options):
+        super(BaselineScorer, self).__init__(classes, rate, full_scale, **options)
+        self.n_bands = n_bands
+        self._centroids = None
+        self._known = None
+        self._scale = None
+
+    def features(self, clips):
+        samples = np.stack(clips).astype(np.float32)
+        low, high = self.full_scale
+        samples -= (high + low) / 2
+        power = np.abs(np.fft.rfft(samples * np.hanning(samples.shape[1]).astype(np.float32), axis=1)) ** 2
+        # band edges from 50 Hz to the Nyquist frequency
+        frequencies = np.geomspace(50, self.rate / 2, self.n_bands + 1)
+        edges = np.unique(np.searchsorted(np.fft.rfftfreq(samples.shape[1], 1 / self.rate), frequencies))
+        bands = np.log10(np.add.reduceat(power, edges[:-1], axis=1) + 1e-12)
+        # the shape of the spectrum and not the level of the event is compared
+        return bands - bands.mean(axis=1, keepdims=True)
+
+    def fit(self, clips, labels):
+        if len(clips) == 0:
+            raise ValueError('There are no labelled events to learn from.')
+        features = self.features(clips)
+        labels = np.asarray(labels)
+        self._known = np.unique(labels)
+        self._centroids = np.stack([features[labels == code].mean(axis=0) for code in self._known])
+        self._scale = features.std(axis=0) + 1e-6
+
+    def score(self, clips):
+        features = self.features(clips) / self._scale
+        distances = ((features[:, None, :] - (self._centroids / self._scale)[None, :, :]) ** 2).mean(axis=2)
+        logits = -distances
+        logits -= logits.max(axis=1, keepdims=True)
+        weights = np.exp(logits)
+        probabilities = np.zeros((len(clips), len(self.classes)))
+        probabilities[:, self._known] = weights / weights.sum(axis=1, keepdims=True)
+        return probabilities
+
+
+def load_scorer(name):
+    """ Returns the scorer class given as 'module:ClassName'. """
+    module_name, _, class_name = name.partition(':')
+    scorer = getattr(importlib.import_module(module_name), class_name, None)
+    if not (isinstance(scorer, type) and issubclass(scorer, Scorer)):
+        raise ValueError(f"'{name}' is not a scorer.")
+    return scorer
+
+
+def event_windows(start, stop, window_frames, hop_frames, n_frames):
+    """
+    Returns the windows (start and stop arrays) covering each event and the index of the event of every window.
+    Events shorter than a window get one centered window; windows are kept inside of the file.
+    """
+    start, stop = np.asarray(start, dtype=np.int64), np.asarray(stop, dtype=np.int64)
+    if window_frames is None:
+        return start, stop, np.arange(len(start))
+    counts = np.maximum(-(-(stop - start - window_frames) // hop_frames), 0) + 1
+    events = np.repeat(np.arange(len(start)), counts)
+    offsets = np.arange(len(events)) - np.repeat(np.cumsum(counts) - counts, counts)
+    window_start = np.where(counts[events] == 1, (start + stop)[events] // 2 - window_frames // 2,
+                            start[events] + offsets * hop_frames)
+    # the last window of a long event ends with the event
+    window_start = np.minimum(window_start, np.maximum(stop[events] - window_frames, start[events]))
+    window_start = np.clip(window_start, 0, max(n_frames - window_frames, 0))
+    return window_start, window_start + window_frames, events
+
+
+class PredictionCache:
+    """
+    Class that persists the class probabilities of scored windows, keyed by the hash of the audio file, the scorer
+    (including its options and, for trainable scorers, the labelled events it learnt from) and the window.
+    """
+    def __init__(self, directory=None):
+        self.directory = Path(directory) if directory is not None else cache_directory() / 'predictions'
+
+    def _path(self, file_hash, scorer_key):
+        return self.directory / f'{file_hash}_{scorer_key}.npz'
+
+    def load(self, file_hash, scorer_key):
+        """ Returns a dict (window start, window stop) -> probabilities. """
+        def read(arrays):
+            return {(start, stop): probabilities for start, stop, probabilities in
+                    zip(arrays['start'].tolist(), arrays['stop'].tolist(), arrays['probabilities'])}
+
+        entries = read_cache_file(self._path(file_hash, scorer_key), read)
+        return entries if entries is not None else {}
+
+    def store(self, file_hash, scorer_key, entries):
+        windows = list(entries)
+        write_cache_file(self._path(file_hash, scorer_key), lambda f: np.savez(
+            f, start=np.array([window[0] for window in windows], dtype=np.int64),
+            stop=np.array([window[1] for window in windows], dtype=np.int64),
+            probabilities=np.array([entries[window] for window in windows])))
+
+
+##################################################################################
+# Worker process
+##################################################################################
+_worker_state = {}
+
+
+def _prepare_worker(path, channel, scorer_name, options, classes, training):
+    """ Creates (and trains) the scorer inside of the worker process; it is kept for all following batches. """
+    source = AudioSource(path)
+    scorer = load_scorer(scorer_name)(classes, source.rate, source.full_scale, **options)
+    if scorer.trainable:
+        start, stop, labels = training
+        scorer.fit([source.read(a, b, channel=channel) for a, b in zip(start.tolist(), stop.tolist())], labels)
+    _worker_state.update(source=source, scorer=scorer, channel=channel)
+
+
+def _score_batch(start, stop):
+    source, scorer, channel = _worker_state['source'], _worker_state['scorer'], _worker_state['channel']
+    clips = [source.read(a, b, channel=channel) for a, b in zip(start.tolist(), stop.tolist())]
+    return np.asarray(scorer.score(clips), dtype=np.float64)
+
+
+class _InProcessExecutor:
+    """ Runs the worker functions in the calling thread (without a worker process) when their result is requested. """
+    class _Future:
+        def __init__(self, function, args):
+            self._function = function
+            self._args = args
+
+        def result(self):
+            return self._function(*self._args)
+
+        def cancel(self):
+            pass
+
+    def submit(self, function, *args):
+        return self._Future(function, args)
+
+    def shutdown(self, wait=True):
+        _worker_state.clear()
+
+
+class PredictionResult:
+    """
+    Class probabilities of scored events (identified by start and stop), the predicted class codes and the
+    confidence (probability of the predicted class).
+    """
+    def __init__(self, start, stop, probabilities):
+        self.start = start
+        self.stop = stop
+        self.probabilities = probabilities
+        self.predicted = probabilities.argmax(axis=1).astype(np.int16) if len(probabilities) else \
+            np.zeros(0, dtype=np.int16)
+        self.confidence = probabilities.max(axis=1).astype(np.float32) if len(probabilities) else \
+            np.zeros(0, dtype=np.float32)
+
+    def __len__(self):
+        return len(self.start)
+
+
+class PredictionJob:
+    """
+    Class containing everything needed to propose labels for the unlabelled events of a project in another thread:
+    a snapshot of the annotations and the scorer configured with 'scorer' in setup.json. run() scores all windows
+    that are not cached yet in batches inside of a worker process.
+    """
+    def __init__(self, project, cache=None):
+        config = project.setup.get('scorer', {})
+        self.scorer_name = config.get('class', DEFAULT_SCORER)
+        self.options = config.get('options', {})
+        self.scorer = load_scorer(self.scorer_name)
+        self.classes = list(project.annotations.classes)
+        self.path = str(project.audio_source.path)
+        self.channel = 0
+        self.n_frames = len(project.audio_source)
+        self.rate = project.audio_rate
+        self.file_hash = project.file_hash
+        self.cache = cache if cache is not None else PredictionCache()
+
+        snapshot = project.annotations.snapshot()
+        unlabelled = snapshot.label == UNLABELLED
+        self.start, self.stop = snapshot.start[unlabelled], snapshot.stop[unlabelled]
+        self.training = (snapshot.start[~unlabelled], snapshot.stop[~unlabelled], snapshot.label[~unlabelled])
+
+    def _frames(self, seconds):
+        return None if seconds is None else max(int(round(seconds * self.rate)), 1)
+
+    def scorer_key(self):
+        """ Identifies the scorer with its options (and the labelled events it learns from). """
+        key = hashlib.sha1(json.dumps([self.scorer_name, self.options, self.classes], sort_keys=True).encode('utf-8'))
+        if self.scorer.trainable:
+            for column in self.training:
+                key.update(np.ascontiguousarray(column).tobytes())
+        return key.hexdigest()[:16]
+
+    def run(self, callback=None, in_process=False):
+        """
+        Scores the events and returns a PredictionResult. callback(fraction) is called after each batch; if it raises
+        an exception (e.g. because the user cancelled), the remaining batches are cancelled.
+        """
+        window_frames = self._frames(self.scorer.window_length)
+        hop_frames = self._frames(self.scorer.hop_length) or window_frames
+        window_start, window_stop, events = event_windows(self.start, self.stop, window_frames, hop_frames,
+                                                          self.n_frames)
+        key = self.scorer_key()
+        cached = self.cache.load(self.file_hash, key) if self.file_hash is not None else {}
+        windows = list(zip(window_start.tolist(), window_stop.tolist()))
+        missing = list(dict.fromkeys(window for window in windows if window not in cached))
+
+        if missing:
+            # trainable scorers learn from the same kind of windows they score
+            train_start, train_stop, train_events = event_windows(self.training[0], self.training[1], window_frames,
+                                                                  hop_frames, self.n_frames)
+            training = (train_start, train_stop, self.training[2][train_events])
+            self._score(np.array(missing, dtype=np.int64).reshape(-1, 2), training, cached, callback, in_process)
+            if self.file_hash is not None:
+                self.cache.store(self.file_hash, key, cached)
+
+        # the probabilities of an event are the mean of its windows
+        probabilities = np.zeros((len(self.start), len(self.classes)))
+        if windows:
+            np.add.at(probabilities, events, np.array([cached[window] for window in windows]))
+            probabilities /= np.bincount(events, minlength=len(self.start))[:, None]
+        return PredictionResult(self.start, self.stop, probabilities)
+
+    def _score(self, windows, training, results, callback, in_process):
+        if in_process:
+            executor = _InProcessExecutor()
+        else:
+            # one spawned process keeps the scorer (e.g. a large model) for all batches
+            executor = concurrent.futures.ProcessPoolExecutor(max_workers=1,
+                                                              mp_context=multiprocessing.get_context('spawn'))
+        batches = [windows[first:first + self.scorer.batch_size]
+                   for first in range(0, len(windows), self.scorer.batch_size)]
+        futures = []
+        try:
+            executor.submit(_prepare_worker, self.path, self.channel, self.scorer_name, self.options, self.classes,
+                            training).result()
+            futures = [executor.submit(_score_batch, batch[:, 0], batch[:, 1]) for batch in batches]
+            for idx, (batch, future) in enumerate(zip(batches, futures)):
+                for window, probabilities in zip(map(tuple, batch.tolist()), future.result()):
+                    results[window] = probabilities
+                if callback is not None:
+                    callback((idx + 1) / len(batches))
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
@@ -0,0 +1,239 @@
+import hashlib
+import json
+from pathlib import Path
+
+import numpy as np
+
+from .audio_cache import cache_directory, read_cache_file, write_cache_file
+from .audio_source import AudioSource
+from .process_pool import run_tasks
+
+
+# default settings of the similarity search (can be overwritten with 'similarity' in setup.json), durations in seconds
+SIMILARITY_DEFAULTS = {
+    # length and hop of the frames of the log-mel spectrogram that is searched
+    'frame_length': 0.064,
+    'hop_length': 0.032,
+    'n_mels': 32,
+    # a search returns at most top_k regions with a cosine similarity (-1 ... 1) of at least min_similarity
+    'top_k': 20,
+    'min_similarity': 0.5,
+}
+
+# number of frames computed by one task of the process pool
+FRAMES_PER_TASK = 4096
+# number of positions compared with one FFT
+BLOCK_FRAMES = 65536
+
+
+def similarity_settings(setup=None):
+    """ Returns the similarity settings of a setup.json completed with the defaults. """
+    settings = dict(SIMILARITY_DEFAULTS)
+    if setup is not None:
+        settings.update(setup.get('similarity', {}))
+    return settings
+
+
+def mel_filterbank(n_mels, frame_size, rate, min_frequency=50.0):
+    """
+    Returns the weights (n_mels x frequency bins of a rfft) of triangular filters equally spaced on the mel scale.
+    """
+    def mel(frequency):
+        return 2595 * np.log10(1 + frequency / 700)
+
+    points = 700 * (10 ** (np.linspace(mel(min_frequency), mel(rate / 2), n_mels + 2) / 2595) - 1)
+    frequencies = np.fft.rfftfreq(frame_size, 1 / rate)
+    lower, center, upper = points[:-2, None], points[1:-1, None], points[2:, None]
+    rising = (frequencies - lower) / (center - lower)
+    falling = (upper - frequencies) / (upper - center)
+    return np.maximum(np.minimum(rising, falling), 0).astype(np.float32)
+
+
+def mel_frames(path, channel, first_frame, n_frames, frame_size, hop_size, n_mels):
+    """
+    Computes the log-mel spectrum (in dB) of the frames first_frame, ..., first_frame + n_frames - 1 of the audio file.
+    This function runs inside of a worker process.
+    """
+    source = AudioSource(path)
+    low, high = source.full_scale
+    start = first_frame * hop_size
+    stop = start + (n_frames - 1) * hop_size + frame_size
+    samples = source.read(start, stop, channel=channel).astype(np.float32)
+    samples -= (high + low) / 2
+    samples *= 2 / (high - low)
+    if len(samples) < stop - start:
+        samples = np.concatenate([samples, np.zeros(stop - start - len(samples), dtype=np.float32)])
+    source.close()
+
+    frames = np.lib.stride_tricks.as_strided(samples, shape=(n_frames, frame_size),
+                                             strides=(hop_size * samples.strides[0], samples.strides[0]),
+                                             writeable=False)
+    power = np.abs(np.fft.rfft(frames * np.hanning(frame_size).astype(np.float32), axis=1)) ** 2
+    bands = power @ mel_filterbank(n_mels, frame_size, source.rate).T
+    return (10 * np.log10(bands + 1e-12)).astype(np.float16)
+
+
+class SimilarityIndex:
+    """
+    Class containing the log-mel spectrogram of a whole recording (one row of n_mels values every hop_size samples) for
+    finding regions that are similar to an event.
+
+    The spectrogram of an event is used as template and compared with every position of the recording (cosine
+    similarity of the mean-free spectrograms). The dot products of all positions are computed with FFT-based cross
+    correlation (overlap-save with segments of a few template lengths, in blocks of BLOCK_FRAMES positions), the norms
+    of all windows with a cumulative sum.
+    """
+    def __init__(self, features, frame_size, hop_size):
+        self.features = features
+        self.frame_size = frame_size
+        self.hop_size = hop_size
+        self._mean = None
+
+    def __len__(self):
+        return len(self.features)
+
+    @property
+    def mean(self):
+        """ Mean spectrum of the recording (subtracted from all frames, so the background is about 0). """
+        if self._mean is None:
+            total = np.zeros(self.features.shape[1])
+            for first in range(0, len(self), BLOCK_FRAMES):
+                total += self.features[first:first + BLOCK_FRAMES].sum(axis=0, dtype=np.float64)
+            self._mean = (total / max(len(self), 1)).astype(np.float32)
+        return self._mean
+
+    def _centered(self, first, last):
+        return self.features[first:last].astype(np.float32) - self.mean
+
+    def template(self, start, stop):
+        """ Returns the first frame and the number of frames inside of the region [start, stop) (in samples). """
+        first = min(max(int(start) // self.hop_size, 0), max(len(self) - 1, 0))
+        n_frames = max((int(stop) - int(start) - self.frame_size) // self.hop_size + 1, 1)
+        return first, min(n_frames, len(self) - first)
+
+    def similarity(self, first, n_frames):
+        """
+        Returns the cosine similarity of the template of n_frames frames starting at the frame first and the windows
+        of the same length at all positions of the recording.
+        """
+        n_positions = len(self) - n_frames + 1
+        similarity = np.zeros(max(n_positions, 0), dtype=np.float32)
+        if n_positions <= 0 or n_frames <= 0:
+            return similarity
+        template = self._centered(first, first + n_frames)
+        template_norm = np.sqrt(np.sum(template.astype(np.float64) ** 2))
+        # overlap-save with short segments: every segment of n_fft frames gives step positions
+        n_fft = max(1 << int(np.ceil(np.log2(4 * n_frames))), 256)
+        step = n_fft - n_frames + 1
+        # correlation is a convolution with the reversed template, the bands are summed in the frequency domain
+        kernel = np.fft.rfft(template[::-1], n_fft, axis=0)
+
+        for position in range(0, n_positions, BLOCK_FRAMES):
+            count = min(BLOCK_FRAMES, n_positions - position)
+            frames = self._centered(position, position + count + n_frames - 1)
+            n_segments = -(-count // step)
+            padded = np.zeros((n_segments * step + n_frames - 1, frames.shape[1]), dtype=np.float32)
+            padded[:len(frames)] = frames
+            segments = np.lib.stride_tricks.as_strided(padded, shape=(n_segments, n_fft, padded.shape[1]),
+                                                       strides=(step * padded.strides[0],) + padded.strides,
+                                                       writeable=False)
+            products = np.fft.irfft((np.fft.rfft(segments, axis=1) * kernel).sum(axis=2), n_fft, axis=1)
+            products = products[:, n_frames - 1:].reshape(-1)[:count]
+            energy = np.concatenate([[0], np.cumsum(np.einsum('ij,ij->i', frames, frames), dtype=np.float64)])
+            norms = np.sqrt(np.maximum(energy[n_frames:n_frames + count] - energy[:count], 0))
+            similarity[position:position + count] = products / (norms * template_norm + 1e-9)
+        return similarity
+
+    def search(self, start, stop, k=SIMILARITY_DEFAULTS['top_k'],
+               min_similarity=SIMILARITY_DEFAULTS['min_similarity'], exclude=None):
+        """
+        Returns the start, stop (in samples) and similarity of the (up to) k regions that are most similar to the
+        region [start, stop), ordered by similarity. Matches do not overlap each other or the region itself.
+        exclude(starts, stops) can return a mask of further regions that are skipped (e.g. existing annotations).
+        """
+        first, n_frames = self.template(start, stop)
+        similarity = self.similarity(first, n_frames)
+        starts = np.arange(len(similarity), dtype=np.int64) * self.hop_size
+        stops = starts + (n_frames - 1) * self.hop_size + self.frame_size
+        skipped = (starts < stop) & (stops > start)
+        if exclude is not None and len(starts):
+            skipped |= exclude(starts, stops)
+        similarity[skipped] = -np.inf
+
+        positions = top_matches(similarity, n_frames, k, min_similarity)
+        return starts[positions], stops[positions], similarity[positions]
+
+
+def top_matches(similarity, distance, k, min_similarity):
+    """
+    Returns the positions of the (up to) k highest local maxima of similarity that are at least min_similarity and at
+    least distance positions apart from each other, ordered by similarity.
+    """
+    previous = np.concatenate([[-np.inf], similarity[:-1]])
+    following = np.concatenate([similarity[1:], [-np.inf]])
+    peaks = np.flatnonzero((similarity >= min_similarity) & (similarity >= previous) & (similarity > following))
+    chosen = []
+    for position in peaks[np.argsort(-similarity[peaks], kind='stable')].tolist():
+        if all(abs(position - other) >= distance for other in chosen):
+            chosen.append(position)
+            if len(chosen) == k:
+                break
+    return np.array(chosen, dtype=np.int64)
+
+
+class SimilarityCache:
+    """
+    Class that persists the log-mel spectrograms of SimilarityIndexes, keyed by the hash of the audio file and the
+    settings of the spectrogram. Cached spectrograms are memory-mapped.
+    """
+    def __init__(self, directory=None):
+        self.directory = Path(directory) if directory is not None else cache_directory() / 'similarity'
+
+    @staticmethod
+    def key(settings, channel=0):
+        names = ('frame_length', 'hop_length', 'n_mels')
+        key = json.dumps([channel] + [settings[name] for name in names])
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]
+
+    def _path(self, file_hash, key):
+        return self.directory / f'{file_hash}_{key}.npy'
+
+    def load(self, file_hash, key):
+        """ Returns the cached spectrogram or None. """
+        def read(features):
+            if features.ndim != 2:
+                raise ValueError('Invalid similarity cache entry.')
+            return features
+
+        return read_cache_file(self._path(file_hash, key), read, mmap_mode='r')
+
+    def store(self, file_hash, key, features):
+        write_cache_file(self._path(file_hash, key), lambda f: np.save(f, features))
+
+
+def build_similarity_index(audio_source, settings=None, channel=0, file_hash=None, cache=None, max_workers=None,
+                           callback=None):
+    """
+    Returns the SimilarityIndex of a recording. It is taken from the SimilarityCache if possible (the file_hash is
+    needed for that), otherwise it is computed in tasks of FRAMES_PER_TASK frames in a process pool (every process maps
+    the file itself, see run_tasks) and stored in the cache.
+    """
+    settings = settings if settings is not None else SIMILARITY_DEFAULTS
+    frame_size = max(int(round(settings['frame_length'] * audio_source.rate)), 2)
+    hop_size = max(int(round(settings['hop_length'] * audio_source.rate)), 1)
+    key = SimilarityCache.key(settings, channel)
+    if cache is not None and file_hash is not None:
+        features = cache.load(file_hash, key)
+        if features is not None:
+            return SimilarityIndex(features, frame_size, hop_size)
+
+    n_frames = max((len(audio_source) - frame_size) // hop_size + 1, 0)
+    path = str(audio_source.path)
+    tasks = [(path, channel, first, min(FRAMES_PER_TASK, n_frames - first), frame_size, hop_size, settings['n_mels'])
+             for first in range(0, n_frames, FRAMES_PER_TASK)]
+    results = run_tasks(mel_frames, tasks, max_workers=max_workers, callback=callback)
+    features = np.concatenate(results) if results else np.zeros((0, settings['n_mels']), dtype=np.float16)
+
+    if cache is not None and file_hash is not None:
+        cache.store(file_hash, key, features)
+    return SimilarityIndex(features, frame_size, hop_size)
@@ -0,0 +1,220 @@
+import collections
+import concurrent.futures
+import os
+import threading
+import traceback
+
+import numpy as np
+
+
+class SpectrogramTile:
+    """
+    Log-magnitude spectrogram of one tile: values has the shape (columns, frequency bins) in dB relative to full scale.
+    Column j covers the frames [start + j * hop, start + (j + 1) * hop).
+    """
+    __slots__ = ('level', 'index', 'start', 'hop', 'values')
+
+    def __init__(self, level, index, start, hop, values):
+        self.level = level
+        self.index = index
+        self.start = start
+        self.hop = hop
+        self.values = values
+
+    @property
+    def stop(self):
+        return self.start + len(self.values) * self.hop
+
+    @property
+    def nbytes(self):
+        return self.values.nbytes
+
+
+class TileCache:
+    """
+    Thread-safe least recently used cache of SpectrogramTiles that holds at most max_bytes of tile data.
+    """
+    def __init__(self, max_bytes=64 * 1024 ** 2):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._tiles = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._tiles)
+
+    def get(self, key):
+        with self._lock:
+            tile = self._tiles.get(key)
+            if tile is not None:
+                self._tiles.move_to_end(key)
+            return tile
+
+    def put(self, key, tile):
+        with self._lock:
+            old = self._tiles.pop(key, None)
+            if old is not None:
+                self.nbytes -= old.nbytes
+            self._tiles[key] = tile
+            self.nbytes += tile.nbytes
+            # the new tile is always kept
+            while self.nbytes > self.max_bytes and len(self._tiles) > 1:
+                self.nbytes -= self._tiles.popitem(last=False)[1].nbytes
+
+    def clear(self):
+        with self._lock:
+            self._tiles.clear()
+            self.nbytes = 0
+
+
+class Spectrogram:
+    """
+    Class that computes the STFT spectrogram of one channel of an AudioSource in tiles.
+
+    A tile contains TILE_COLUMNS STFT frames. Like the levels of a WaveformPyramid, level k uses a hop size of
+    base_hop * 2**k frames (the window length stays the same), so the spectrogram of any view range needs about one
+    column per pixel and never more than a few tiles. Tiles are computed vectorized (all frames of a tile in one FFT)
+    by a pool of threads on request and kept in an LRU TileCache, so the spectrogram is only computed for the parts of
+    the file that are looked at.
+    """
+    TILE_COLUMNS = 256
+
+    def __init__(self, audio_source, channel=0, n_fft=512, base_hop=128, cache_bytes=64 * 1024 ** 2,
+                 max_workers=None):
+        self.audio_source = audio_source
+        self.channel = channel
+        self.n_fft = n_fft
+        self.base_hop = base_hop
+        self.cache = TileCache(cache_bytes)
+
+        self._window = np.hanning(n_fft).astype(np.float32)
+        # a full scale sine has a magnitude of 0 dB
+        self._reference = float(self._window.sum()) / 2
+        low, high = audio_source.full_scale
+        self._offset = (high + low) / 2
+        self._half_range = (high - low) / 2
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers or min(4, os.cpu_count() or 1))
+        self._pending = {}
+        self._lock = threading.Lock()
+        self.closed = False
+
+    ##################################################################################
+    # Tile layout
+    ##################################################################################
+    @property
+    def n_bins(self):
+        """ Number of frequency bins of each column. """
+        return self.n_fft // 2 + 1
+
+    @property
+    def max_frequency(self):
+        return self.audio_source.rate / 2
+
+    @property
+    def max_level(self):
+        """ The level at which one tile covers the whole file. """
+        columns = len(self.audio_source) / (self.TILE_COLUMNS * self.base_hop)
+        return max(int(np.ceil(np.log2(columns))), 0) if columns > 1 else 0
+
+    def hop(self, level):
+        return self.base_hop * 2 ** level
+
+    def tile_span(self, level):
+        """ Number of frames covered by one tile. """
+        return self.TILE_COLUMNS * self.hop(level)
+
+    def select_level(self, samples_per_pixel):
+        """ Returns the coarsest level whose columns are not wider than one pixel. """
+        if samples_per_pixel < 2 * self.base_hop:
+            return 0
+        return min(int(np.log2(samples_per_pixel / self.base_hop)), self.max_level)
+
+    def n_tiles(self, level):
+        return -(-len(self.audio_source) // self.tile_span(level))
+
+    def tile_indices(self, level, start, stop):
+        """ Returns the indices of the tiles needed for the frames [start, stop). """
+        span = self.tile_span(level)
+        return range(max(int(start) // span, 0), min(int(np.ceil(stop / span)), self.n_tiles(level)))
+
+    ##################################################################################
+    # Computation
+    ##################################################################################
+    def _read(self, start, stop):
+        """ Reads the frames [start, stop) as normalized float32 samples, frames outside of the file are zero. """
+        samples = np.zeros(stop - start, dtype=np.float32)
+        first, last = max(start, 0), min(stop, len(self.audio_source))
+        if first < last:
+            data = self.audio_source.read(first, last, channel=self.channel)
+            samples[first - start:last - start] = (data - self._offset) / self._half_range
+        return samples
+
+    def compute_tile(self, level, index):
+        """ Computes the SpectrogramTile (level, index) without using the cache. """
+        hop = self.hop(level)
+        start = index * self.tile_span(level)
+        n_columns = min(self.TILE_COLUMNS, max(-(-(len(self.audio_source) - start) // hop), 0))
+        if n_columns == 0:
+            return SpectrogramTile(level, index, start, hop, np.zeros((0, self.n_bins), dtype=np.float32))
+        # each frame is centered on its column
+        first = start + hop // 2 - self.n_fft // 2
+        if hop <= self.n_fft:
+            # overlapping (or adjacent) frames are strided views of one contiguous block
+            samples = self._read(first, first + (n_columns - 1) * hop + self.n_fft)
+            frames = np.lib.stride_tricks.as_strided(samples, shape=(n_columns, self.n_fft),
+                                                     strides=(hop * samples.strides[0], samples.strides[0]))
+        else:
+            # at coarse levels only the frames are read and not the (much larger) gaps between them
+            frames = np.stack([self._read(position, position + self.n_fft)
+                               for position in range(first, first + n_columns * hop, hop)])
+        magnitudes = np.abs(np.fft.rfft(frames * self._window, axis=1))
+        values = 20 * np.log10(np.maximum(magnitudes / self._reference, 1e-10))
+        return SpectrogramTile(level, index, start, hop, values.astype(np.float32))
+
+    ##################################################################################
+    # Requests
+    ##################################################################################
+    def tile(self, level, index):
+        """ Returns the cached tile or None. """
+        return self.cache.get((level, index))
+
+    def request(self, level, index, callback):
+        """
+        Computes the tile in the thread pool if it is neither cached nor already requested. callback(tile) is called
+        in a thread of the pool when the tile is ready.
+        """
+        key = (level, index)
+        if self.closed or self.cache.get(key) is not None:
+            return
+        with self._lock:
+            if key in self._pending:
+                return
+            future = self._executor.submit(self.compute_tile, level, index)
+            self._pending[key] = future
+        future.add_done_callback(lambda future: self._finished(key, future, callback))
+
+    def _finished(self, key, future, callback):
+        with self._lock:
+            self._pending.pop(key, None)
+        # tiles that are finished after closing are not delivered anymore
+        if future.cancelled() or self.closed:
+            return
+        if future.exception() is not None:
+            traceback.print_exception(type(future.exception()), future.exception(), future.exception().__traceback__)
+            return
+        tile = future.result()
+        self.cache.put(key, tile)
+        callback(tile)
+
+    def cancel(self, keep=()):
+        """ Cancels all requests that were not started yet, except of the tiles in keep. """
+        with self._lock:
+            pending = [future for key, future in self._pending.items() if key not in keep]
+        for future in pending:
+            future.cancel()
+
+    def close(self):
+        self.closed = True
+        self.cancel()
+        self._executor.shutdown(wait=False)
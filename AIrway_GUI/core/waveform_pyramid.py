@@ -0,0 +1,133 @@
+import numpy as np
+
+
+class PyramidBuilder:
+    """
+    Class that builds a WaveformPyramid incrementally from consecutive blocks of samples (one channel).
+
+    Only the finest level is computed from the samples, all coarser levels are reduced from it when finishing.
+    """
+    def __init__(self, base_bin_size=256):
+        self.base_bin_size = base_bin_size
+        self.n_frames = 0
+        self._mins = []
+        self._maxs = []
+        self._rest = None
+
+    def feed(self, samples):
+        """
+        Adds the next block of samples. Samples that do not fill a whole bin are kept for the next block.
+        """
+        self.n_frames += len(samples)
+        if self._rest is not None and len(self._rest):
+            samples = np.concatenate([self._rest, samples])
+
+        n_bins = len(samples) // self.base_bin_size
+        if n_bins:
+            bins = samples[:n_bins * self.base_bin_size].reshape(n_bins, self.base_bin_size)
+            self._mins.append(bins.min(axis=1))
+            self._maxs.append(bins.max(axis=1))
+        self._rest = np.array(samples[n_bins * self.base_bin_size:])
+
+    def finish(self):
+        """
+        Returns the WaveformPyramid of all samples fed so far.
+        """
+        mins = list(self._mins)
+        maxs = list(self._maxs)
+        if self._rest is not None and len(self._rest):
+            mins.append(self._rest.min(keepdims=True))
+            maxs.append(self._rest.max(keepdims=True))
+        if not mins:
+            return WaveformPyramid([], self.base_bin_size, self.n_frames)
+
+        levels = [(np.concatenate(mins), np.concatenate(maxs))]
+        while len(levels[-1][0]) > WaveformPyramid.MIN_BINS:
+            levels.append(self._reduce(*levels[-1]))
+        return WaveformPyramid(levels, self.base_bin_size, self.n_frames)
+
+    @staticmethod
+    def _reduce(mins, maxs):
+        """ Combines each pair of neighbouring bins to one bin. """
+        if len(mins) % 2:
+            mins = np.append(mins, mins[-1])
+            maxs = np.append(maxs, maxs[-1])
+        return (np.minimum(mins[0::2], mins[1::2]),
+                np.maximum(maxs[0::2], maxs[1::2]))
+
+
+class WaveformPyramid:
+    """
+    Class containing a min/max envelope of a waveform at multiple resolutions.
+
+    Level k stores the minimum and maximum of bins with base_bin_size * 2**k samples each, so drawing any view range
+    only needs about two values per pixel instead of all samples.
+    """
+    # coarsest level has at most this many bins
+    MIN_BINS = 1024
+
+    def __init__(self, levels, base_bin_size, n_frames):
+        self.levels = levels
+        self.base_bin_size = base_bin_size
+        self.n_frames = n_frames
+
+    @classmethod
+    def from_source(cls, audio_source, channel=0, base_bin_size=256, chunk_size=2**22):
+        """
+        Builds the pyramid from an AudioSource in one sequential, chunked pass.
+        """
+        builder = PyramidBuilder(base_bin_size)
+        for start in range(0, len(audio_source), chunk_size):
+            builder.feed(audio_source.read(start, start + chunk_size, channel=channel))
+        return builder.finish()
+
+    def bin_size(self, level):
+        return self.base_bin_size * 2 ** level
+
+    @property
+    def nbytes(self):
+        return sum(mins.nbytes + maxs.nbytes for mins, maxs in self.levels)
+
+    def value_range(self):
+        """ Returns the overall minimum and maximum sample value. """
+        if not self.levels:
+            return 0, 0
+        mins, maxs = self.levels[-1]
+        return float(mins.min()), float(maxs.max())
+
+    def select_level(self, samples_per_pixel):
+        """
+        Returns the coarsest level whose bins are not wider than one pixel or None if the raw samples are needed.
+        """
+        if not self.levels or samples_per_pixel < self.base_bin_size:
+            return None
+        level = int(np.log2(samples_per_pixel / self.base_bin_size))
+        return min(level, len(self.levels) - 1)
+
+    def envelope(self, level, start, stop):
+        """
+        Returns x and y values of the envelope of the frames [start, stop) at the given level.
+        Each bin contributes two points (minimum and maximum) at the first frame of the bin.
+        """
+        bin_size = self.bin_size(level)
+        mins, maxs = self.levels[level]
+        first = max(int(start) // bin_size, 0)
+        last = min(int(stop) // bin_size + 1, len(mins))
+        return interleave_envelope(np.arange(first, last) * bin_size, mins[first:last], maxs[first:last])
+
+
+def interleave_envelope(x, mins, maxs):
+    """ Interleaves the minimum and maximum of each bin to one connected line. """
+    return np.repeat(x, 2), np.column_stack([mins, maxs]).ravel()
+
+
+def envelope_from_samples(samples, offset, bin_size):
+    """
+    Computes the envelope of raw samples with (at least) the given bin size.
+    If bin_size is 1, the samples are returned as they are.
+    """
+    if bin_size <= 1:
+        return np.arange(offset, offset + len(samples)), samples
+    n_bins = len(samples) // bin_size
+    bins = samples[:n_bins * bin_size].reshape(n_bins, bin_size)
+    return interleave_envelope(offset + np.arange(n_bins) * bin_size, bins.min(axis=1), bins.max(axis=1))
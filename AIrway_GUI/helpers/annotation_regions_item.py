@@ -0,0 +1,131 @@
+from PyQt5 import QtCore, QtGui
+import pyqtgraph as pg
+import numpy as np
+
+from .refresh_scheduler import RefreshScheduler
+
+
+class AnnotationRegionsItem(pg.GraphicsObject):
+    """
+    Item that paints the regions of all annotations at once.
+
+    Only annotations that intersect the current view are painted (directly from the columns of the AnnotationStore),
+    with one cached brush per class. The selected annotation is not painted by this item but shown as the only
+    interactive region (selected_region), so its boundaries can be dragged.
+    """
+    UNLABELLED_COLOR = (238, 233, 108, 150)
+    LABELLED_COLOR = (87, 223, 151, 150)
+    SELECTED_COLOR = (204, 97, 212, 150)
+
+    def __init__(self, data_handler):
+        super(AnnotationRegionsItem, self).__init__()
+        self.data_handler = data_handler
+        self.annotations = data_handler.annotations
+        self.annotations.add_observer(self)
+        self.data_handler.refresh_scheduler.register(RefreshScheduler.REGIONS, self.refresh)
+        self._brushes = {}
+        # below the waveform and the region used for annotating
+        self.setZValue(-10)
+
+        self.selected_region = pg.LinearRegionItem(brush=pg.mkColor(self.SELECTED_COLOR))
+        self.selected_region.setHoverBrush(pg.mkColor(self.SELECTED_COLOR))
+        self.selected_region.setZValue(10)
+        self.selected_region.setVisible(False)
+
+    def _brush(self, code):
+        """ Returns the (cached) brush of a class code. """
+        if code not in self._brushes:
+            color = self.UNLABELLED_COLOR if code < 0 else self.LABELLED_COLOR
+            self._brushes[code] = QtGui.QBrush(pg.mkColor(color))
+        return self._brushes[code]
+
+    def visible_annotations(self, x_min, x_max):
+        """ Returns the indices of all annotations that intersect [x_min, x_max]. """
+        return self.data_handler.interval_index.overlapping(x_min, x_max)
+
+    ##################################################################################
+    # Painting
+    ##################################################################################
+    def boundingRect(self):
+        view_rect = self.viewRect()
+        if view_rect is None:
+            return QtCore.QRectF()
+        # the item always covers the visible part of the view
+        return QtCore.QRectF(view_rect)
+
+    def viewTransformChanged(self):
+        super(AnnotationRegionsItem, self).viewTransformChanged()
+        self.prepareGeometryChange()
+
+    def paint(self, p, *args):
+        view_rect = self.viewRect()
+        if view_rect is None or len(self.annotations) == 0:
+            return
+        visible = self.visible_annotations(view_rect.left(), view_rect.right())
+        if self.annotations.selected is not None:
+            visible = visible[visible != self.annotations.selected]
+        if len(visible) == 0:
+            return
+
+        starts = self.annotations.start[visible]
+        widths = self.annotations.stop[visible] - starts
+        labels = self.annotations.label[visible]
+        top, height = view_rect.top(), view_rect.height()
+
+        p.setPen(pg.mkPen(None))
+        for code in np.unique(labels):
+            mask = labels == code
+            p.setBrush(self._brush(code))
+            p.drawRects([QtCore.QRectF(x, top, width, height) for x, width in zip(starts[mask], widths[mask])])
+
+    ##################################################################################
+    # Interaction
+    ##################################################################################
+    def mouseClickEvent(self, ev):
+        if ev.button() != QtCore.Qt.LeftButton:
+            ev.ignore()
+            return
+        x = ev.pos().x()
+        hits = self.data_handler.interval_index.at(x)
+        if len(hits) == 0:
+            ev.ignore()
+            return
+        ev.accept()
+        # the annotation added last is painted on top
+        self.data_handler.table_widget.select_row(int(hits.max()))
+
+    def _update_selected_region(self):
+        index = self.annotations.selected
+        if index is None:
+            self.selected_region.setVisible(False)
+            return
+        start, stop = self.annotations.start[index], self.annotations.stop[index]
+        min_x, max_x = self.selected_region.getRegion()
+        if int(min_x) != start or int(max_x) != stop:
+            self.selected_region.blockSignals(True)
+            self.selected_region.setRegion([start, stop])
+            self.selected_region.blockSignals(False)
+        self.selected_region.setVisible(True)
+
+    def refresh(self):
+        """ Called by the RefreshScheduler after the annotations or the selection have changed. """
+        self._update_selected_region()
+        self.update()
+
+    ##################################################################################
+    # Observer methods of the AnnotationStore
+    ##################################################################################
+    def annotations_inserted(self, first, last):
+        self.data_handler.refresh_scheduler.mark_dirty(RefreshScheduler.REGIONS)
+
+    def annotations_changed(self, first, last):
+        self.data_handler.refresh_scheduler.mark_dirty(RefreshScheduler.REGIONS)
+
+    def annotations_removed(self, first, last):
+        self.data_handler.refresh_scheduler.mark_dirty(RefreshScheduler.REGIONS)
+
+    def annotations_reset(self):
+        self.data_handler.refresh_scheduler.mark_dirty(RefreshScheduler.REGIONS)
+
+    def selection_changed(self, old, new):
+        self.data_handler.refresh_scheduler.mark_dirty(RefreshScheduler.REGIONS)
@@ -1,15 +1,105 @@
-from PyQt5.QtMultimedia import QMediaPlayer, QMediaPlaylist, QMediaContent
 from PyQt5 import QtCore
 
+from ..core.playback_engine import PlaybackEngine
+from .render_clock import RenderClock
 
-class AudioPlayer(QMediaPlayer):
-    def __init__(self, data_handler):
-        super().__init__(flags=QMediaPlayer.VideoSurface)
+
+class AudioPlayer(QtCore.QObject):
+    """
+    Media player of the GUI. It wraps a PlaybackEngine that plays the samples of the DataHandler and offers the
+    interface of the QMediaPlayer used before (positions/durations in milliseconds, states and signals), so the
+    player widgets do not depend on the engine.
+
+    While playing, the position is updated by a RenderClock once per display frame: playheadChanged (in samples) and
+    positionChanged (in milliseconds, only if it changed) are emitted together, so all widgets that follow the player
+    are updated at most once per frame.
+    """
+    StoppedState = 0
+    PlayingState = 1
+    PausedState = 2
+
+    positionChanged = QtCore.pyqtSignal(int)
+    playheadChanged = QtCore.pyqtSignal(int)
+    durationChanged = QtCore.pyqtSignal(int)
+    stateChanged = QtCore.pyqtSignal(int)
+
+    def __init__(self, data_handler, sink=None):
+        super().__init__()
         self.data_handler = data_handler
+        self.engine = PlaybackEngine(self.data_handler.audio_source, sink)
+        self._state = self.StoppedState
+        self._last_position = 0
+
+        self.render_clock = RenderClock(self.engine, self)
+        self.render_clock.tick.connect(self._update_playhead)
+
+    ##################################################################################
+    # Interface of the QMediaPlayer
+    ##################################################################################
+    def state(self):
+        return self._state
+
+    def duration(self):
+        return int(self.engine.duration * 1000)
+
+    def position(self):
+        return int(self.sample_position() / self.engine.rate * 1000)
+
+    def setPosition(self, milliseconds):
+        self.engine.seek(int(milliseconds / 1000 * self.engine.rate))
+        self._update_playhead(self.engine.position)
+
+    def play(self):
+        self.engine.play()
+        self._set_state(self.PlayingState)
+        self.render_clock.start()
+
+    def pause(self):
+        self.engine.pause()
+        self.render_clock.stop()
+        self._set_state(self.PausedState)
+        self._update_playhead(self.engine.position)
+
+    ##################################################################################
+    # Additional methods
+    ##################################################################################
+    def sample_position(self):
+        """ Audible position of the player in samples. """
+        if self.render_clock.is_running():
+            return self.render_clock.position()
+        return self.engine.position
+
+    def latency(self):
+        """ Output latency in seconds. """
+        return self.engine.latency
+
+    def play_region(self, start, stop, loop=False):
+        """ Plays the samples [start, stop) once or in a loop (not possible while the whole file is played). """
+        self.engine.play_region(start, stop, loop)
+
+    def stop_region(self):
+        self.engine.stop_region()
+
+    def is_region_playing(self):
+        return self.engine.is_region_playing
+
+    def close(self):
+        """ Stops playing and releases the audio device. """
+        self.render_clock.stop()
+        self.engine.close()
+        self._set_state(self.StoppedState)
 
-        self.playlist = QMediaPlaylist()
-        content = QMediaContent(QtCore.QUrl.fromLocalFile(str(self.data_handler.path)))
-        self.playlist.addMedia(content)
-        self.setPlaylist(self.playlist)
+    def _set_state(self, state):
+        if state != self._state:
+            self._state = state
+            self.stateChanged.emit(state)
 
-        self.setNotifyInterval(20)
\ No newline at end of file
+    def _update_playhead(self, position):
+        if self._state == self.PlayingState and not self.engine.is_playing:
+            # end of the file reached
+            self._set_state(self.StoppedState)
+        self.playheadChanged.emit(position)
+        milliseconds = int(position / self.engine.rate * 1000)
+        if milliseconds != self._last_position:
+            self._last_position = milliseconds
+            self.positionChanged.emit(milliseconds)
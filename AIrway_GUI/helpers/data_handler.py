@@ -1,41 +1,33 @@
 import numpy as np
-import pandas as pd
 from PyQt5 import QtWidgets
-import pyqtgraph as pg
-import copy
-import flammkuchen as fl
-from scipy.io.wavfile import write
-import sounddevice as sd
-import json
-import os
-import datetime
-import wavio
-from pathlib import Path
+import time
 
-from .calculate_md5_hash import get_md5_hash
-from .region_item import RegionItem
+from ..core.project import Project
+from .refresh_scheduler import RefreshScheduler
 
 
 class DataHandler(QtWidgets.QFrame):
     """
-    Class that handles all annotated data within one DataFrame.
+    Class that connects the widgets to the annotations of one Project (all data is handled by the Project, which does
+    not depend on Qt).
     """
+    # seconds between two partial waveform pyramids reported while scanning the file
+    PARTIAL_RESULT_INTERVAL = 0.5
+
     def __init__(self, path):
         super().__init__()
         self.path = path
         self.audio_player = None
-        self.audio_data_original = None
-        self.audio_data = None
-        self.audio_rate = None
 
-        # load setup.json
-        p_ = os.path.dirname(os.path.realpath(__file__))
-        with open(p_ + "/../setup.json") as f:
-            self.setup = json.load(f)
+        # load the audio file (and the setup.json)
+        print(self.path)
+        self.project = Project(path)
+        self.setup = self.project.setup
+        self.audio_source = self.project.audio_source
+        self.audio_rate = self.project.audio_rate
 
-        # needed for play/stop button event
-        self.play_obj = None
-        self.p = False
+        # views showing the annotations are refreshed once per event loop iteration through this scheduler
+        self.refresh_scheduler = RefreshScheduler(self)
 
         # object will be initialized in class TableWidget
         self.table_widget = None
@@ -45,123 +37,188 @@ class DataHandler(QtWidgets.QFrame):
         self.plot = None
         self.region = None
 
-        # dataframe that saves all annotations
-        self.table_data = pd.DataFrame(columns=['Initial', 'From', 'To', 'Event', 'Selected', 'Region'])
-
         # set of possible events
         self.events = self.setup['classes']
 
-        self._load_data()
+        # annotations, interval index, class statistics and undo/redo history of the project
+        self.annotations = self.project.annotations
+        self.interval_index = self.project.interval_index
+        self.class_statistics = self.project.class_statistics
+        self.history = self.project.history
+        self.predictions = self.project.predictions
 
     ##################################################################################
     # Load/Save data
     ##################################################################################
-    def _load_data(self):
+    @property
+    def file_hash(self):
+        return self.project.file_hash
+
+    @property
+    def pyramid(self):
+        return self.project.pyramid
+
+    @property
+    def statistics(self):
+        return self.project.statistics
+
+    @property
+    def is_scanned(self):
+        """ True if the file hash, the waveform pyramid and the statistics are available. """
+        return self.project.is_scanned
+
+    def scan(self, worker):
         """
-        Load data from an audio file.
+        Computes file hash, waveform pyramid and channel statistics in one pass and stores them in the cache.
+        This method runs inside a Worker thread. The pyramid of the part that is already scanned is reported regularly,
+        so the waveform can be displayed before the whole file was read.
         """
-        print(self.path)
-        try:
-            w = wavio.read(str(Path(self.path).absolute()))
-            self.audio_data_original = w.data
-            self.audio_rate = w.rate
-        except:
-            raise Exception(f"Can't load the file. ({self.path})")
-
-        self.audio_data = self.audio_data_original
-        if len(self.audio_data.shape) == 2:
-            self.audio_data = self.audio_data[:, 0]
-
-    def load_annotations(self, dict_):
-        self.table_data = dict_['DataFrame']
-        self.table_data['Selected'] = False
-        regions = []
-        for idx in range(len(self.table_data)):
-            region = pg.LinearRegionItem()
-            region.setRegion([self.table_data.loc[idx, 'From'], self.table_data.loc[idx, 'To']])
-            region.setMovable(False)
-            region.sigRegionChanged.connect(self.change_selected_region)
-            self.plot.addItem(region)
-            regions.append(region)
-        self.table_data['Region'] = regions
-        self.reload_table()
+        last_report = [time.monotonic()]
+
+        def callback(fraction, builder):
+            worker.check_cancelled()
+            worker.report_progress(fraction)
+            if time.monotonic() - last_report[0] > self.PARTIAL_RESULT_INTERVAL:
+                last_report[0] = time.monotonic()
+                worker.report_partial_result(builder.finish())
+
+        return self.project.scan(callback=callback)
+
+    def set_scan_result(self, result):
+        """ Sets the result of scan(). """
+        self.project.set_scan_result(result)
+
+    def load_annotations(self, project_file):
+        self.project.load_annotations(project_file)
+
+    def close(self):
+        """ Releases the audio file and the spectrogram threads of a DataHandler that is not used (anymore). """
+        self.project.close()
 
     def save(self, path):
-        df = copy.deepcopy(self.table_data)
-        del df['Region']
-        del df['Selected']
-
-        d = {'Filename': self.path.name, 'FileHash': get_md5_hash(self.path), 'DataFrame': df}
-        fl.save(path, d)
-
-    def save_annotated_events_wav(self, path):
-        """ Method for saving each annotated event in an own .wav-file. """
-        for class_ in self.events:
-            class_path = os.path.join(path, class_)
-            os.mkdir(class_path)
-            idx = 0
-            for index, row in self.table_data.iterrows():
-                if row['Event'] == class_:
-                    data = self.audio_data_original[int(row['From']):int(row['To']), ...]
-                    write(filename=os.path.join(class_path, f"{class_}_{idx}.wav"), rate=self.audio_rate, data=data)
-                    idx += 1
+        self.project.save(path)
+
+    def save_annotated_events_wav(self, path, worker=None):
+        """
+        Method for saving each annotated event in an own .wav-file (see export_clips). If a Worker is given, the
+        progress is reported to it and the export can be cancelled.
+        """
+        callback = None
+        if worker is not None:
+            def callback(fraction):
+                worker.check_cancelled()
+                worker.report_progress(fraction)
+
+        return self.project.export_clips(path, callback=callback)
+
+    def detect_events(self, worker=None):
+        """
+        Method for detecting candidate events in the whole recording (see Project.detect_events). If a Worker is given,
+        the progress is reported to it and the detection can be cancelled. Returns the start and stop of the candidates.
+        """
+        callback = None
+        if worker is not None:
+            def callback(fraction):
+                worker.check_cancelled()
+                worker.report_progress(fraction)
+
+        return self.project.detect_events(callback=callback)
+
+    def add_candidates(self, candidates):
+        """
+        Adds the candidates found by detect_events as unlabelled ('yellow') events and returns their number.
+        """
+        return self.project.add_candidates(*candidates)
+
+    def begin_prediction(self):
+        """
+        Returns a PredictionJob for all unlabelled events (see Project.begin_prediction), has to be called in the GUI
+        thread since the job takes a snapshot of the annotations.
+        """
+        return self.project.begin_prediction()
+
+    def predict_labels(self, job, worker=None):
+        """
+        Method for running a PredictionJob. If a Worker is given, the progress is reported to it and the prediction can
+        be cancelled. Returns the PredictionResult.
+        """
+        callback = None
+        if worker is not None:
+            def callback(fraction):
+                worker.check_cancelled()
+                worker.report_progress(fraction)
+
+        return job.run(callback=callback)
+
+    def set_predictions(self, result):
+        """
+        Shows the labels proposed by a PredictionResult in the table and returns the number of events that got one.
+        """
+        return self.predictions.set(result)
+
+    @property
+    def similarity_index(self):
+        return self.project.similarity_index
+
+    def build_similarity_index(self, worker=None):
+        """
+        Method for building the index that is searched by find_similar_events (see Project.build_similarity_index).
+        If a Worker is given, the progress is reported to it and building the index can be cancelled.
+        """
+        callback = None
+        if worker is not None:
+            def callback(fraction):
+                worker.check_cancelled()
+                worker.report_progress(fraction)
+
+        return self.project.build_similarity_index(callback=callback)
+
+    def find_similar_events(self, row):
+        """
+        Adds the regions that are most similar to the event in a row as unlabelled events (with the label of the event
+        as proposal) and returns their number and similarities.
+        """
+        start, stop = int(self.annotations.start[row]), int(self.annotations.stop[row])
+        start, stop, similarity = self.project.find_similar(start, stop)
+        n_added = self.project.add_similar(start, stop, similarity, int(self.annotations.label[row]))
+        return n_added, similarity
 
     def save_annotated_events_csv(self, path):
-        """ Method for saving all annotations to a .csv-file. """
-        df = copy.deepcopy(self.table_data)
-        for index, row in df.iterrows():
-            milliseconds_from = str(datetime.timedelta(milliseconds=(row["From"] / self.audio_rate) * 1000))[:-4]
-            milliseconds_to = str(datetime.timedelta(milliseconds=(row["To"] / self.audio_rate) * 1000))[:-4]
-            df.loc[index, 'From'] = milliseconds_from + f" ({row['From']})"
-            df.loc[index, 'To'] = milliseconds_to + f" ({row['To']})"
-
-        del df['Region']
-        del df['Selected']
-        del df['Initial']
-        df.to_csv(path, sep=';')
+        """
+        Method for saving all annotations to a .csv-file (or .parquet/.feather-file, see export_annotations).
+        Additional columns can be configured with 'export_columns' in setup.json.
+        """
+        self.project.export_annotations(path)
 
     ##################################################################################
-    # Methods that modify the DataFrame through window events
+    # Methods that modify the annotations through window events
     ##################################################################################
     def add_event(self):
         """
         Method adds an event ('yellow' event).
         """
         # check if any row is selected --> if yes, no new event can be added until the row in unselected again
-        for index, row in self.table_data.iterrows():
-            if bool(row['Selected']) is True:
-                return
+        if self.annotations.selected is not None:
+            return
 
         # get current position/region and add a new event there
-        pos = self.audio_player.position() / 1000 * self.audio_rate
+        pos = self.audio_player.sample_position()
         min_x, max_x = self.region.getRegion()
 
-        region = RegionItem()
-        region.setRegion([min_x, max_x])
-        region.setMovable(False)
-        region.sigRegionChanged.connect(self.change_selected_region)
-        self.plot.addItem(region)
-
-        self.table_data = self.table_data.append(
-                {'Initial': pos, 'From': min_x, 'To': max_x, 'Event': '', 'Selected': False, 'Region': region},
-                ignore_index=True)
-
-        self.table_widget.reload_table()
+        self.annotations.append(pos, min_x, max_x)
 
     def add_precise_event(self, event_idx):
         """
         Method adds a precisely annotated event ('green' event).
         """
         # first check if we want to annotate an already selected region
-        for index, row in self.table_data.iterrows():
-            if bool(row['Selected']) is True:
-                self.table_data.loc[index, 'Event'] = self.events[event_idx]
-                self.reload_table()
-                self._update_region(self.table_data.loc[index, 'Region'])
-                return
+        index = self.annotations.selected
+        if index is not None:
+            self.annotations.set_label(index, event_idx)
+            return
 
         # if not, the normal region will be used to annotate the selected region
-        pos = self.audio_player.position() / 1000 * self.audio_rate
+        pos = self.audio_player.sample_position()
         min_x, max_x = self.region.getRegion()
 
         if int(min_x) == int(max_x):
@@ -173,96 +230,88 @@ class DataHandler(QtWidgets.QFrame):
             msg.exec_()
             return
 
-        region = RegionItem()
-        region.setRegion([min_x, max_x])
-        region.setMovable(False)
-        region.sigRegionChanged.connect(self.change_selected_region)
-        self.plot.addItem(region)
-
-        self.table_data = self.table_data.append(
-            {'Initial': pos, 'From': int(min_x), 'To': int(max_x),
-             'Event': self.events[event_idx], 'Selected': False, 'Region': region},
-            ignore_index=True)
-
-        self.reload_table()
+        self.annotations.append(pos, int(min_x), int(max_x), event_idx)
 
     def delete_selected_row(self):
         """
-        Deletes a selected table entry from the DataFrame.
-        """
-        for index, row in self.table_data.iterrows():
-            if row['Selected'] is True:
-                self.plot.removeItem(self.table_data.loc[index, 'Region'])
-                self.table_data = self.table_data.drop(index)
-                self.table_data = self.table_data.reset_index(drop=True)
-                self.unselect_all()
-                self.reload_table()
-                break
-
-    def reload_table(self):
-        """
-        Reloading the GUI table.
+        Deletes the selected annotation.
         """
-        self.table_widget.reload_table()
+        index = self.annotations.selected
+        if index is None:
+            return
+        self.annotations.delete(index)
+        self.unselect_all()
 
-    def play_selected_region(self):
+    def play_selected_region(self, loop=False):
         """
-        Method for playing the selected region.
+        Method for playing the selected region (once or in a loop).
         """
         if self.audio_player.state() == self.audio_player.PlayingState:
             return
         else:
             min_x, max_x = self.region.getRegion()
-            for index, row in self.table_data.iterrows():
-                if row['Selected'] is True:
-                    min_x = row['From']
-                    max_x = row['To']
+            index = self.annotations.selected
+            if index is not None:
+                min_x = self.annotations.start[index]
+                max_x = self.annotations.stop[index]
 
-            data_to_play = np.ascontiguousarray(self.audio_data[int(min_x):int(max_x)])
-            if len(data_to_play) == 0:
-                return
-
-            sd.stop()
-            sd.play(data_to_play, self.audio_rate, blocking=False)
+            self.audio_player.play_region(int(min_x), int(max_x), loop=loop)
 
     def change_selected_region(self):
         """
-        Method that changes the values within the DataFrame when the boundaries of the selected region are changing.
+        Method that changes the values of the selected annotation when the boundaries of its region are changing.
         """
-        region = self.sender()
-        min_x, max_x = region.getRegion()
-        for index, row in self.table_data.iterrows():
-            if row['Selected'] is True:
-                self.table_data.loc[index, 'From'] = min_x
-                self.table_data.loc[index, 'To'] = max_x
-                self.reload_table()
-                break
+        index = self.annotations.selected
+        if index is None:
+            return
+        min_x, max_x = self.sender().getRegion()
+        # all changes of one drag are undone at once
+        with self.history.merging(('region', index)):
+            self.annotations.set_bounds(index, min_x, max_x)
+
+    def finish_changing_selected_region(self):
+        """
+        Method called when dragging the region of the selected annotation was finished.
+        """
+        self.history.seal()
+
+    def undo(self):
+        """
+        Reverts the last modification of the annotations.
+        """
+        self._apply_history(self.history.undo)
+
+    def redo(self):
+        """
+        Applies the last reverted modification again.
+        """
+        self._apply_history(self.history.redo)
+
+    def _apply_history(self, function):
+        selected = self.annotations.selected
+        function()
+        # the selected annotation was removed
+        if selected is not None and self.annotations.selected is None:
+            self.unselect_all()
 
     def select_previous_or_next_event(self, x):
         """
-        Method for selecting the previous or next annotated event (when clicking the corresponding button/key)
+        Method for selecting the previous or next annotated event in time (when clicking the corresponding button/key).
+        If no event is selected, the events next to the region used for annotating are selected.
         """
-        if len(self.table_data) == 0:
+        if len(self.annotations) == 0:
             return
 
-        currently_selected = None
-        for index, row in self.table_data.iterrows():
-            if bool(row['Selected']) is True:
-                currently_selected = index
-                break
-
+        currently_selected = self.annotations.selected
         if currently_selected is None:
-            if x == -1:
-                return
-            else:
-                new_index = 0
+            new_index = self.interval_index.next_from(self.region.getRegion()[0], x)
         else:
-            new_index = currently_selected + x
-            if new_index == -1:
-                self.reload_table()
+            new_index = self.interval_index.neighbour(currently_selected, x)
+            if new_index is None:
+                # stay at the first/last event
                 return
-            elif new_index >= len(self.table_data):
-                new_index = len(self.table_data) - 1
+        if new_index is None:
+            return
 
         self.unselect_all()
         self.table_widget.select_row(new_index)
@@ -271,41 +320,22 @@ class DataHandler(QtWidgets.QFrame):
         """
         Method for unselecting all events within the table. (I just do it for all entries to keep everything clean)
         """
-        for index, row in self.table_data.iterrows():
-            row['Region'].setMovable(False)
-            self._update_region(row['Region'])
-
         self.region.setVisible(True)
         self.region.setMovable(True)
-        self.table_data.loc[:, 'Selected'] = False
-        self.reload_table()
-
-    @staticmethod
-    def _update_region(region):
-        """ Set visible false and true as workaround to update the regions color inside the PyGraphItem """
-        region.setVisible(False)
-        region.setVisible(True)
+        self.annotations.unselect()
 
     ##################################################################################
     # Methods to get data for Bar Graph Window
     ##################################################################################
     def get_bar_graph_data(self, flag='length'):
-        if flag is not 'count' and flag is not 'length':
+        if flag != 'count' and flag != 'length':
             raise ValueError("Parameter 'flag' is not valid.")
 
-        y_data = np.zeros(10)
-        for index, event in enumerate(self.events):
-            for _, row in self.table_data.iterrows():
-                if row['Event'] == event:
-                    if flag == 'count':
-                        y_data[index] += 1
-                    elif flag == 'length':
-                        length = row['To'] - row['From']
-                        y_data[index] += length
-        if max(y_data) == 0:
+        if flag == 'length':
+            y_data = self.class_statistics.total_durations().astype(np.float64)
+        else:
+            y_data = self.class_statistics.counts().astype(np.float64)
+        if len(y_data) == 0 or max(y_data) == 0:
             return y_data
         else:
             return y_data / max(y_data)
-
-
-
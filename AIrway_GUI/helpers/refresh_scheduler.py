@@ -0,0 +1,47 @@
+from PyQt5 import QtCore
+
+
+class RefreshScheduler(QtCore.QObject):
+    """
+    Central invalidation of the views that show the annotations.
+
+    Components mark the parts of the GUI that are out of date as dirty instead of refreshing them directly. All dirty
+    parts are refreshed together in one deferred flush when control returns to the event loop, so a user action that
+    modifies the annotations several times (e.g. unselect, then select) refreshes every part only once and parts
+    that did not change are not refreshed at all.
+    """
+    TABLE = 'table'
+    REGIONS = 'regions'
+    STATISTICS = 'statistics'
+
+    def __init__(self, parent=None):
+        super(RefreshScheduler, self).__init__(parent)
+        self._callbacks = {}
+        self._dirty = set()
+        self._flush_scheduled = False
+
+    def register(self, part, callback):
+        """ Registers a callback that refreshes the given part. """
+        self._callbacks.setdefault(part, []).append(callback)
+
+    def unregister(self, part, callback):
+        self._callbacks[part].remove(callback)
+
+    def mark_dirty(self, *parts):
+        self._dirty.update(parts)
+        if not self._flush_scheduled:
+            self._flush_scheduled = True
+            QtCore.QTimer.singleShot(0, self.flush)
+
+    def is_dirty(self, part):
+        return part in self._dirty
+
+    def flush(self):
+        """ Refreshes all dirty parts (can also be called directly if a refresh is needed immediately). """
+        self._flush_scheduled = False
+        # parts marked as dirty by a callback are refreshed in the next flush
+        dirty, self._dirty = self._dirty, set()
+        for part, callbacks in list(self._callbacks.items()):
+            if part in dirty:
+                for callback in list(callbacks):
+                    callback()
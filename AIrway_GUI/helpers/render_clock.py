@@ -0,0 +1,63 @@
+from PyQt5 import QtCore, QtGui
+import time
+
+
+class RenderClock(QtCore.QObject):
+    """
+    Clock that ticks once per display frame while the PlaybackEngine is playing.
+
+    The engine advances its position block by block (from the thread of the sink), so between two blocks the
+    playhead is interpolated with the sample rate from the time the last change was seen. Every tick emits the
+    playhead only if it has moved, i.e. all visual updates are coalesced to at most one per frame.
+    """
+    tick = QtCore.pyqtSignal(int)
+
+    def __init__(self, engine, parent=None):
+        super(RenderClock, self).__init__(parent)
+        self.engine = engine
+        self._engine_position = None
+        self._engine_time = 0.0
+        self._last_position = None
+
+        self._timer = QtCore.QTimer(self)
+        self._timer.setTimerType(QtCore.Qt.PreciseTimer)
+        self._timer.timeout.connect(self._tick)
+
+    @staticmethod
+    def frame_interval():
+        """ Duration of one display frame in milliseconds. """
+        screen = QtGui.QGuiApplication.primaryScreen()
+        refresh_rate = screen.refreshRate() if screen is not None and screen.refreshRate() > 0 else 60
+        return max(int(1000 / refresh_rate), 1)
+
+    def start(self):
+        self._engine_position = None
+        self._timer.start(self.frame_interval())
+
+    def stop(self):
+        self._timer.stop()
+
+    def is_running(self):
+        return self._timer.isActive()
+
+    def position(self):
+        """ Returns the (interpolated) playhead in samples. """
+        engine_position = self.engine.position
+        now = time.monotonic()
+        if engine_position != self._engine_position or not self.engine.is_playing:
+            self._engine_position = engine_position
+            self._engine_time = now
+            return engine_position
+        # the next block of the sink moves the position by (at most) blocksize samples
+        elapsed = int((now - self._engine_time) * self.engine.rate)
+        return engine_position + min(elapsed, self.engine.blocksize)
+
+    def _tick(self):
+        playing = self.engine.is_playing
+        position = self.position()
+        if position != self._last_position or not playing:
+            self._last_position = position
+            self.tick.emit(position)
+        if not playing:
+            # the end of the file was reached (the last position is still emitted)
+            self._timer.stop()
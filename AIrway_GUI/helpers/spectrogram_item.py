@@ -0,0 +1,96 @@
+from PyQt5 import QtCore, QtGui
+import pyqtgraph as pg
+
+
+class SpectrogramItem(pg.ItemGroup):
+    """
+    Item that shows a tiled Spectrogram as one image per tile.
+
+    Whenever the view range or size changes, the spectrogram level matching the current pixel width is selected and
+    the tiles of the visible range are requested, followed by PREFETCH_TILES neighbouring tiles on each side (so
+    panning and following the playhead mostly find them in the cache). Tiles are computed in the thread pool of the
+    spectrogram and shown as soon as they arrive; until the visible range is complete, the images of the previous
+    range/level stay visible.
+    """
+    PREFETCH_TILES = 2
+    # dB range that is mapped to the color map
+    LEVELS = (-100, -20)
+    COLORS = [(0, 0, 4), (40, 11, 84), (101, 21, 110), (159, 42, 99), (212, 72, 66), (245, 125, 21),
+              (250, 193, 39), (252, 255, 164)]
+
+    tileReady = QtCore.pyqtSignal(object)
+
+    def __init__(self, spectrogram):
+        super(SpectrogramItem, self).__init__()
+        self.spectrogram = spectrogram
+        self._lookup_table = pg.ColorMap([i / (len(self.COLORS) - 1) for i in range(len(self.COLORS))],
+                                         self.COLORS).getLookupTable(nPts=256)
+        self._images = {}
+        self._visible = set()
+        # tiles are computed in other threads, the queued signal shows them in the GUI thread
+        self.tileReady.connect(self._tile_ready)
+
+    def viewRangeChanged(self, *args):
+        super(SpectrogramItem, self).viewRangeChanged()
+        self._update_tiles()
+
+    def viewTransformChanged(self):
+        super(SpectrogramItem, self).viewTransformChanged()
+        self._update_tiles()
+
+    def _update_tiles(self):
+        view_box = self.getViewBox()
+        if not isinstance(view_box, pg.ViewBox) or view_box.width() <= 0:
+            return
+        x_min, x_max = view_box.viewRange()[0]
+        level = self.spectrogram.select_level((x_max - x_min) / view_box.width())
+        visible = self.spectrogram.tile_indices(level, x_min, x_max)
+        prefetch = [index for offset in range(1, self.PREFETCH_TILES + 1)
+                    for index in (visible.start - offset, visible.stop - 1 + offset)
+                    if 0 <= index < self.spectrogram.n_tiles(level)]
+        self._visible = {(level, index) for index in visible}
+
+        # requests of tiles that are not needed anymore (e.g. after zooming) are dropped
+        self.spectrogram.cancel(keep=self._visible.union((level, index) for index in prefetch))
+        # the visible tiles are requested first
+        for index in list(visible) + prefetch:
+            self.spectrogram.request(level, index, self.tileReady.emit)
+        for key in self._visible:
+            tile = self.spectrogram.tile(*key)
+            if tile is not None:
+                self._show(tile)
+        self._remove_hidden(x_min, x_max)
+
+    def _tile_ready(self, tile):
+        if (tile.level, tile.index) in self._visible:
+            self._update_tiles()
+
+    def _show(self, tile):
+        key = (tile.level, tile.index)
+        if key in self._images:
+            return
+        image = pg.ImageItem(tile.values, lut=self._lookup_table, levels=self.LEVELS)
+        image.setTransform(QtGui.QTransform.fromScale(tile.hop, self.spectrogram.max_frequency /
+                                                      (self.spectrogram.n_bins - 1)))
+        image.setPos(tile.start, 0)
+        # finer levels are drawn above coarser ones
+        image.setZValue(-tile.level)
+        image.setParentItem(self)
+        self._images[key] = image
+
+    def _remove_hidden(self, x_min, x_max):
+        """
+        Removes the images that are not part of the visible tiles. Images that are still in the view are kept until
+        all visible tiles are shown.
+        """
+        complete = self._visible.issubset(self._images)
+        for key, image in list(self._images.items()):
+            if key in self._visible:
+                continue
+            start = image.pos().x()
+            stop = start + image.width() * self.spectrogram.hop(key[0])
+            if complete or stop < x_min or start > x_max:
+                image.setParentItem(None)
+                if image.scene() is not None:
+                    image.scene().removeItem(image)
+                del self._images[key]
@@ -0,0 +1,80 @@
+import pyqtgraph as pg
+
+from ..core.waveform_pyramid import envelope_from_samples
+
+
+class WaveformItem(pg.PlotCurveItem):
+    """
+    Curve item that draws a waveform through a WaveformPyramid.
+
+    Whenever the view range or size changes, the pyramid level matching the current pixel width is selected and only
+    the envelope of the visible range is handed to the curve. When zoomed in further than the finest level, the
+    visible samples are read from the audio source. While a file is still being scanned, the pyramid can be replaced
+    by pyramids covering more and more of the file (see set_pyramid).
+    """
+    def __init__(self, audio_source, pyramid, channel=0, **kwargs):
+        super(WaveformItem, self).__init__(**kwargs)
+        self.audio_source = audio_source
+        self.channel = channel
+        self.pyramid = None
+        self._y_range = None
+        self._current = None
+        self.set_pyramid(pyramid)
+
+    def set_pyramid(self, pyramid):
+        self.pyramid = pyramid
+        self._y_range = pyramid.value_range() if pyramid.levels else self.audio_source.full_scale
+        self._current = None
+        self._update_envelope()
+        self.informViewBoundsChanged()
+
+    def dataBounds(self, ax, frac=1.0, orthoRange=None):
+        """ Bounds of the whole waveform (and not only of the currently drawn part). """
+        if ax == 0:
+            return 0, len(self.audio_source)
+        return self._y_range
+
+    def viewRangeChanged(self, *args):
+        super(WaveformItem, self).viewRangeChanged()
+        self._update_envelope()
+
+    def viewTransformChanged(self):
+        super(WaveformItem, self).viewTransformChanged()
+        self._update_envelope()
+
+    def _update_envelope(self):
+        view_box = self.getViewBox()
+        if not isinstance(view_box, pg.ViewBox) or view_box.width() <= 0:
+            return
+        x_min, x_max = view_box.viewRange()[0]
+        width = view_box.width()
+        # draw one additional screen width on each side so small pans do not need an update
+        span = x_max - x_min
+        start = max(int(x_min - span), 0)
+        stop = min(int(x_max + span), len(self.audio_source))
+        samples_per_pixel = span / width
+
+        if samples_per_pixel < self.pyramid.base_bin_size:
+            level = None
+            bin_size = max(int(samples_per_pixel), 1)
+        else:
+            # None if nothing of the file was scanned yet
+            level = self.pyramid.select_level(samples_per_pixel)
+            bin_size = self.pyramid.bin_size(level) if level is not None else 0
+
+        # skip the update if the drawn data still covers the view at the same resolution
+        if self._current is not None:
+            current_level, current_bin_size, current_start, current_stop = self._current
+            if (current_level, current_bin_size) == (level, bin_size) and \
+                    current_start <= max(int(x_min), 0) and current_stop >= min(int(x_max), len(self.audio_source)):
+                return
+        self._current = (level, bin_size, start, stop)
+
+        if bin_size == 0:
+            x, y = [], []
+        elif level is None:
+            start -= start % bin_size
+            x, y = envelope_from_samples(self.audio_source.read(start, stop, channel=self.channel), start, bin_size)
+        else:
+            x, y = self.pyramid.envelope(level, start, stop)
+        self.setData(x, y)
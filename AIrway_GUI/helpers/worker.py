@@ -0,0 +1,64 @@
+from PyQt5 import QtCore
+import traceback
+
+
+class Cancelled(Exception):
+    """
+    Raised inside a worker function to stop it after the user cancelled the work.
+    """
+
+
+class Worker(QtCore.QThread):
+    """
+    Thread that runs a function in the background and reports its progress to the GUI thread.
+
+    The function is called with the worker as only argument and can use report_progress, report_partial_result and
+    check_cancelled. All signals are delivered in the GUI thread. After the thread finished, the result (or the error
+    message) is also available as attribute.
+    """
+    progress = QtCore.pyqtSignal(float)
+    partial_result = QtCore.pyqtSignal(object)
+    result_ready = QtCore.pyqtSignal(object)
+    failed = QtCore.pyqtSignal(str)
+    cancelled = QtCore.pyqtSignal()
+
+    def __init__(self, function):
+        super(Worker, self).__init__()
+        self._function = function
+        self._cancel_requested = False
+        self.result = None
+        self.error_msg = None
+
+    def run(self):
+        try:
+            self.result = self._function(self)
+        except Cancelled:
+            self.cancelled.emit()
+        except Exception as e:
+            traceback.print_exc()
+            self.error_msg = str(e)
+            self.failed.emit(self.error_msg)
+        else:
+            self.result_ready.emit(self.result)
+
+    ##################################################################################
+    # Methods called from the GUI thread
+    ##################################################################################
+    def cancel(self):
+        self._cancel_requested = True
+
+    ##################################################################################
+    # Methods called from the worker function
+    ##################################################################################
+    def report_progress(self, fraction):
+        self.progress.emit(fraction)
+
+    def report_partial_result(self, partial_result):
+        self.partial_result.emit(partial_result)
+
+    def is_cancelled(self):
+        return self._cancel_requested
+
+    def check_cancelled(self):
+        if self._cancel_requested:
+            raise Cancelled()
@@ -3,9 +3,9 @@ from PyQt5.QtGui import QPalette, QColor
 from PyQt5.QtCore import Qt
 import sys
 from pathlib import Path
-import flammkuchen as fl
 import os
 from datetime import datetime
+from functools import partial
 
 from .widgets.table_widget import TableWidget
 from .widgets.annotate_precise_widget import AnnotatePreciseWidget
@@ -14,10 +14,18 @@ from .widgets.bar_graph_widget import BarGraphWindow
 
 from .helpers.data_handler import DataHandler
 from .helpers.audio_player import AudioPlayer
-from .helpers.calculate_md5_hash import get_md5_hash
+from .helpers.worker import Worker
+from .core.clip_export import MANIFEST_NAME
+from .core.project_file import read_project_file
+from .helpers.refresh_scheduler import RefreshScheduler
 
 
 class MainWindow(QtWidgets.QMainWindow):
+    # milliseconds between two flushes of the autosave journal
+    AUTOSAVE_INTERVAL = 1000
+    # size (bytes) from which the journal is compacted into the .airway-file
+    JOURNAL_COMPACTION_SIZE = 2 ** 20
+
     def __init__(self):
         super(MainWindow, self).__init__()
         self.directory = None
@@ -41,6 +49,8 @@ class MainWindow(QtWidgets.QMainWindow):
 
         self.menu_extras.addAction("Export Annotations (.csv)", self._export_annotated_events_csv)
         self.menu_extras.addAction("Export Annotations (.wav)", self._export_annotated_events_wav)
+        self.menu_extras.addAction("Detect Events", self._detect_events)
+        self.menu_extras.addAction("Predict Labels", self._predict_labels)
 
         # variables for "Extras" menu point
         self.bar_graph_window = None
@@ -48,6 +58,28 @@ class MainWindow(QtWidgets.QMainWindow):
         # init some variables
         self.data_handler = None
         self.audio_player = None
+        self.shortcuts = []
+
+        # progress of loading a file in the background (shown in the status bar)
+        self.loading_worker = None
+        self._expected_hash = None
+        # workers of operations that show a progress dialog (e.g. exporting)
+        self.progress_workers = []
+        # worker that saves the annotations in the background
+        self.save_worker = None
+        self.loading_progress_bar = QtWidgets.QProgressBar()
+        self.loading_progress_bar.setRange(0, 1000)
+        self.loading_progress_bar.setMaximumWidth(250)
+        self.cancel_loading_button = QtWidgets.QPushButton('Cancel')
+        self.cancel_loading_button.clicked.connect(self._cancel_loading)
+        self.statusBar().addPermanentWidget(self.loading_progress_bar)
+        self.statusBar().addPermanentWidget(self.cancel_loading_button)
+        self._show_loading_widgets(False)
+
+        # changes of the annotations are recorded in a journal, which is flushed regularly (see _autosave)
+        self.autosave_timer = QtCore.QTimer(self)
+        self.autosave_timer.setInterval(self.AUTOSAVE_INTERVAL)
+        self.autosave_timer.timeout.connect(self._autosave)
 
         self.setGeometry(200, 150, 1300, 800)
         # self.setWindowIcon(QtGui.QIcon(' '))
@@ -76,8 +108,12 @@ class MainWindow(QtWidgets.QMainWindow):
         self.data_handler.table_widget = table_widget
         self.main_layout.addWidget(table_widget, 0, 1, 3, 1)
 
-        if self.initialized is False:
+        self.data_handler.refresh_scheduler.register(RefreshScheduler.STATISTICS, self.update_bar_graph_window)
+
+        if not self.shortcuts:
             self.init_shortcuts()
+        for shortcut in self.shortcuts:
+            shortcut.setEnabled(True)
 
         # finally, add main_layout to the main_widget
         self.main_widget.setLayout(self.main_layout)
@@ -99,17 +135,10 @@ class MainWindow(QtWidgets.QMainWindow):
         path = Path(fn)
         self.directory = path.parent
         self.filename = path.stem
+        self.save_path = None
 
-        if self.initialized is False:
-            self.data_handler = DataHandler(path)
-            self._init_ui()
-            self.initialized = True
-        else:
-            self.save_path = None
-            for i in reversed(range(self.main_layout.count())):
-                self.main_layout.itemAt(i).widget().setParent(None)
-            self.data_handler = DataHandler(path)
-            self._init_ui()
+        self._start_session(DataHandler(path))
+        self._start_journal()
 
     def _open(self):
         if self._ask_save() is False:
@@ -121,47 +150,247 @@ class MainWindow(QtWidgets.QMainWindow):
             return
 
         d_path = Path(fn)
+        try:
+            project_file = read_project_file(d_path)
+        except (OSError, ValueError) as e:
+            self._error_messagebox(str(e))
+            return
         self.save_path = d_path
         self.directory = d_path.parent
         self.filename = d_path.stem
-        dict_ = fl.load(str(d_path))
-        wav_file_path = str(d_path.parent) + '/' + dict_['Filename']
-        if os.path.exists(wav_file_path):
-            if get_md5_hash(wav_file_path) != dict_['FileHash']:
-                self._error_messagebox(f'File with name "{dict_["Filename"]}" is not the same used in "{d_path.name}" '
-                                       f'(detected different MD5 hashes).')
-                return
-            else:
-                audio_path = Path(wav_file_path)
-        else:
-            self._error_messagebox(f'Corresponding filename "{dict_["Filename"]}" not found. '
+        wav_file_path = str(d_path.parent) + '/' + project_file.filename
+        if not os.path.exists(wav_file_path):
+            self._error_messagebox(f'Corresponding filename "{project_file.filename}" not found. '
                                    f'Please make sure it is in the same directory as "{d_path.name}".')
             return
 
-        if self.initialized is False:
-            self.data_handler = DataHandler(audio_path)
-            self._init_ui()
-            self.data_handler.load_annotations(dict_)
-            self.initialized = True
+        # the hash is taken from the cache of the DataHandler if the file was opened before, otherwise it is checked
+        # as soon as the file was scanned in the background
+        data_handler = DataHandler(Path(wav_file_path))
+        if data_handler.is_scanned and data_handler.file_hash != project_file.file_hash:
+            data_handler.close()
+            self._hash_mismatch_messagebox(project_file.filename, d_path.name)
+            return
+
+        expected_hash = (project_file.file_hash, project_file.filename, d_path.name)
+        self._start_session(data_handler, expected_hash=None if data_handler.is_scanned else expected_hash)
+        self.data_handler.load_annotations(project_file)
+        if self._expected_hash is None:
+            self._start_journal()
         else:
-            self.save_path = None
-            for i in reversed(range(self.main_layout.count())):
-                self.main_layout.itemAt(i).widget().setParent(None)
-            self.data_handler = DataHandler(audio_path)
-            self._init_ui()
-            self.data_handler.load_annotations(dict_)
+            # the annotations are shown while the file is scanned, but they can only be edited (and the journal is
+            # only started) once the hash was verified, see _loading_finished
+            self._set_editing_enabled(False)
+
+    def _start_session(self, data_handler, expected_hash=None):
+        """
+        Replaces the current data/widgets by a new DataHandler. If the audio file is not in the cache, it is scanned
+        in the background while the window is already usable. expected_hash is (hash, audio file name, .airway-file
+        name) if the hash has to be verified after scanning.
+        """
+        self._stop_loading()
+        # the user was asked to save the current session before
+        self._remove_session_widgets(discard_journal=True)
+        self.data_handler = data_handler
+        self._init_ui()
+        self.initialized = True
+
+        self._expected_hash = expected_hash
+        if not self.data_handler.is_scanned:
+            self._start_loading()
+
+    def _set_editing_enabled(self, enabled):
+        """ Enables/disables the widgets and shortcuts that can change the annotations. """
+        self.annotate_precise_widget.setEnabled(enabled)
+        self.data_handler.table_widget.setEnabled(enabled)
+        for shortcut in self.shortcuts:
+            shortcut.setEnabled(enabled)
+
+    def _close_session(self):
+        """
+        Removes all data/widgets, e.g. if loading a file was cancelled. The user was not asked to save, so the journal
+        is kept and its changes are recovered when the file is opened again.
+        """
+        self._stop_loading()
+        self.close_bar_graph_window()
+        self._remove_session_widgets(discard_journal=False)
+        for shortcut in self.shortcuts:
+            shortcut.setEnabled(False)
+        self.data_handler = None
+        self.save_path = None
+        self._expected_hash = None
+        self.initialized = False
+
+    def _remove_session_widgets(self, discard_journal):
+        """
+        Removes the widgets of the current session and releases its audio device. The journal is only discarded if
+        discard_journal is True (i.e. the user saved the changes or decided to drop them).
+        """
+        if not self.initialized:
+            return
+        self._wait_for_saving()
+        self._stop_journal(remove=discard_journal)
+        self.data_handler.project.close_spectrogram()
+        self.audio_player.close()
+        for i in reversed(range(self.main_layout.count())):
+            self.main_layout.itemAt(i).widget().setParent(None)
+
+    ##################################################################################
+    # Autosave
+    ##################################################################################
+    def _start_journal(self):
+        """
+        Starts the autosave journal of the session. Changes that were not saved because of a crash are recovered from
+        the journal of the same file.
+        """
+        recovered = self.data_handler.project.start_journal(self.save_path)
+        self.autosave_timer.start()
+        if recovered:
+            QtWidgets.QMessageBox.information(self, 'Recovered changes', f'{recovered} unsaved changes of the last '
+                                                                         f'session were recovered.')
+
+    def _stop_journal(self, remove):
+        """
+        Stops the journal at the end of a session. It is removed if the user saved the changes or decided to drop them,
+        otherwise it is kept (with all changes flushed) for recovering them later.
+        """
+        self.autosave_timer.stop()
+        self.data_handler.project.close_journal(remove=remove)
+
+    def _autosave(self):
+        journal = self.data_handler.project.journal if self.data_handler is not None else None
+        if journal is None:
+            return
+        journal.flush()
+        # a large journal is compacted into the .airway-file (if the session was saved before)
+        if journal.size > self.JOURNAL_COMPACTION_SIZE and self.save_path is not None and \
+                self.data_handler.is_scanned and self.save_worker is None:
+            self._start_saving(self.save_path)
+
+    ##################################################################################
+    # Saving in the background
+    ##################################################################################
+    def _start_saving(self, path):
+        """
+        Saves a snapshot of the annotations in a Worker (the file is replaced atomically), so annotating can continue
+        while the file is written. The result is shown in the status bar.
+        """
+        self._wait_for_saving()
+        job = self.data_handler.project.begin_save(path)
+        self.save_worker = Worker(lambda _: job.run())
+        self.save_worker.finished.connect(self._saving_thread_finished)
+        self.statusBar().showMessage(f'Saving {Path(path).name} ...')
+        self.save_worker.start()
+
+    def _saving_thread_finished(self):
+        # the signal can arrive after _wait_for_saving already finished the save
+        if self.save_worker is not None and self.sender() is self.save_worker:
+            self._finish_saving()
+
+    def _wait_for_saving(self):
+        """ Waits until a running save finished (e.g. before a session ends) and returns False if saving failed. """
+        if self.save_worker is None:
+            return True
+        self.save_worker.wait()
+        return self._finish_saving()
+
+    def _finish_saving(self):
+        worker, self.save_worker = self.save_worker, None
+        if worker.error_msg is not None:
+            self.statusBar().clearMessage()
+            self._error_messagebox(f"Can't save the annotations. ({worker.error_msg})")
+            return False
+        self.data_handler.project.finish_save(worker.result)
+        self.statusBar().showMessage(f'Saved annotations to {worker.result.path}', 5000)
+        return True
+
+    ##################################################################################
+    # Loading in the background
+    ##################################################################################
+    def _start_loading(self):
+        self.loading_worker = Worker(self.data_handler.scan)
+        self.loading_worker.progress.connect(self._loading_progress)
+        self.loading_worker.partial_result.connect(self._loading_partial_result)
+        self.loading_worker.result_ready.connect(self._loading_finished)
+        self.loading_worker.failed.connect(self._loading_failed)
+        self.loading_worker.cancelled.connect(self._loading_cancelled)
+        self.loading_progress_bar.setValue(0)
+        self.statusBar().showMessage(f'Loading {self.data_handler.path.name} ...')
+        self._show_loading_widgets(True)
+        self.loading_worker.start()
+
+    def _stop_loading(self):
+        """ Cancels loading in the background and waits until the worker stopped. """
+        if self.loading_worker is not None:
+            self.loading_worker.cancel()
+            self.loading_worker.wait()
+            self.loading_worker = None
+        self._show_loading_widgets(False)
+        self.statusBar().clearMessage()
+
+    def _show_loading_widgets(self, visible):
+        self.loading_progress_bar.setVisible(visible)
+        self.cancel_loading_button.setVisible(visible)
+
+    def _is_loading_worker(self, sender):
+        # signals of a stopped worker can still arrive (their sender is None if the worker was deleted already)
+        return self.loading_worker is not None and sender is self.loading_worker
+
+    def _cancel_loading(self):
+        if self.loading_worker is not None:
+            self.loading_worker.cancel()
+
+    def _loading_progress(self, fraction):
+        if self._is_loading_worker(self.sender()):
+            self.loading_progress_bar.setValue(int(fraction * 1000))
+
+    def _loading_partial_result(self, pyramid):
+        if self._is_loading_worker(self.sender()):
+            self.annotate_precise_widget.set_pyramid(pyramid)
+
+    def _loading_finished(self, scan_result):
+        if not self._is_loading_worker(self.sender()):
+            return
+        self.loading_worker = None
+        self._show_loading_widgets(False)
+        self.statusBar().clearMessage()
+
+        self.data_handler.set_scan_result(scan_result)
+        self.annotate_precise_widget.set_pyramid(scan_result.pyramid)
+        expected_hash, self._expected_hash = self._expected_hash, None
+        if expected_hash is None:
+            return
+        if expected_hash[0] != scan_result.file_hash:
+            self._hash_mismatch_messagebox(*expected_hash[1:])
+            self._close_session()
+            return
+        self._set_editing_enabled(True)
+        self._start_journal()
+
+    def _loading_failed(self, error_msg):
+        if self._is_loading_worker(self.sender()):
+            self.loading_worker = None
+            self._close_session()
+            self._error_messagebox(f"Can't load the file. ({error_msg})")
+
+    def _loading_cancelled(self):
+        if self._is_loading_worker(self.sender()):
+            self.loading_worker = None
+            self._close_session()
 
     def _save(self):
         if self.initialized is False:
             self._error_messagebox("Please load and annotate data first.")
-            self.bar_graph_action.setChecked(False)
-            return
+            return False
+        if not self.data_handler.is_scanned:
+            self._error_messagebox("Please wait until the file is loaded completely.")
+            return False
 
         if self.save_path is None:
-            fn = QtWidgets.QFileDialog.getSaveFileName(self, 'Save Annotations',
-                                                       directory=str(
-                                                           self.directory) + '/' + self.filename if self.directory else self.filename,
-                                                       filter="*.airway")[0]
+            fn = QtWidgets.QFileDialog.getSaveFileName(
+                self, 'Save Annotations',
+                directory=str(self.directory) + '/' + self.filename if self.directory else self.filename,
+                filter="*.airway")[0]
             if not fn:
                 return False
             self.save_path = fn
@@ -170,15 +399,14 @@ class MainWindow(QtWidgets.QMainWindow):
                                                    QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No,
                                                    QtWidgets.QMessageBox.Yes)
             if reply == QtWidgets.QMessageBox.No:
-                fn = QtWidgets.QFileDialog.getSaveFileName(self, 'Save Annotations',
-                                                           directory=str(
-                                                               self.directory) + '/' + self.filename if self.directory else self.filename,
-                                                           filter="*.airway")[0]
+                fn = QtWidgets.QFileDialog.getSaveFileName(
+                    self, 'Save Annotations',
+                    directory=str(self.directory) + '/' + self.filename if self.directory else self.filename,
+                    filter="*.airway")[0]
                 if not fn:
                     return False
                 self.save_path = fn
-        self.data_handler.save(self.save_path)
-        self.saving_successful_messagebox(self.save_path)
+        self._start_saving(self.save_path)
         return True
 
     def _close(self):
@@ -191,6 +419,18 @@ class MainWindow(QtWidgets.QMainWindow):
         self.close_bar_graph_window()
         if not self._ask_save():
             a0.ignore()
+            return
+        self._stop_loading()
+        for worker in self.progress_workers:
+            worker.cancel()
+            worker.wait()
+        if self.initialized:
+            self._wait_for_saving()
+            # _ask_save was answered with a successful save or an explicit 'No'
+            self._stop_journal(remove=True)
+            self.data_handler.project.close_spectrogram()
+        if self.audio_player is not None:
+            self.audio_player.close()
 
     ##################################################################################
     # Extras
@@ -227,14 +467,18 @@ class MainWindow(QtWidgets.QMainWindow):
             self.bar_graph_action.setChecked(False)
             return
 
-        fn = QtWidgets.QFileDialog.getSaveFileName(self, 'Export Annotations as .csv',
-                                                   directory=str(
-                                                       self.directory) + '/' + self.filename if self.directory else self.filename,
-                                                   filter="*.csv")[0]
+        fn = QtWidgets.QFileDialog.getSaveFileName(
+            self, 'Export Annotations as .csv',
+            directory=str(self.directory) + '/' + self.filename if self.directory else self.filename,
+            filter="*.csv;;*.parquet;;*.feather")[0]
         if not fn:
             return
-        # save all events to the created folder
-        self.data_handler.save_annotated_events_csv(fn)
+        # save all events to the created file
+        try:
+            self.data_handler.save_annotated_events_csv(fn)
+        except (ImportError, ValueError) as e:
+            self._error_messagebox(str(e))
+            return
         self.saving_successful_messagebox(fn)
 
     def _export_annotated_events_wav(self):
@@ -247,13 +491,121 @@ class MainWindow(QtWidgets.QMainWindow):
                                                         directory=str(self.directory) if self.directory else "")
         if not fn:
             return
-        # create new folder
-        folder_name = "Annotated_Events_" + str(datetime.now().strftime("%d%m%Y_%H%M%S"))
-        path = os.path.join(fn, folder_name)
-        os.mkdir(path)
-        # save all events to the created folder
-        self.data_handler.save_annotated_events_wav(path)
-        self.saving_successful_messagebox(path)
+        if os.path.exists(os.path.join(fn, MANIFEST_NAME)):
+            # export again into a folder of a previous export (unchanged clips are skipped)
+            path = fn
+        else:
+            # create new folder
+            folder_name = "Annotated_Events_" + str(datetime.now().strftime("%d%m%Y_%H%M%S"))
+            path = os.path.join(fn, folder_name)
+            os.mkdir(path)
+        # save all events to the folder in the background
+        self._run_with_progress_dialog('Exporting annotations ...',
+                                       partial(self.data_handler.save_annotated_events_wav, path),
+                                       lambda result: self.saving_successful_messagebox(path))
+
+    def _detect_events(self):
+        if self.initialized is False:
+            self._error_messagebox("Please load data first.")
+            return
+        if self._expected_hash is not None:
+            self._error_messagebox("Please wait until the file is loaded completely.")
+            return
+        self._run_with_progress_dialog('Detecting events ...', self.data_handler.detect_events,
+                                       self._add_detected_events)
+
+    def _add_detected_events(self, candidates):
+        n_added = self.data_handler.add_candidates(candidates)
+        QtWidgets.QMessageBox.information(self, 'Detect Events', f'{n_added} candidate events were added '
+                                                                 f'({len(candidates[0]) - n_added} overlapped existing '
+                                                                 f'annotations).')
+
+    def _predict_labels(self):
+        if self.initialized is False:
+            self._error_messagebox("Please load data first.")
+            return
+        if self._expected_hash is not None:
+            self._error_messagebox("Please wait until the file is loaded completely.")
+            return
+        try:
+            job = self.data_handler.begin_prediction()
+        except (ImportError, ValueError) as e:
+            self._error_messagebox(f"The scorer could not be loaded: {e}")
+            return
+        self._run_with_progress_dialog('Predicting labels ...', partial(self.data_handler.predict_labels, job),
+                                       self._set_predictions)
+
+    def _set_predictions(self, result):
+        n_predicted = self.data_handler.set_predictions(result)
+        QtWidgets.QMessageBox.information(self, 'Predict Labels', f'Labels were proposed for {n_predicted} unlabelled '
+                                                                  f'events (sort the table by "Score" to review them).')
+
+    def find_similar_events(self):
+        """
+        Adds the events that are most similar to the selected event. The similarity index of the file is built first
+        (in the background, only once per file since it is cached).
+        """
+        if self.initialized is False:
+            self._error_messagebox("Please load data first.")
+            return
+        if self._expected_hash is not None:
+            self._error_messagebox("Please wait until the file is loaded completely.")
+            return
+        row = self.data_handler.annotations.selected
+        if row is None:
+            self._error_messagebox("Please select an event first.")
+            return
+        if self.data_handler.similarity_index is None:
+            self._run_with_progress_dialog('Building the similarity index ...',
+                                           self.data_handler.build_similarity_index,
+                                           lambda index: self._add_similar_events(row))
+        else:
+            self._add_similar_events(row)
+
+    def _add_similar_events(self, row):
+        n_added, similarity = self.data_handler.find_similar_events(row)
+        if n_added == 0:
+            QtWidgets.QMessageBox.information(self, 'Find Similar Events', 'No similar events were found.')
+            return
+        QtWidgets.QMessageBox.information(self, 'Find Similar Events', f'{n_added} similar events were added '
+                                                                       f'(similarity {similarity.max():.2f} ... '
+                                                                       f'{similarity.min():.2f}).')
+
+    def _run_with_progress_dialog(self, text, function, on_result):
+        """
+        Runs function(worker) in a Worker while a modal progress dialog (that can cancel the worker) is shown.
+        on_result is called with the result of the function if it was successful.
+        """
+        dialog = QtWidgets.QProgressDialog(text, 'Cancel', 0, 1000, self)
+        dialog.setWindowModality(Qt.WindowModal)
+        dialog.setMinimumDuration(0)
+        dialog.setAutoClose(False)
+        dialog.setAutoReset(False)
+        dialog.setValue(0)
+
+        worker = Worker(function)
+        dialog.canceled.connect(worker.cancel)
+        worker.progress.connect(lambda fraction: dialog.setValue(int(fraction * 1000)))
+
+        def finish():
+            dialog.canceled.disconnect(worker.cancel)
+            dialog.close()
+            self.progress_workers.remove(worker)
+
+        def result_ready(result):
+            finish()
+            on_result(result)
+
+        def failed(error_msg):
+            finish()
+            self._error_messagebox(error_msg)
+
+        worker.result_ready.connect(result_ready)
+        worker.failed.connect(failed)
+        worker.cancelled.connect(finish)
+        # the worker has to be referenced until it is finished
+        self.progress_workers.append(worker)
+        worker.start()
 
     @staticmethod
     def saving_successful_messagebox(path):
@@ -268,6 +620,10 @@ class MainWindow(QtWidgets.QMainWindow):
     # Helper
     ##################################################################################
 
+    def _hash_mismatch_messagebox(self, filename, annotations_filename):
+        self._error_messagebox(f'File with name "{filename}" is not the same used in "{annotations_filename}" '
+                               f'(detected different MD5 hashes).')
+
     @staticmethod
     def _error_messagebox(error_msg):
         msg = QtWidgets.QMessageBox()
@@ -280,10 +636,11 @@ class MainWindow(QtWidgets.QMainWindow):
     def _ask_save(self):
         if self.initialized:
             reply = QtWidgets.QMessageBox.question(self, 'Save', 'Do you want to save?',
-                                                   QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No | QtWidgets.QMessageBox.Cancel,
+                                                   QtWidgets.QMessageBox.Yes | QtWidgets.QMessageBox.No |
+                                                   QtWidgets.QMessageBox.Cancel,
                                                    QtWidgets.QMessageBox.Yes)
             if reply == QtWidgets.QMessageBox.Yes:
-                return self._save()
+                return self._save() and self._wait_for_saving()
             elif reply == QtWidgets.QMessageBox.Cancel:
                 return False
             elif reply == QtWidgets.QMessageBox.No:
@@ -303,28 +660,41 @@ class MainWindow(QtWidgets.QMainWindow):
         keys_and_functions = [(Qt.Key_Return, self._add_event), (Qt.Key_Left, self._previous_event),
                               (Qt.Key_Right, self._next_event), (Qt.Key_P, self._play_region),
                               (Qt.Key_Delete, self._delete_row), (Qt.Key_Backspace, self._delete_row),
-                              ("Ctrl+S", self._save), (Qt.Key_Space, self.player.player_buttons_widget.toggle_play)]
+                              ("Ctrl+S", self._save), (Qt.Key_Space, self._toggle_play),
+                              ("Ctrl+Z", self._undo), ("Ctrl+Shift+Z", self._redo), ("Ctrl+Y", self._redo),
+                              ("Ctrl+F", self.find_similar_events)]
 
         for (key, function) in keys_and_functions:
             event = QtWidgets.QShortcut(QtGui.QKeySequence(key), self)
             event.activated.connect(function)
             event.setContext(QtCore.Qt.ShortcutContext.WindowShortcut)
+            self.shortcuts.append(event)
 
         # add shortcuts defined in setup.json to GUI
         for shortcut in self.data_handler.setup['shortcuts']:
             event = QtWidgets.QShortcut(QtGui.QKeySequence(shortcut), self)
             event.activated.connect(self._add_precise_event)
             event.setContext(QtCore.Qt.ShortcutContext.WindowShortcut)
+            self.shortcuts.append(event)
 
     def _add_event(self):
         self.data_handler.add_event()
 
+    def _toggle_play(self):
+        self.player.player_buttons_widget.toggle_play()
+
     def _delete_row(self):
         self.data_handler.delete_selected_row()
 
     def _play_region(self):
         self.annotate_precise_widget.play_region()
 
+    def _undo(self):
+        self.data_handler.undo()
+
+    def _redo(self):
+        self.data_handler.redo()
+
     def _previous_event(self):
         self.data_handler.select_previous_or_next_event(-1)
 
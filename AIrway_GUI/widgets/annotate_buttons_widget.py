@@ -1,5 +1,4 @@
 from PyQt5 import QtWidgets
-import sounddevice as sd
 
 
 class AnnotateButtonsWidget(QtWidgets.QFrame):
@@ -23,12 +22,16 @@ class AnnotateButtonsWidget(QtWidgets.QFrame):
         stop_region_button = QtWidgets.QPushButton('Stop')
         stop_region_button.clicked.connect(self.stop_region)
 
+        self.loop_region_button = QtWidgets.QPushButton('Loop')
+        self.loop_region_button.setCheckable(True)
+
         next_event_button = QtWidgets.QPushButton('(->) - Next Event')
         next_event_button.clicked.connect(self.next_event)
 
         self.container.addWidget(previous_event_button)
         self.container.addWidget(play_region_button)
         self.container.addWidget(stop_region_button)
+        self.container.addWidget(self.loop_region_button)
         self.container.addWidget(next_event_button)
         self.main_layout.addLayout(self.container)
 
@@ -63,14 +66,13 @@ class AnnotateButtonsWidget(QtWidgets.QFrame):
         self.setLayout(self.main_layout)
 
     def play_region(self):
-        if self._data_handler.play_obj is not None and self._data_handler.play_obj.is_playing():
-            self._data_handler.play_obj.stop()
+        if self._data_handler.audio_player.is_region_playing():
+            self._data_handler.audio_player.stop_region()
         else:
-            self._data_handler.play_selected_region()
+            self._data_handler.play_selected_region(loop=self.loop_region_button.isChecked())
 
-    @staticmethod
-    def stop_region():
-        sd.stop()
+    def stop_region(self):
+        self._data_handler.audio_player.stop_region()
 
     def next_event(self):
         self._data_handler.select_previous_or_next_event(+1)
@@ -1,8 +1,10 @@
 from PyQt5 import QtWidgets
 import pyqtgraph as pg
-import numpy as np
 
 from .annotate_buttons_widget import AnnotateButtonsWidget
+from ..helpers.annotation_regions_item import AnnotationRegionsItem
+from ..helpers.spectrogram_item import SpectrogramItem
+from ..helpers.waveform_item import WaveformItem
 
 
 class AnnotatePreciseWidget(QtWidgets.QFrame):
@@ -12,7 +14,7 @@ class AnnotatePreciseWidget(QtWidgets.QFrame):
     def __init__(self, audio_player, data_handler):
         super().__init__()
         self._audio_player = audio_player
-        self._audio_player.positionChanged.connect(self.update_region_from_player)
+        self._audio_player.playheadChanged.connect(self.update_region_from_player)
         self.data_handler = data_handler
         self.data_handler.annotate_precise_widget = self
 
@@ -24,7 +26,6 @@ class AnnotatePreciseWidget(QtWidgets.QFrame):
         self.plot_widget = pg.GraphicsLayoutWidget()
         self.plot = self.plot_widget.addPlot(row=1, col=0)
         self.data_handler.plot = self.plot
-        self.plot.setYRange(-max(self.data_handler.audio_data), max(self.data_handler.audio_data), padding=0)
         self.plot.setMouseEnabled(x=True, y=False)
 
         sizePolicy = QtWidgets.QSizePolicy(QtWidgets.QSizePolicy.Expanding, QtWidgets.QSizePolicy.Expanding)
@@ -40,37 +41,90 @@ class AnnotatePreciseWidget(QtWidgets.QFrame):
         self.plot.addItem(self.region, ignoreBounds=True)
         self.region.sigRegionChanged.connect(self.update_region)
 
+        # all annotations are painted by one item, only the selected one gets an interactive region
+        self.annotation_regions = AnnotationRegionsItem(self.data_handler)
+        self.plot.addItem(self.annotation_regions, ignoreBounds=True)
+        self.plot.addItem(self.annotation_regions.selected_region, ignoreBounds=True)
+        self.annotation_regions.selected_region.sigRegionChanged.connect(self.data_handler.change_selected_region)
+        self.annotation_regions.selected_region.sigRegionChangeFinished.connect(
+            self.data_handler.finish_changing_selected_region)
+
         self.annotate_buttons_widget = AnnotateButtonsWidget(self.data_handler)
         self.main_layout.addWidget(self.annotate_buttons_widget)
 
         self.setLayout(self.main_layout)
-        self.pplot = self.plot.plot(np.arange(0, len(self.data_handler.audio_data), 1),
-                                    self.data_handler.audio_data, pen=(255, 153, 0))
-        range_ = self.plot.getViewBox().viewRange()
-        self.plot.getViewBox().setLimits(xMin=range_[0][0], xMax=range_[0][1],
-                                         yMin=range_[1][0], yMax=range_[1][1])
-        self.plot.setDownsampling(True, True)
-        self.plot.setClipToView(True)
+        # the waveform is drawn from the min/max pyramid, i.e. only the visible part at the needed resolution
+        self.pplot = WaveformItem(self.data_handler.audio_source, self.data_handler.pyramid, pen=(255, 153, 0))
+        self.plot.addItem(self.pplot)
+        self._update_ranges()
         self.plot.hideAxis('left')
         self.plot.hideAxis('bottom')
 
-    def update_region_from_player(self):
+        # spectrogram below the waveform, always showing the same range of the file
+        self.spectrogram_plot = self.plot_widget.addPlot(row=2, col=0)
+        self.spectrogram_plot.setMouseEnabled(x=True, y=False)
+        self.spectrogram_plot.setXLink(self.plot)
+        self.spectrogram_item = SpectrogramItem(self.data_handler.project.spectrogram)
+        self.spectrogram_plot.addItem(self.spectrogram_item)
+        self.spectrogram_plot.setYRange(0, self.spectrogram_item.spectrogram.max_frequency, padding=0)
+        self.spectrogram_plot.getViewBox().setLimits(yMin=0, yMax=self.spectrogram_item.spectrogram.max_frequency)
+        self.spectrogram_plot.hideAxis('left')
+        self.spectrogram_plot.hideAxis('bottom')
+
+    def set_pyramid(self, pyramid):
         """
-        Method called continuously when playing through the media player.
+        Method called when a (more complete) waveform pyramid is available while the file is loaded in the background.
         """
-        pos = self._audio_player.position() / 1000 * self.data_handler.audio_rate
-        self.region.setRegion([pos - 10000, pos + 10000])
+        self.pplot.set_pyramid(pyramid)
+        self._update_ranges()
+
+    def _update_ranges(self):
+        min_value, max_value = self.pplot.dataBounds(1)
+        if min_value == max_value:
+            min_value, max_value = self.data_handler.audio_source.full_scale
+        self.plot.setYRange(min_value, max_value, padding=0)
+        self.plot.getViewBox().setLimits(xMin=0, xMax=len(self.data_handler.audio_source),
+                                         yMin=min_value, yMax=max_value)
+
+    def update_region_from_player(self, pos):
+        """
+        Method called once per display frame when playing through the media player (pos in samples).
+        """
+        min_x = max(pos - 10000, 0)
+        max_x = min(pos + 10000, len(self.data_handler.audio_source))
+        # the region is already inside the file, so update_region does not need to be called
+        self.region.blockSignals(True)
+        self.region.setRegion([min_x, max_x])
+        self.region.blockSignals(False)
+        if self._audio_player.state() == self._audio_player.PlayingState:
+            self._follow_playhead(pos)
+
+    def _follow_playhead(self, pos):
+        """
+        Scrolls the view while playing: once the playhead passed the center of the view, it stays there. If the
+        playhead is outside of the view (e.g. after seeking), the view jumps to it.
+        """
+        view_min, view_max = self.plot.getViewBox().viewRange()[0]
+        width = view_max - view_min
+        if pos < view_min or pos > view_max:
+            new_min = pos - width / 2
+        elif pos > view_min + width / 2:
+            new_min = pos - width / 2
+        else:
+            return
+        new_min = min(max(new_min, 0), max(len(self.data_handler.audio_source) - width, 0))
+        if new_min != view_min:
+            self.plot.setXRange(new_min, new_min + width, padding=0)
 
     def update_region(self):
         """
         Method called when changing the region boundaries inside pyqtgraph widget.
         """
         min_x, max_x = self.region.getRegion()
-        if min_x < 0:
-            min_x = 0
-        if max_x > len(self.data_handler.audio_data):
-            max_x = len(self.data_handler.audio_data)
-        self.region.setRegion([min_x, max_x])
+        clamped_min_x = max(min_x, 0)
+        clamped_max_x = min(max_x, len(self.data_handler.audio_source))
+        if (clamped_min_x, clamped_max_x) != (min_x, max_x):
+            self.region.setRegion([clamped_min_x, clamped_max_x])
 
     def play_region(self):
         """
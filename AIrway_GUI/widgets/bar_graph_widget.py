@@ -1,5 +1,6 @@
 from PyQt5 import QtWidgets, QtGui, QtCore
 import pyqtgraph as pg
+import numpy as np
 
 
 class BarGraphWindow(QtWidgets.QWidget):
@@ -29,11 +30,15 @@ class BarGraphWindow(QtWidgets.QWidget):
 
         self.plot_widget = pg.GraphicsLayoutWidget()
         self.y_axis = pg.AxisItem(orientation='left', showValues=True)
-        y = self.main_window.data_handler.setup['classes']
-        ydict = dict(enumerate(y))
-        self.y_axis.setTicks([ydict.items()])
+        self.plot = self.plot_widget.addPlot(row=1, col=0, axisItems={'left': self.y_axis})
+        self.plot.setMouseEnabled(x=False, y=False)
+        self.plot.hideAxis('bottom')
+        self.plot.setXRange(0, 1, padding=0)
 
-        self.plot = None
+        # the bars are created once and only their widths are updated
+        self.bar_graph = pg.BarGraphItem(width=[], y=[], x0=0, height=0.8, brush=QtGui.QColor('lightblue'))
+        self.plot.addItem(self.bar_graph, ignoreBounds=True)
+        self._classes = None
         self.reload_graph()
 
         self.main_layout.addWidget(self.plot_widget)
@@ -51,26 +56,20 @@ class BarGraphWindow(QtWidgets.QWidget):
         self.reload_graph()
 
     def reload_graph(self):
-        if self.plot is not None:
-            self.plot_widget.removeItem(self.plot)
-
-        self.plot = self.plot_widget.addPlot(row=1, col=0, axisItems={'left': self.y_axis})
-
+        """
+        Updates the bars (and the class names if classes were added) of the current annotations.
+        """
         x = self.main_window.data_handler.get_bar_graph_data(self.flag)
-
-        if self.flag == 'count':
-            self.bar_graph = pg.BarGraphItem(width=x, y=range(len(x)), x0=0, x1=1, height=0.8, brush=QtGui.QColor('lightgreen'))
-        else:
-            self.bar_graph = pg.BarGraphItem(width=x, y=range(len(x)), x0=0, x1=1, height=0.8, brush=QtGui.QColor('lightblue'))
-
-        self.plot.addItem(self.bar_graph, ignoreBounds=True)
-
-        self.plot.setYRange(-1, 10, padding=0)
-        self.plot.setXRange(0, 1, padding=0)
-        self.plot.setMouseEnabled(x=False, y=False)
-        self.plot.hideAxis('bottom')
-        view_box = self.plot.getViewBox()
-        view_box.setLimits(xMin=0, xMax=1, yMin=-1, yMax=10)
+        classes = self.main_window.data_handler.annotations.classes
+        if classes != self._classes:
+            self._classes = list(classes)
+            self.y_axis.setTicks([list(enumerate(self._classes))])
+            n_classes = max(len(self._classes), 1)
+            self.plot.setYRange(-1, n_classes, padding=0)
+            self.plot.getViewBox().setLimits(xMin=0, xMax=1, yMin=-1, yMax=n_classes)
+
+        color = 'lightgreen' if self.flag == 'count' else 'lightblue'
+        self.bar_graph.setOpts(width=x, y=np.arange(len(x)), x0=0, height=0.8, brush=QtGui.QColor(color))
 
     def closeEvent(self, a0: QtGui.QCloseEvent) -> None:
         self.main_window.close_bar_graph_window()
@@ -14,6 +14,7 @@ class PlayerControls(QtWidgets.QFrame):
         self._init_ui()
 
         self._audio_player.durationChanged.connect(self.change_file)
+        self.change_file()
 
     @property
     def audio_player(self):
@@ -46,8 +46,7 @@ class PlayerButtonsWidget(QtWidgets.QWidget):
             self._audio_player.play()
             self._data_handler.region.setMovable(False)
         self._data_handler.region.setVisible(True)
-        self._data_handler.table_data.loc[:, 'Selected'] = False
-        self._data_handler.reload_table()
+        self._data_handler.annotations.unselect()
 
     def _change_button_icon(self, state):
         """
@@ -67,18 +66,14 @@ class PlayerButtonsWidget(QtWidgets.QWidget):
             self._audio_player.setPosition(new_pos)
         else:
             self._audio_player.setPosition(self._audio_player.duration())
-        self._data_handler.table_data.loc[:, 'Selected'] = False
         self._data_handler.unselect_all()
-        self._data_handler.reload_table()
 
     def backward_five_sec(self):
         """
         Event-method for skipping 5 seconds backward.
         """
         self._audio_player.setPosition(self._audio_player.position() - 5000)
-        self._data_handler.table_data.loc[:, 'Selected'] = False
         self._data_handler.unselect_all()
-        self._data_handler.reload_table()
 
 
 class PlayerBarWidget(QtWidgets.QProgressBar):
@@ -96,25 +91,31 @@ class PlayerBarWidget(QtWidgets.QProgressBar):
         self.setRange(0, 1000)
         self.setFixedHeight(25)
         self.dragging = False
+        self._last_second = None
 
         self._init_style_sheet()
 
     def update_position(self, milliseconds: int):
         """
-        Method for continuously updating the progress bar when using the media player.
+        Method for continuously updating the progress bar when using the media player. The bar and the time label
+        are only updated when their value changes.
         """
         if self._audio_player.duration():
-            self.setValue((milliseconds / self._audio_player.duration()) * self.maximum())
+            value = int(milliseconds / self._audio_player.duration() * self.maximum())
+            if value != self.value():
+                self.setValue(value)
             duration = int(milliseconds / 1000)
-            seconds = str(duration % 60)
-            minutes = str(duration // 60)
-            self.timestamp_updated.emit(minutes.zfill(2) + ':' + seconds.zfill(2))
+            if duration != self._last_second:
+                self._last_second = duration
+                seconds = str(duration % 60)
+                minutes = str(duration // 60)
+                self.timestamp_updated.emit(minutes.zfill(2) + ':' + seconds.zfill(2))
 
     def mousePressEvent(self, event):
         self.dragging = True
         value = (event.x() / self.width()) * self.maximum()
         self._audio_player.setPosition((event.x() / self.width()) * self._audio_player.duration())
-        self.setValue(value)
+        self.setValue(int(value))
 
     def mouseMoveEvent(self, event):
         if self.dragging:
@@ -123,7 +124,7 @@ class PlayerBarWidget(QtWidgets.QProgressBar):
                 x = self.width()
             value = (x / self.width()) * self.maximum()
             self._audio_player.setPosition((x / self.width()) * self._audio_player.duration())
-            self.setValue(value)
+            self.setValue(int(value))
 
     def mouseReleaseEvent(self, event):
         self.dragging = False
@@ -1,11 +1,210 @@
 from PyQt5 import QtWidgets, QtGui, QtCore
-import pyqtgraph as pg
 import datetime
+import numpy as np
+
+from ..helpers.refresh_scheduler import RefreshScheduler
+
+
+class AnnotationTableModel(QtCore.QAbstractTableModel):
+    """
+    Model that presents the AnnotationStore of the DataHandler to a QTableView.
+
+    The model observes the store and only emits the signals of the rows that actually changed, and the view only
+    requests (and formats) the rows that are visible. Labels proposed by a scorer are shown for unlabelled annotations
+    (in grey, with their confidence in the column 'Score').
+
+    The table can be sorted by every column (sorting by the first column restores the order of the store). The order
+    is a permutation of the rows computed with numpy, so no data of the rows is requested for sorting. Modified
+    annotations keep their position until the table is sorted again, added or removed annotations re-sort the table.
+    """
+    HEADER_LABELS = [" ", "From", "To", "Event", "Score"]
+
+    def __init__(self, data_handler):
+        super().__init__()
+        self._data_handler = data_handler
+        self._annotations = data_handler.annotations
+        self._annotations.add_observer(self)
+        self._predictions = data_handler.predictions
+        self._predictions.add_observer(self)
+
+        # index of the annotation of every row and row of every annotation (None if the table is not sorted)
+        self._order = None
+        self._rows = None
+        self._sort_column = 0
+        self._sort_order = QtCore.Qt.AscendingOrder
+
+        self._foreground = QtGui.QBrush(QtGui.QColor(0, 0, 0))
+        self._predicted_foreground = QtGui.QBrush(QtGui.QColor(110, 110, 110))
+        self._unlabelled_background = QtGui.QBrush(QtGui.QColor(238, 233, 108))
+        self._labelled_background = QtGui.QBrush(QtGui.QColor(87, 223, 151))
+        self._selected_background = QtGui.QBrush(QtGui.QColor(204, 97, 212))
+        self._unselected_background = QtGui.QBrush(QtGui.QColor(255, 255, 255))
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self._annotations)
+
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        return 0 if parent.isValid() else len(self.HEADER_LABELS)
+
+    def headerData(self, section, orientation, role=QtCore.Qt.DisplayRole):
+        if role == QtCore.Qt.DisplayRole and orientation == QtCore.Qt.Horizontal:
+            return self.HEADER_LABELS[section]
+        return super().headerData(section, orientation, role)
+
+    def annotation_index(self, row):
+        """ Returns the index of the annotation shown in a row. """
+        return row if self._order is None else int(self._order[row])
+
+    def row_of(self, index):
+        """ Returns the row that shows an annotation. """
+        return index if self._rows is None else int(self._rows[index])
+
+    def _is_predicted(self, index):
+        return self._annotations.label[index] < 0 and self._predictions.predicted[index] >= 0
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        if not index.isValid():
+            return None
+        row, column = self.annotation_index(index.row()), index.column()
+
+        if role == QtCore.Qt.DisplayRole:
+            if column == 1:
+                return self.format_timestamp(self._annotations.start[row])
+            elif column == 2:
+                return self.format_timestamp(self._annotations.stop[row])
+            elif column == 3:
+                if self._is_predicted(row):
+                    return self._annotations.classes[self._predictions.predicted[row]] + '?'
+                return self._annotations.label_name(row)
+            elif column == 4:
+                if self._is_predicted(row):
+                    return f'{self._predictions.confidence[row]:.2f}'
+                return None
+        elif role == QtCore.Qt.BackgroundRole:
+            if column == 0:
+                if self._annotations.selected == row:
+                    return self._selected_background
+                return self._unselected_background
+            if self._annotations.label[row] < 0:
+                return self._unlabelled_background
+            return self._labelled_background
+        elif role == QtCore.Qt.ForegroundRole and column > 0:
+            if column >= 3 and self._is_predicted(row):
+                return self._predicted_foreground
+            return self._foreground
+        return None
+
+    def format_timestamp(self, sample):
+        """ Converts a sample index to a time string (h:mm:ss.ff). """
+        return str(datetime.timedelta(milliseconds=(sample / self._data_handler.audio_rate) * 1000))[:-4]
+
+    def _rows_changed(self, first, last):
+        if self._order is None:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, self.columnCount() - 1))
+            return
+        for row in self._rows[first:last + 1].tolist():
+            self.dataChanged.emit(self.index(row, 0), self.index(row, self.columnCount() - 1))
+
+    ##################################################################################
+    # Sorting
+    ##################################################################################
+    def _sort_key(self, column):
+        if column == 1:
+            return self._annotations.start
+        if column == 2:
+            return self._annotations.stop
+        labels = self._annotations.label.astype(np.int64)
+        predicted = self._predictions.predicted.astype(np.int64)
+        if column == 3:
+            # labelled annotations by class, then the predicted ones by class, then all others
+            n_classes = len(self._annotations.classes)
+            return np.where(labels >= 0, labels, np.where(predicted >= 0, n_classes + predicted, 2 * n_classes))
+        # annotations without a prediction are always at the end
+        return np.where((labels < 0) & (predicted >= 0), self._predictions.confidence, np.nan)
+
+    def _update_order(self):
+        if self._sort_column == 0:
+            self._order = self._rows = None
+            return
+        key = self._sort_key(self._sort_column)
+        if self._sort_order == QtCore.Qt.DescendingOrder:
+            key = -key
+        self._order = np.argsort(key, kind='stable')
+        self._rows = np.empty_like(self._order)
+        self._rows[self._order] = np.arange(len(self._order))
+
+    def sort(self, column, order=QtCore.Qt.AscendingOrder):
+        self._sort_column = column
+        self._sort_order = order
+        self.layoutAboutToBeChanged.emit()
+        persistent = self.persistentIndexList()
+        indices = [self.annotation_index(index.row()) for index in persistent]
+        self._update_order()
+        self.changePersistentIndexList(persistent, [self.index(self.row_of(annotation), index.column())
+                                                    for annotation, index in zip(indices, persistent)])
+        self.layoutChanged.emit()
+
+    ##################################################################################
+    # Observer methods of the AnnotationStore
+    ##################################################################################
+    def annotations_about_to_be_inserted(self, first, last):
+        if self._order is not None:
+            self.beginResetModel()
+        else:
+            self.beginInsertRows(QtCore.QModelIndex(), first, last)
+
+    def annotations_inserted(self, first, last):
+        if self._order is not None:
+            self._update_order()
+            self.endResetModel()
+        else:
+            self.endInsertRows()
+
+    def annotations_changed(self, first, last):
+        self._rows_changed(first, last)
+
+    def annotations_about_to_be_removed(self, first, last):
+        if self._order is not None:
+            self.beginResetModel()
+        else:
+            self.beginRemoveRows(QtCore.QModelIndex(), first, last)
+
+    def annotations_removed(self, first, last):
+        if self._order is not None:
+            self._update_order()
+            self.endResetModel()
+        else:
+            self.endRemoveRows()
+
+    def annotations_about_to_be_reset(self):
+        self.beginResetModel()
+
+    def annotations_reset(self):
+        if self._order is not None:
+            self._update_order()
+        self.endResetModel()
+
+    def selection_changed(self, old, new):
+        for row in (old, new):
+            if row is not None:
+                self._rows_changed(row, row)
+
+    ##################################################################################
+    # Observer methods of the Predictions
+    ##################################################################################
+    def predictions_changed(self, first, last):
+        if self._sort_column in (3, 4):
+            self.sort(self._sort_column, self._sort_order)
+        else:
+            self._rows_changed(first, last)
+
+    def predictions_reset(self):
+        self.predictions_changed(0, len(self._annotations) - 1)
 
 
 class TableWidget(QtWidgets.QWidget):
     """
-    Class containing everything for displaying annotated events inside a TableWidget.
+    Class containing everything for displaying annotated events inside a TableView.
     """
     def __init__(self, audio_player, data_handler, annotate_precise_widget, main_window):
         super().__init__()
@@ -16,141 +215,106 @@ class TableWidget(QtWidgets.QWidget):
 
         self.main_layout = QtWidgets.QVBoxLayout()
 
-        self.table = QtWidgets.QTableWidget()
+        self.model = AnnotationTableModel(self._data_handler)
+        self.table = QtWidgets.QTableView()
+        self.table.setModel(self.model)
         self.table.setMinimumWidth(500)
         self.table.setMaximumWidth(1000)
-        self.table.setColumnCount(4)
-        self.table.setEditTriggers(QtWidgets.QTableWidget.NoEditTriggers)
-        self.table.setHorizontalHeaderLabels([" ", "From", "To", "Event"])
-        self.table.cellClicked.connect(self._select_row)
+        self.table.setEditTriggers(QtWidgets.QAbstractItemView.NoEditTriggers)
+        self.table.clicked.connect(self._select_row)
         self.table.setSelectionMode(QtWidgets.QAbstractItemView.SingleSelection)
         self.table.setSelectionBehavior(QtWidgets.QAbstractItemView.SelectRows)
         self.table.setHorizontalScrollBarPolicy(QtCore.Qt.ScrollBarPolicy.ScrollBarAlwaysOff)
+        # rows with a fixed height, so the view never has to measure rows that are not visible
+        self.table.verticalHeader().setSectionResizeMode(QtWidgets.QHeaderView.Fixed)
 
         # configure header
         self.table.setColumnWidth(0, 1)
         self.table.setColumnWidth(1, 150)
         self.table.setColumnWidth(2, 150)
         self.table.setColumnWidth(3, 200)
+        self.table.setColumnWidth(4, 60)
         header = self.table.horizontalHeader()
         header.setSectionResizeMode(0, QtWidgets.QHeaderView.Fixed)
         header.setSectionResizeMode(1, QtWidgets.QHeaderView.Fixed)
         header.setSectionResizeMode(2, QtWidgets.QHeaderView.Fixed)
         header.setSectionResizeMode(3, QtWidgets.QHeaderView.Fixed)
+        header.setSectionResizeMode(4, QtWidgets.QHeaderView.Fixed)
+        # clicking a header sorts the table (the first column restores the order of the annotations)
+        header.setSortIndicator(0, QtCore.Qt.AscendingOrder)
+        self.table.setSortingEnabled(True)
 
         self._data_handler.table_widget = self.table
+        self._data_handler.annotations.add_observer(self)
+        # row that is scrolled to with the next refresh of the table
+        self._scroll_target = None
+        self._data_handler.refresh_scheduler.register(RefreshScheduler.TABLE, self._refresh)
         self.main_layout.addWidget(self.table)
 
         delete_button = QtWidgets.QPushButton('(Del) - Delete selected row')
         delete_button.clicked.connect(self._delete_selected_row)
         self.main_layout.addWidget(delete_button)
+        similar_button = QtWidgets.QPushButton('(Ctrl+F) - Find events similar to the selected row')
+        similar_button.clicked.connect(self.main_window.find_similar_events)
+        self.main_layout.addWidget(similar_button)
         self.setLayout(self.main_layout)
 
-    def _select_row(self):
+    def _select_row(self, index):
         """
         Event-method when selecting a row (i.e. when clicking on the row)
         """
-        if len(self.table.selectedIndexes()):
-            # Get current row
-            row = self.table.selectedIndexes()[0].row()
-            self.select_row(row)
+        if index.isValid():
+            self.select_row(self.model.annotation_index(index.row()))
 
     def select_row(self, row):
         """
-        Method for selecting a specific row depending on the row index.
+        Method for selecting a specific row depending on the index of its annotation.
         """
         if self._audio_player.state() == self._audio_player.PlayingState:
             return
         else:
-            df = self._data_handler.table_data
-            if bool(df.loc[row, 'Selected']) is True:
+            annotations = self._data_handler.annotations
+            if annotations.selected == row:
                 self._data_handler.unselect_all()
-                df.loc[row, 'Selected'] = False
-                df.loc[row, 'Region'].setMovable(False)
             else:
                 self._data_handler.unselect_all()
-                df.loc[row, 'Selected'] = True
-                df.loc[row, 'Region'].setMovable(True)
+                annotations.select(row)
                 self.annotate_precise_widget.region.setMovable(False)
                 self.annotate_precise_widget.region.setVisible(False)
 
-        self.reload_table()
-
-    @staticmethod
-    def set_region_brush(region, color):
-        region.setBrush(pg.mkColor(color))
-        region.setHoverBrush(pg.mkColor(color))
-
-    def _clear_table(self):
-        """
-        Method for removing all table entries.
-        """
-        while self.table.rowCount() > 0:
-            self.table.removeRow(0)
-        self.table.setRowCount(0)
-
-    def reload_table(self):
-        """
-        Method for reloading the whole table.
-        Therefore, the DataFrame of the DataHandler is used everytime since there are all information.
-        """
-        self._clear_table()
-
-        # iterate over the whole DataFrame
-        for index, row in self._data_handler.table_data.iterrows():
-            i = self.table.rowCount()
-            self.table.setRowCount(i + 1)
-
-            checkbox = QtWidgets.QTableWidgetItem()
-            # checkbox = QtWidgets.QWidgetItem()
-            # checkbox.setCheckState(QtCore.Qt.Checked if bool(row['Selected']) else QtCore.Qt.Unchecked)
-            self.table.setItem(i, 0, checkbox)
-
-            # convert start/end to a time format
-            milliseconds_from = str(datetime.timedelta(milliseconds=(row["From"]/self._data_handler.audio_rate)*1000))
-            milliseconds_to = str(datetime.timedelta(milliseconds=(row["To"]/self._data_handler.audio_rate)*1000))
-
-            item = QtWidgets.QTableWidgetItem(milliseconds_from[:-4])
-            item.setForeground(QtGui.QBrush(QtGui.QColor(0, 0, 0)))
-            self.table.setItem(i, 1, item)
-            item = QtWidgets.QTableWidgetItem(milliseconds_to[:-4])
-            item.setForeground(QtGui.QBrush(QtGui.QColor(0, 0, 0)))
-            self.table.setItem(i, 2, item)
-
-            if not row['Event']:
-                self.table.setItem(i, 3, QtWidgets.QTableWidgetItem('---'))
-                color = QtGui.QColor(238, 233, 108)
-                self.set_region_brush(row['Region'], (238, 233, 108, 150))
-            else:
-                color = QtGui.QColor(87, 223, 151)
-                self.set_region_brush(row['Region'], (87, 223, 151, 150))
-
-            if row['Selected'] is True:
-                self.table.item(i, 0).setBackground(QtGui.QColor(204, 97, 212))
-                self.set_region_brush(row['Region'], (204, 97, 212, 150))
-            else:
-                self.table.item(i, 0).setBackground(QtGui.QColor(255, 255, 255))
+    def scroll_to_index(self, index):
+        index_to_scroll = self.model.index(self.model.row_of(index), 0)
+        self.table.scrollTo(index_to_scroll)
 
-            # add current information to each region item
-            row['Region'].table_data = self._data_handler.table_data
-            row['Region'].table_widget = self
+    def _delete_selected_row(self):
+        self._data_handler.delete_selected_row()
 
-            item = QtWidgets.QTableWidgetItem(str(row["Event"]))
-            item.setForeground(QtGui.QBrush(QtGui.QColor(0, 0, 0)))
-            self.table.setItem(i, 3, item)
+    def _refresh(self):
+        """ Called by the RefreshScheduler, scrolls to the row that was added/selected last. """
+        if self._scroll_target is not None and self._scroll_target < len(self._data_handler.annotations):
+            self.scroll_to_index(self._scroll_target)
+        self._scroll_target = None
 
-            for j in range(1, 4):
-                self.table.item(i, j).setBackground(color)
+    def _scroll_later(self, row):
+        self._scroll_target = row
+        self._data_handler.refresh_scheduler.mark_dirty(RefreshScheduler.TABLE)
 
-        self.scroll_to_index(len(self._data_handler.table_data) - 1)
+    ##################################################################################
+    # Observer methods of the AnnotationStore (the rows itself are updated by the model)
+    ##################################################################################
+    def annotations_inserted(self, first, last):
+        self._scroll_later(last)
+        self._data_handler.refresh_scheduler.mark_dirty(RefreshScheduler.STATISTICS)
 
-        # update bar graph window
-        self.main_window.update_bar_graph_window()
+    def annotations_changed(self, first, last):
+        self._data_handler.refresh_scheduler.mark_dirty(RefreshScheduler.STATISTICS)
 
-    def scroll_to_index(self, index):
-        index_to_scroll = self.table.model().index(index, 0)
-        self.table.scrollTo(index_to_scroll)
+    def annotations_removed(self, first, last):
+        self._data_handler.refresh_scheduler.mark_dirty(RefreshScheduler.STATISTICS)
 
-    def _delete_selected_row(self):
-        self._data_handler.delete_selected_row()
+    def annotations_reset(self):
+        self._data_handler.refresh_scheduler.mark_dirty(RefreshScheduler.STATISTICS)
 
+    def selection_changed(self, old, new):
+        if new is not None:
+            self._scroll_later(new)
@@ -24,6 +24,10 @@ setup(
         "sounddevice",
         "pandas"
     ],
+    extras_require={
+        # export of annotations as .parquet/.feather-files
+        "arrow": ["pyarrow"],
+    },
 
     classifiers=[
         "Development Status :: 4 - Beta",
@@ -40,7 +44,8 @@ setup(
     },
     entry_points={
         'console_scripts': [
-            'airway-gui = AIrway_GUI.main:main'
+            'airway-gui = AIrway_GUI.main:main',
+            'airway-batch = AIrway_GUI.batch:main'
         ]
     },
     include_package_data=True,
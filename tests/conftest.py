@@ -0,0 +1,32 @@
+import wave
+
+import numpy as np
+import pytest
+
+
+RATE = 16000
+
+
+def write_wav(path, samples, rate=RATE):
+    """ Writes float samples (-1 ... 1, one channel) as 16 bit WAV file. """
+    with wave.open(str(path), 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(rate)
+        f.writeframes((np.clip(samples, -1, 1) * 32767).astype('<i2').tobytes())
+    return path
+
+
+@pytest.fixture
+def cache_dir(tmp_path, monkeypatch):
+    """ Redirects the user cache directory of AIrway into a temporary directory. """
+    directory = tmp_path / 'cache'
+    monkeypatch.setenv('AIRWAY_CACHE_DIR', str(directory))
+    return directory
+
+
+@pytest.fixture
+def wav_path(tmp_path):
+    """ One second of quiet noise. """
+    rng = np.random.default_rng(0)
+    return write_wav(tmp_path / 'recording.wav', rng.normal(0, 1e-3, RATE))
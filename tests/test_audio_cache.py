@@ -0,0 +1,46 @@
+import numpy as np
+import pytest
+
+from AIrway_GUI.core import AudioCache, AudioSource, scan_audio
+from AIrway_GUI.core.audio_cache import read_cache_file, write_cache_file
+
+from .conftest import write_wav
+
+
+@pytest.mark.parametrize('content', [b'', b'garbage' * 10, 'truncated'])
+@pytest.mark.parametrize('kind', ['npz', 'npy'])
+def test_broken_cache_file_is_a_cache_miss(tmp_path, kind, content):
+    # the audio and prediction caches use .npz-files, the similarity cache memory-maps .npy-files
+    path = tmp_path / 'cache' / f'entry.{kind}'
+    values = np.arange(1000.0)
+    if kind == 'npz':
+        write, read, mmap_mode = (lambda f: np.savez(f, values=values)), (lambda data: data['values']), None
+    else:
+        write, read, mmap_mode = (lambda f: np.save(f, values)), (lambda data: data), 'r'
+    assert read_cache_file(path, read, mmap_mode) is None
+    assert write_cache_file(path, write)
+    np.testing.assert_array_equal(read_cache_file(path, read, mmap_mode), values)
+
+    if content == 'truncated':
+        content = path.read_bytes()[:100]
+    path.write_bytes(content)
+    assert read_cache_file(path, read, mmap_mode) is None
+    assert not path.exists()
+    # a new entry can be written afterwards
+    assert write_cache_file(path, write)
+    np.testing.assert_array_equal(read_cache_file(path, read, mmap_mode), values)
+
+
+def test_changed_audio_file_is_a_cache_miss(wav_path, tmp_path):
+    source = AudioSource(wav_path)
+    result = scan_audio(source)
+    cache = AudioCache(tmp_path / 'cache')
+    cache.store(source, 'hash', result.pyramid, result.statistics)
+    assert cache.load(source).file_hash == 'hash'
+    source.close()
+
+    write_wav(wav_path, np.zeros(1000))
+    source = AudioSource(wav_path)
+    assert cache.load(source) is None
+    assert not any((tmp_path / 'cache').iterdir())
+    source.close()
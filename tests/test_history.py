@@ -0,0 +1,61 @@
+import numpy as np
+import pytest
+
+from AIrway_GUI.core import AnnotationHistory, AnnotationStore, ClassStatistics, IntervalIndex
+
+
+class Notifications:
+    """ Observer that records the removal notifications of a store. """
+    def __init__(self):
+        self.removed = []
+
+    def annotations_removed(self, first, last):
+        self.removed.append((first, last))
+
+
+def assert_consistent(annotations, interval_index, class_statistics):
+    """ The incrementally updated observers give the same answers as ones built from scratch. """
+    fresh_statistics = ClassStatistics(annotations)
+    np.testing.assert_array_equal(class_statistics.counts(), fresh_statistics.counts())
+    np.testing.assert_array_equal(class_statistics.total_durations(), fresh_statistics.total_durations())
+    for x_min in range(0, 12000, 500):
+        expected = np.flatnonzero((annotations.start <= x_min + 700) & (annotations.stop >= x_min))
+        np.testing.assert_array_equal(np.sort(interval_index.overlapping(x_min, x_min + 700)), expected)
+
+
+@pytest.mark.parametrize('n', [10, 500])
+def test_undo_removes_a_range_with_one_notification(n):
+    rng = np.random.default_rng(2)
+    annotations = AnnotationStore(['a', 'b'])
+    interval_index = IntervalIndex(annotations)
+    class_statistics = ClassStatistics(annotations)
+    history = AnnotationHistory(annotations)
+    starts = np.sort(rng.integers(0, 10000, 2 * n))
+    annotations.extend(starts[:n], starts[:n], starts[:n] + 300, rng.integers(-1, 2, n))
+    annotations.select(n - 1)
+    annotations.extend(starts[n:], starts[n:], starts[n:] + 300, rng.integers(-1, 2, n))
+    annotations.select(n + 1)
+
+    notifications = Notifications()
+    annotations.add_observer(notifications)
+    history.undo()
+    assert notifications.removed == [(n, 2 * n - 1)]
+    assert len(annotations) == n and annotations.selected is None
+    assert_consistent(annotations, interval_index, class_statistics)
+
+    history.redo()
+    assert len(annotations) == 2 * n
+    assert_consistent(annotations, interval_index, class_statistics)
+
+
+def test_delete_range_moves_the_following_annotations():
+    annotations = AnnotationStore(['a'])
+    interval_index = IntervalIndex(annotations)
+    class_statistics = ClassStatistics(annotations)
+    starts = np.arange(0, 10000, 100)
+    annotations.extend(starts, starts, starts + 150, np.zeros(len(starts)))
+    annotations.select(80)
+    annotations.delete_range(10, 79)
+    assert len(annotations) == 30 and annotations.selected == 10
+    np.testing.assert_array_equal(annotations.start, np.concatenate([starts[:10], starts[80:]]))
+    assert_consistent(annotations, interval_index, class_statistics)
@@ -0,0 +1,71 @@
+import numpy as np
+
+from AIrway_GUI.core import Project
+
+
+def columns(annotations):
+    return [np.array(column) for column in (annotations.initial, annotations.start, annotations.stop,
+                                            annotations.label)]
+
+
+def crash_and_recover(project, wav_path):
+    """ Flushes the journal without closing it (like a crash) and replays it into a new project. """
+    project.journal.flush()
+    recovered = Project(wav_path, use_cache=False)
+    n_changes = recovered.start_journal()
+    return recovered, n_changes
+
+
+def assert_same(a, b):
+    for column_a, column_b in zip(columns(a), columns(b)):
+        np.testing.assert_array_equal(column_a, column_b)
+
+
+def test_replay_after_undo_of_delete(wav_path):
+    project = Project(wav_path, use_cache=False)
+    project.start_journal()
+    for start in (100, 200, 300):
+        project.annotations.append(start, start, start + 50, 0)
+    project.journal.flush()
+    project.annotations.delete(0)
+    project.history.undo()
+    project.annotations.append(400, 400, 450, 1)
+
+    recovered, n_changes = crash_and_recover(project, wav_path)
+    assert n_changes > 0
+    assert_same(project.annotations, recovered.annotations)
+
+
+def test_replay_after_undoing_two_deletes_of_the_same_row(wav_path):
+    project = Project(wav_path, use_cache=False)
+    project.start_journal()
+    for start in (100, 200, 300, 400):
+        project.annotations.append(start, start, start + 50, start // 100 % 2)
+    project.annotations.delete(1)
+    project.annotations.delete(1)
+    project.history.undo()
+    project.history.undo()
+
+    recovered, _ = crash_and_recover(project, wav_path)
+    assert len(recovered.annotations) == 4
+    assert_same(project.annotations, recovered.annotations)
+
+
+def test_replay_of_mixed_inserts_undo_and_redo(wav_path):
+    project = Project(wav_path, use_cache=False)
+    project.start_journal()
+    project.annotations.extend([10, 20, 30], [10, 20, 30], [15, 25, 35], [0, 1, 0])
+    project.annotations.insert(1, 12, 12, 18, 1)
+    project.annotations.delete(2)
+    project.annotations.delete(0)
+    project.history.undo()
+    project.history.undo()
+    project.history.redo()
+    project.annotations.set_label(0, 1)
+    project.journal.flush()
+    project.annotations.delete(2)
+    project.history.undo()
+    project.annotations.append(40, 40, 45)
+
+    recovered, _ = crash_and_recover(project, wav_path)
+    assert_same(project.annotations, recovered.annotations)
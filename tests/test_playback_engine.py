@@ -0,0 +1,174 @@
+import io
+import os
+import time
+import wave
+
+import numpy as np
+import pytest
+
+from AIrway_GUI.core import AudioSource
+from AIrway_GUI.core.playback_engine import FileSink, NullSink, PlaybackEngine
+
+from .conftest import RATE, write_wav
+
+BLOCKSIZE = 256
+
+
+@pytest.fixture
+def source(tmp_path):
+    """ 2 s of samples that are never 0, so played samples can be told apart from silence. """
+    rng = np.random.default_rng(0)
+    samples = rng.uniform(0.05, 0.5, 2 * RATE) * rng.choice([-1, 1], 2 * RATE)
+    audio_source = AudioSource(write_wav(tmp_path / 'source.wav', samples))
+    yield audio_source
+    audio_source.close()
+
+
+def wait_until(condition, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, 'timeout'
+        time.sleep(0.001)
+
+
+def written_frames(path):
+    """ Number of frames the FileSink has written so far (the header of a wav file has 44 bytes). """
+    return max(os.path.getsize(path) - 44, 0) // 2 if os.path.exists(path) else 0
+
+
+def wait_for_frames(path, n_frames):
+    """
+    Waits until the FileSink rendered n_frames frames more. The sink thread can render silence before a call of the
+    engine takes effect and the file is written buffered, so both are added as margin.
+    """
+    target = written_frames(path) + n_frames + 2 * BLOCKSIZE + io.DEFAULT_BUFFER_SIZE // 2
+    wait_until(lambda: written_frames(path) >= target)
+
+
+def read_output(path):
+    with wave.open(str(path), 'rb') as f:
+        assert f.getframerate() == RATE and f.getnchannels() == 1
+        return np.frombuffer(f.readframes(f.getnframes()), dtype='<i2').astype(np.int64)
+
+
+def audible(output):
+    """ Returns the played part of the output (everything between the silence in front and behind it). """
+    played = np.flatnonzero(output)
+    return output[played[0]:played[-1] + 1] if len(played) else output[:0]
+
+
+def assert_samples(played, source, start):
+    """ The played samples are the samples of the source from start on (up to the rounding of the sink). """
+    expected = source.read(start, start + len(played))[:, 0].astype(np.int64)
+    assert len(played) == len(expected)
+    assert np.max(np.abs(played - expected)) <= 1
+
+
+def test_region_is_played_once(source, tmp_path):
+    path = tmp_path / 'out.wav'
+    engine = PlaybackEngine(source, FileSink(path, realtime=False), blocksize=BLOCKSIZE)
+    engine.play_region(1000, 5000)
+    assert engine.is_region_playing
+    wait_until(lambda: not engine.is_region_playing)
+    # silence is written after the region
+    wait_for_frames(path, 4 * BLOCKSIZE)
+    engine.close()
+
+    output = read_output(path)
+    assert_samples(audible(output), source, 1000)
+    assert len(audible(output)) == 4000
+    assert not engine.is_playing and engine.position == 0
+
+
+def test_region_is_looped(source, tmp_path):
+    path = tmp_path / 'out.wav'
+    engine = PlaybackEngine(source, FileSink(path, realtime=False), blocksize=BLOCKSIZE)
+    start, stop = 3000, 3700
+    engine.play_region(start, stop, loop=True)
+    wait_for_frames(path, 5 * (stop - start))
+    assert engine.is_region_playing
+    assert start <= engine.region_position < stop
+    engine.stop_region()
+    assert engine.region_position is None
+    engine.close()
+
+    played = audible(read_output(path))
+    n_loops = len(played) // (stop - start)
+    assert n_loops >= 5
+    for loop in range(n_loops):
+        assert_samples(played[loop * (stop - start):(loop + 1) * (stop - start)], source, start)
+
+
+def test_seek_play_pause_and_reported_position(source, tmp_path):
+    path = tmp_path / 'out.wav'
+    engine = PlaybackEngine(source, FileSink(path, realtime=False), blocksize=BLOCKSIZE)
+    engine.seek(12345)
+    assert engine.position == 12345
+    engine.play()
+    assert engine.is_playing
+    wait_for_frames(path, 10 * BLOCKSIZE)
+    engine.pause()
+    position = engine.position
+    # nothing is played while the transport is paused
+    wait_for_frames(path, 4 * BLOCKSIZE)
+    assert engine.position == position
+    engine.close()
+
+    played = audible(read_output(path))
+    assert_samples(played, source, 12345)
+    # the reported position is the end of the played samples (pause may happen while the next block is rendered)
+    assert 12345 + len(played) - BLOCKSIZE <= position <= 12345 + len(played)
+
+
+def test_play_stops_at_the_end(source, tmp_path):
+    path = tmp_path / 'out.wav'
+    engine = PlaybackEngine(source, FileSink(path, realtime=False), blocksize=BLOCKSIZE)
+    engine.seek(len(source) - 1000)
+    engine.play()
+    wait_until(lambda: not engine.is_playing)
+    assert engine.position == len(source)
+    # seeking behind the end is clamped, playing from the end starts at the beginning
+    engine.seek(len(source) + 100)
+    assert engine.position == len(source)
+    engine.close()
+
+    played = audible(read_output(path))
+    assert len(played) == 1000
+    assert_samples(played, source, len(source) - 1000)
+
+
+def test_no_region_while_the_transport_is_playing(source):
+    engine = PlaybackEngine(source, NullSink(realtime=False), blocksize=BLOCKSIZE)
+    engine.play()
+    engine.play_region(0, 1000)
+    assert not engine.is_region_playing
+    engine.close()
+
+
+def test_null_sink_plays_in_real_time(source):
+    # a clock that runs 1 ms (the time for rendering a block) whenever it is read and that is advanced by sleep()
+    now = [0.0]
+    sleeps = []
+    ticks = []
+
+    def clock():
+        now[0] += 0.001
+        return now[0]
+
+    def sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+        ticks.append((now[0], engine.position))
+
+    engine = PlaybackEngine(source, NullSink(realtime=True, clock=clock, sleep=sleep), blocksize=BLOCKSIZE)
+    engine.play()
+    wait_until(lambda: not engine.is_playing)
+    engine.close()
+
+    # the time for rendering is subtracted from the time the sink waits for the next block
+    assert sleeps == pytest.approx([BLOCKSIZE / RATE - 0.001] * len(sleeps))
+    # so the samples are played at the rate of the file
+    playing = [(t, position) for t, position in ticks if 0 < position < len(source)]
+    assert len(playing) > 100
+    (t0, position0), (t1, position1) = playing[0], playing[-1]
+    assert position1 - position0 == pytest.approx((t1 - t0) * RATE)
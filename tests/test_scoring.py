@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from AIrway_GUI.core import UNLABELLED, PredictionJob, Project, event_windows
+
+from .conftest import RATE, write_wav
+
+
+@pytest.fixture
+def project(tmp_path, cache_dir):
+    """ 60 s with 40 events of two kinds (filtered noise bursts and tones), every other event is labelled. """
+    rng = np.random.default_rng(1)
+    samples = rng.normal(0, 1e-3, 60 * RATE)
+    positions = np.arange(40) * RATE + RATE // 4
+    kinds = np.arange(40) % 4 // 2
+    for position, kind in zip(positions, kinds):
+        t = np.arange(RATE // 2) / RATE
+        if kind == 0:
+            signal = np.convolve(rng.normal(0, 1, len(t)), np.ones(6) / 6, mode='same')
+        else:
+            signal = np.sin(2 * np.pi * 700 * t) + 0.05 * rng.normal(0, 1, len(t))
+        samples[position:position + len(t)] += 0.2 * signal * np.exp(-t / 0.4)
+
+    project = Project(write_wav(tmp_path / 'events.wav', samples), use_cache=False)
+    project.set_scan_result(project.scan())
+    labels = np.where(np.arange(40) % 2 == 0, kinds, UNLABELLED)
+    project.annotations.extend(positions, positions, positions + RATE // 2, labels)
+    project.truth = kinds[labels == UNLABELLED]
+    return project
+
+
+def test_event_windows():
+    start, stop, events = event_windows([1000, 5000, 9900], [1100, 9000, 10000], window_frames=1000,
+                                        hop_frames=500, n_frames=10200)
+    # a short event gets one centered window
+    assert (start[0], stop[0], events[0]) == (550, 1550, 0)
+    # a long event is covered from its start to its stop
+    long_event = events == 1
+    assert start[long_event][0] == 5000 and stop[long_event][-1] == 9000
+    assert np.all(np.diff(start[long_event]) <= 500)
+    # windows are kept inside of the file
+    assert (start[-1], stop[-1], events[-1]) == (9200, 10200, 2)
+    # without a window length every event is one window
+    start, stop, events = event_windows([10, 20], [15, 40], None, None, 100)
+    assert start.tolist() == [10, 20] and stop.tolist() == [15, 40] and events.tolist() == [0, 1]
+
+
+def test_prediction_job(project):
+    result = project.begin_prediction().run(in_process=True)
+    n_classes = len(project.annotations.classes)
+    assert result.probabilities.shape == (20, n_classes)
+    assert np.all(result.probabilities >= 0)
+    np.testing.assert_allclose(result.probabilities.sum(axis=1), 1)
+    # classes without labelled events get no probability
+    assert np.all(result.probabilities[:, 2:] == 0)
+    assert np.mean(result.predicted == project.truth) >= 0.9
+
+    assert project.predictions.set(result) == 20
+    assert len(project.predictions) == 20
+
+
+def test_second_run_is_taken_from_the_cache(project, monkeypatch):
+    first = project.begin_prediction().run(in_process=True)
+
+    def score(*args):
+        raise AssertionError('all windows should be cached')
+
+    monkeypatch.setattr(PredictionJob, '_score', score)
+    second = project.begin_prediction().run(in_process=True)
+    np.testing.assert_allclose(second.probabilities, first.probabilities)
+
+
+def test_no_labelled_events(project):
+    project.annotations.clear()
+    project.annotations.extend([100], [100], [2000], [UNLABELLED])
+    with pytest.raises(ValueError):
+        project.begin_prediction().run(in_process=True)
@@ -0,0 +1,31 @@
+import numpy as np
+
+from AIrway_GUI.core import Project
+
+from .conftest import RATE, write_wav
+
+
+def test_search_finds_events_of_the_same_kind(tmp_path, cache_dir):
+    rng = np.random.default_rng(3)
+    samples = rng.normal(0, 1e-3, 40 * RATE)
+    positions = np.arange(1, 39) * RATE
+    kinds = rng.integers(0, 2, len(positions))
+    t = np.arange(RATE // 2) / RATE
+    for position, kind in zip(positions, kinds):
+        signal = np.sin(2 * np.pi * (700 if kind else 2500) * t)
+        samples[position:position + len(t)] += 0.2 * signal * np.exp(-t / 0.3)
+    project = Project(write_wav(tmp_path / 'tones.wav', samples))
+    project.set_scan_result(project.scan())
+    project.build_similarity_index(max_workers=1)
+
+    query = int(np.flatnonzero(kinds == 1)[0])
+    project.annotations.append(positions[query], positions[query], positions[query] + RATE // 2, 1)
+    start, stop, similarity = project.find_similar(positions[query], positions[query] + RATE // 2, k=5)
+    assert len(start) == 5
+    assert np.all(np.diff(similarity) <= 0)
+    nearest = np.abs(positions[:, None] - start[None, :]).argmin(axis=0)
+    assert np.all(kinds[nearest] == 1)
+    assert np.all(np.abs(positions[nearest] - start) < 0.1 * RATE)
+    # the query itself is never a match
+    assert query not in nearest
+